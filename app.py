@@ -1,31 +1,519 @@
 import base64
-import streamlit as st
-import pandas as pd
+import functools
+import json
+import math
 import pickle
-from backend import Bracket
-from connection import set_state, get_state
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from string import ascii_uppercase
+
+import streamlit as st
+
+import events
+import metrics
+import playoff
+import roster
+import serializer
+from backend import (
+    BYE,
+    DEFAULT_GROUPS,
+    PENDING,
+    Bracket,
+    ScoreChange,
+    unique_names,
+)
+from connection import (
+    DEFAULT_TOURNAMENT,
+    TRANSIENT_ERRORS,
+    append_event,
+    create_tournament,
+    get_bracket,
+    get_event_log,
+    get_events,
+    get_state,
+    get_state_version,
+    get_versioned_payload,
+    list_tournaments,
+    set_bracket,
+    set_payload,
+    set_scores,
+    set_snapshot,
+)
+from local_store import LocalStore
+from writer import ScoreWriter
+
+# stats.py (pandas) e odds.py (NumPy) são importados só dentro das funções
+# que os usam (por isso o `noqa: PLC0415`): a partida a frio e as páginas
+# sem ranking não pagam por eles
+
+# Modo de armazenamento: 'blob' (estado inteiro na tabela do estado),
+# 'normalized' (atletas, jogos e placares, ver sql/ddl_normalized_state.sql)
+# ou 'events' (log de alterações com snapshots, ver events.py)
+STORAGE_MODE = st.secrets.database.get('STORAGE_MODE', 'blob')
+# Arquivo SQLite local onde os placares são confirmados antes de irem ao
+# banco central (ver local_store.py); sem ele, vão direto ao banco
+LOCAL_STORE_PATH = st.secrets.database.get('LOCAL_STORE_PATH')
+
+
+# Tentativas de gravar os placares quando outro marcador salva antes
+MAX_SAVE_ATTEMPTS = 5
+# Espera máxima pelos placares na fila antes de gravar uma mudança de
+# estrutura (cadastro, geração, agenda...)
+FLUSH_TIMEOUT_SECONDS = 15
+# Modo 'events': eventos reaplicados na leitura a partir dos quais um
+# snapshot novo é gravado
+SNAPSHOT_INTERVAL = 50
+# Eventos de placar exibidos no histórico
+SCORE_HISTORY_SIZE = 20
+
+# Jogos e ranking são atualizados sozinhos a cada LIVE_REFRESH_SECONDS,
+# consultando uma versão do estado compartilhada entre as sessões
+LIVE_REFRESH_SECONDS = 5
+LIVE_VERSION_TTL_SECONDS = 2
+# A lista de campeonatos muda pouco: é consultada no máximo a cada tanto
+TOURNAMENTS_TTL_SECONDS = 30
+# Com armazenamento local, depois de uma falha de conexão o banco central
+# não é consultado por OFFLINE_BACKOFF_SECONDS (dobrando a cada nova falha,
+# até o máximo): cada execução da página não espera o connect_timeout
+OFFLINE_BACKOFF_SECONDS = 5
+MAX_OFFLINE_BACKOFF_SECONDS = 60
+
+# Opção da fase final na escolha da chave exibida
+PLAYOFF_GROUP = 'playoff'
+# Nomes de exibição dos grupos padrão; os demais usam o próprio nome
+GROUP_LABELS = {
+    'left': 'Esquerda',
+    'right': 'Direita',
+    PLAYOFF_GROUP: 'Fase Final',
+}
+PAIRING_LABELS = {
+    playoff.BALANCED: 'Melhor com pior (1º + último)',
+    playoff.SAME_RANK: 'Mesma posição (1º + 1º)',
+}
+# Chaves exibidas lado a lado na lista de atletas
+GROUP_COLUMNS = 4
+# Jogos renderizados por vez; os demais ficam em outras páginas
+MATCHES_PER_PAGE = 8
+MATCH_VIEWS = ('Próximos jogos', 'Todos os jogos')
+# Quadras sugeridas antes da primeira agenda
+DEFAULT_COURTS = 2
+# Tempo (s) de simulação das chances de classificação por execução; o
+# que faltar continua na próxima atualização da página
+ODDS_TIME_BUDGET = 1.0
+# Placar máximo de uma dupla em um jogo (MAX_SCORE nos secrets), usado
+# para dizer quem já está classificado ou eliminado; sem ele, só ao fim
+# dos jogos de quem ainda pode alcançá-lo
+MAX_SCORE = st.secrets.get('MAX_SCORE')
+# Pasta do app, com o initial_state.pkl
+ASSET_DIR = Path(__file__).parent
+# Painel de métricas (e o botão que as zera): só com DEBUG_METRICS nos
+# secrets, nunca por um parâmetro da URL, que qualquer espectador altera
+DEBUG_METRICS = st.secrets.get('DEBUG_METRICS', False)
 
 
 # --- FUNÇÕES PARA SALVAR E CARREGAR O ESTADO ---
-def save_state(state):
-    """Salva o estado da aplicação no banco de dados"""
-    bytes_file = pickle.dumps(state)
-    string_base64 = base64.b64encode(bytes_file).decode('utf-8')
-    set_state(string_base64)
+class StateUnavailable(Exception):
+    """
+    O estado do campeonato não pôde ser lido do banco. Na thread de
+    gravação, a mensagem chega à interface pelo `status` da fila.
+    """
+
+
+@metrics.timed('app.save_state')
+def save_state(state, event):
+    """
+    Salva o estado do campeonato da sessão no banco de dados. `event` diz
+    o que mudou (events.REGISTER, GENERATE, ...); no modo 'events' só isso
+    é gravado.
+    """
+    tournament_id = st.session_state.tournament_id
+    # A estrutura mudou: placares guardados podem não valer mais
+    pending_changes().clear()
+    # Placares já enviados são gravados antes, na ordem em que foram feitos
+    if 'score_writer' in st.session_state:
+        st.session_state.score_writer.flush(FLUSH_TIMEOUT_SECONDS)
+    if STORAGE_MODE == 'normalized':
+        st.session_state.state_version = set_bracket(
+            tournament_id, *state.to_rows(), *state.playoff_rows()
+        )
+        return
+    if STORAGE_MODE == 'events':
+        st.session_state.state_version = append_event(
+            tournament_id, event, events.encode(events.describe(event, state))
+        )
+        return
+    st.session_state.state_version = set_payload(
+        tournament_id, serializer.dumps(state)
+    )
+
+
+def write_results(tournament_id, state, changes, version):
+    """
+    Grava os placares se a versão do estado ainda for `version`.
+    Retorna a nova versão, ou None se outro marcador salvou antes.
+    """
+    if STORAGE_MODE == 'events':
+        return append_event(
+            tournament_id,
+            events.SCORES,
+            events.encode(events.describe_scores(changes)),
+            expected_version=version,
+        )
+    return set_payload(
+        tournament_id, serializer.dumps(state), expected_version=version
+    )
+
+
+@metrics.timed('app.save_results')
+def save_results(tournament_id, state, changes, version):
+    """
+    Salva os placares alterados com controle de concorrência otimista.
+
+    A gravação só acontece se ninguém salvou desde a leitura (versão ou, no
+    modo normalizado, duplas e placar anterior de cada jogo). Caso
+    contrário, o estado é recarregado, as mudanças sem conflito (do mesmo
+    jogo, com as mesmas duplas) são reaplicadas e a gravação é repetida.
+    Roda na thread de gravação (ver writer.py), então não usa a sessão:
+    retorna o estado gravado, a sua versão e as mudanças descartadas por
+    conflito.
+    """
+    if not changes:
+        return state, version, []
+    if STORAGE_MODE == 'normalized':
+        rows, playoff_rows = [], []
+        for change in changes:
+            if state.playoff and state.playoff.owns(change.number):
+                playoff_rows.append(change.row())
+            else:
+                rows.append(change.row())
+        new_version, conflicting = set_scores(
+            tournament_id, rows, playoff_rows, state.playoff_rows()[0]
+        )
+        metrics.increment('scores.conflicts', len(conflicting))
+        # A versão gravada só descreve o estado da sessão se ninguém gravou
+        # no meio-tempo; senão, fica a lida e a próxima consulta recarrega
+        # os placares dos outros marcadores
+        if new_version != version + 1:
+            new_version = version
+        return (
+            state,
+            new_version,
+            [change for change in changes if change.number in conflicting],
+        )
+
+    conflicts = []
+    for _ in range(MAX_SAVE_ATTEMPTS):
+        new_version = write_results(tournament_id, state, changes, version)
+        if new_version is not None:
+            return state, new_version, conflicts
+        # Outro marcador salvou antes: parte do estado dele
+        metrics.increment('scores.retries')
+        state, version = fetch_state(tournament_id)
+        if state is None:
+            raise StateUnavailable(
+                'O campeonato não tem estado gravado no banco; os placares '
+                'não foram salvos.'
+            )
+        merge_conflicts = state.merge_changes(changes)
+        metrics.increment('scores.conflicts', len(merge_conflicts))
+        conflicts += merge_conflicts
+        changes = [
+            change for change in changes if change not in merge_conflicts
+        ]
+    raise RuntimeError(
+        'Não foi possível salvar os placares: o estado mudou a cada tentativa.'
+    )
+
+
+def sync_results(store, link, tournament_id, state, changes, version):
+    """
+    `save_results` com armazenamento local: o estado gravado no banco
+    central vira a réplica usada quando a conexão cai, e a gravação que
+    passou encerra a espera das leituras (`link`, ver Connectivity).
+    """
+    state, version, conflicts = save_results(
+        tournament_id, state, changes, version
+    )
+    if changes:
+        link.succeeded()
+        store.save_replica(tournament_id, serializer.dumps(state), version)
+    return state, version, conflicts
+
+
+@metrics.timed('app.fetch_state')
+def fetch_state(tournament_id):
+    """
+    Carrega o estado do campeonato do banco de dados de forma segura.
+    Retorna o estado (ou None) e a versão correspondente.
+    """
+    if STORAGE_MODE == 'normalized':
+        version = get_state_version(tournament_id)
+        rows = get_bracket(tournament_id)
+        # Sem chaves gravadas, ainda não há campeonato
+        if not rows[0]:
+            return None, version
+        return Bracket.from_rows(*rows), version
+    if STORAGE_MODE == 'events':
+        return fetch_event_log(tournament_id)
+    payload, version = get_versioned_payload(tournament_id)
+    try:
+        if payload:
+            return serializer.loads(payload), version
+        # Estado gravado antes do formato binário: pickle em base64
+        base64_string = get_state(tournament_id)
+        if not base64_string:
+            return None, version
+        return serializer.loads_legacy(base64_string), version
+    except (
+        ValueError,
+        zlib.error,
+        pickle.UnpicklingError,
+        base64.binascii.Error,
+        EOFError,
+    ):
+        return None, version
+
+
+def fetch_event_log(tournament_id):
+    """
+    Estado no modo 'events': último snapshot mais os eventos seguintes.
+    Se a reprodução foi longa, grava um snapshot novo para as próximas.
+    Roda também na thread de gravação: um log que não pode ser reproduzido
+    levanta StateUnavailable em vez de escrever na página.
+    """
+    version, snapshot_id, payload, rows = get_event_log(tournament_id)
+    if payload is None:
+        # Ainda sem snapshot: parte do estado gravado no blob, se houver
+        payload, _ = get_versioned_payload(tournament_id)
+    try:
+        state = events.replay(payload and serializer.loads(payload), rows)
+    except (ValueError, KeyError, IndexError, zlib.error) as error:
+        raise StateUnavailable(
+            f'Não foi possível reproduzir o log de eventos: {error}'
+        ) from error
+    if rows:
+        version = max(version, rows[-1]['event_id'])
+        if state is not None and len(rows) >= SNAPSHOT_INTERVAL:
+            set_snapshot(
+                tournament_id, rows[-1]['event_id'], serializer.dumps(state)
+            )
+    return state, version
+
+
+class StateCache:
+    """
+    Estado de um campeonato no formato do serializer, compartilhado por
+    todas as sessões do processo: cada sessão decodifica a sua cópia, o
+    que custa menos que copiar o `Bracket` já montado. Guarda a versão
+    lida do banco para saber quando buscar de novo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.payload = None
+
+
+@st.cache_resource
+def state_cache(tournament_id):
+    return StateCache()
+
+
+@st.cache_resource
+def local_store():
+    """Armazenamento local do processo, se LOCAL_STORE_PATH foi definido."""
+    return LocalStore(LOCAL_STORE_PATH) if LOCAL_STORE_PATH else None
+
+
+class RemoteUnavailable(Exception):
+    """O banco central falhou há pouco: a leitura nem foi tentada."""
+
+
+# Erros de leitura que levam a página ao modo sem conexão
+OFFLINE_ERRORS = (*TRANSIENT_ERRORS, RemoteUnavailable)
+
+
+class Connectivity:
+    """
+    Situação da conexão com o banco central, compartilhada por todas as
+    sessões do processo: até quando as leituras são puladas e quantas
+    falhas seguidas houve.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def available(self) -> bool:
+        with self.lock:
+            return time.monotonic() >= self.retry_at
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            self.retry_at = time.monotonic() + min(
+                OFFLINE_BACKOFF_SECONDS * 2 ** min(self.failures - 1, 16),
+                MAX_OFFLINE_BACKOFF_SECONDS,
+            )
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.retry_at = 0.0
+
+
+@st.cache_resource
+def connectivity():
+    return Connectivity()
+
+
+def remote_read(read, *args):
+    """
+    Leitura no banco central. Com armazenamento local, uma falha de
+    conexão faz as próximas leituras (de qualquer sessão) levantarem
+    RemoteUnavailable sem tentar, até o fim da espera; a fila de gravação
+    continua tentando por conta própria.
+    """
+    if local_store() is None:
+        return read(*args)
+    link = connectivity()
+    if not link.available():
+        raise RemoteUnavailable
+    try:
+        result = read(*args)
+    except TRANSIENT_ERRORS:
+        link.failed()
+        raise
+    link.succeeded()
+    return result
+
+
+def offline_state(store, tournament_id):
+    """
+    Estado sem conexão com o banco central: a réplica local mais os
+    placares ainda não sincronizados. Retorna o estado e a versão da
+    réplica.
+    """
+    payload, version = store.replica(tournament_id)
+    state = serializer.loads(payload)
+    for _, changes in store.pending(tournament_id):
+        state.merge_changes(changes)
+    return state, version
 
 
 def load_state():
-    """Carrega o estado da aplicação do banco de dados de forma segura."""
-    base64_string = get_state()
-    if not base64_string:
-        return None
+    """
+    Carrega o estado do campeonato da sessão usando o cache compartilhado:
+    uma consulta barata da versão e, só se outro escritor a alterou, a
+    busca do estado completo. Sem conexão, usa a réplica local (se houver
+    armazenamento local). Retorna uma cópia do estado e a sua versão.
+    """
+    tournament_id = st.session_state.tournament_id
+    cache = state_cache(tournament_id)
+    store = local_store()
     try:
-        encode_bytes = base64.b64decode(base64_string)
-        if not encode_bytes:
-            return None
-        return pickle.loads(encode_bytes)
-    except (pickle.UnpicklingError, base64.binascii.Error, EOFError):
+        version = remote_read(get_state_version, tournament_id)
+        with cache.lock:
+            if cache.version != version:
+                # A conexão pode cair entre as duas leituras: o cache só
+                # muda depois que a busca do estado completo deu certo
+                try:
+                    state, cache.version = remote_read(
+                        fetch_state, tournament_id
+                    )
+                except StateUnavailable as error:
+                    st.error(str(error))
+                    state, cache.version = None, version
+                cache.payload = (
+                    None if state is None else serializer.dumps(state)
+                )
+                if store is not None and cache.payload is not None:
+                    store.save_replica(
+                        tournament_id, cache.payload, cache.version
+                    )
+            payload, version = cache.payload, cache.version
+    except OFFLINE_ERRORS:
+        if store is None or store.replica(tournament_id) is None:
+            raise
+        st.session_state.offline = True
+        return offline_state(store, tournament_id)
+    st.session_state.offline = False
+    # Cada sessão altera a sua própria cópia do estado
+    state = None if payload is None else serializer.loads(payload)
+    return state, version
+
+
+@st.cache_data(ttl=LIVE_VERSION_TTL_SECONDS, show_spinner=False)
+def current_state_version(tournament_id):
+    """
+    Versão do estado do campeonato, compartilhada por todas as sessões por
+    alguns segundos: muitos espectadores geram uma só consulta ao banco.
+    """
+    return get_state_version(tournament_id)
+
+
+def remote_state_version():
+    """
+    Versão compartilhada do estado, ou None se o banco central está fora
+    de alcance e há armazenamento local para seguir sem ele.
+    """
+    try:
+        version = remote_read(
+            current_state_version, st.session_state.tournament_id
+        )
+    except OFFLINE_ERRORS:
+        if local_store() is None:
+            raise
+        st.session_state.offline = True
         return None
+    st.session_state.offline = False
+    return version
+
+
+def refresh_state():
+    """
+    Troca o estado da sessão pelo mais recente, reiniciando apenas os campos
+    dos jogos cujo placar mudou. Retorna True se atletas ou jogos mudaram
+    (e não só placares).
+    """
+    old = st.session_state.bracket_maker
+    new, st.session_state.state_version = load_state()
+    if new is None:
+        return False
+    st.session_state.bracket_maker = new
+    old_scores = {
+        match.number: (match.score1, match.score2)
+        for match in old.all_matches()
+    }
+    reset_score_inputs({
+        match.number
+        for match in new.all_matches()
+        if old_scores.get(match.number) != (match.score1, match.score2)
+    })
+    if old.structure() == new.structure():
+        return False
+    pending_changes().clear()
+    return True
+
+
+# --- ARQUIVOS ESTÁTICOS ---
+@st.cache_data
+def initial_roster():
+    """
+    Limite, chaves e atletas de initial_state.pkl, o cadastro restaurado
+    por "Resetar Campeonato". Lido do disco uma vez por processo.
+    """
+    with open(ASSET_DIR / 'initial_state.pkl', 'rb') as f:
+        state = pickle.load(f)
+    return (
+        state.limit,
+        state.groups,
+        {group: state.athletes(group) for group in state.groups},
+    )
 
 
 # --- TEMA E ÍCONE DA PÁGINA ---
@@ -38,111 +526,948 @@ st.set_page_config(
 
 
 # --- FUNÇÃO DE EXIBIÇÃO DE JOGOS ---
-def display_match_results(bracket_side, bracket_data):
-    st.subheader(f'Jogos da Chave {bracket_side.capitalize()}')
-    with st.form(key=f'form_{bracket_side}'):
-        for i, match in enumerate(bracket_data, 1):
-            dupla1_str = f'{match["first"][0]} & {match["first"][1]}'
-            dupla2_str = f'{match["second"][0]} & {match["second"][1]}'
+def reset_score_inputs(numbers=None):
+    """
+    Descarta os valores dos campos de placar guardados na sessão (de todos
+    os jogos ou só dos jogos em `numbers`), que voltam a ler o estado.
+    """
+    for key in [
+        key
+        for key in st.session_state
+        if key.startswith(('score1_', 'score2_'))
+        and (numbers is None or int(key.split('_')[1]) in numbers)
+    ]:
+        del st.session_state[key]
+
+
+def group_label(group):
+    """Nome de exibição de um grupo (chave)."""
+    return GROUP_LABELS.get(group, group)
+
+
+def group_names(count):
+    """Nomes dos grupos de um campeonato com `count` chaves."""
+    if count == len(DEFAULT_GROUPS):
+        return DEFAULT_GROUPS
+    return tuple(ascii_uppercase[:count])
+
+
+def pending_changes():
+    """
+    Placares alterados e ainda não gravados, por número do jogo. Sobrevivem
+    à troca de chave, para que todas as quadras sejam salvas de uma vez, e
+    são descartados quando atletas ou jogos mudam.
+    """
+    return st.session_state.setdefault('pending_changes', {})
+
+
+def stage_changes(bracket_data):
+    """Guarda os placares digitados que diferem dos já gravados."""
+    pending = pending_changes()
+    for match in bracket_data:
+        score = (
+            st.session_state[f'score1_{match.number}'],
+            st.session_state[f'score2_{match.number}'],
+        )
+        if score == (match.score1 or 0, match.score2 or 0):
+            pending.pop(match.number, None)
+        else:
+            pending[match.number] = ScoreChange(
+                match.number,
+                (match.first, match.second),
+                (match.score1, match.score2),
+                score,
+            )
+
+
+def score_writer():
+    """
+    Fila de gravação dos placares da sessão (ver writer.py). A primeira
+    fila do processo reenvia o que ficou no armazenamento local.
+    """
+    if 'score_writer' not in st.session_state:
+        store = local_store()
+        tournament_id = st.session_state.tournament_id
+        write = (
+            functools.partial(
+                sync_results, store, connectivity(), tournament_id
+            )
+            if store
+            else functools.partial(save_results, tournament_id)
+        )
+        st.session_state.score_writer = ScoreWriter(
+            write,
+            retry_on=TRANSIENT_ERRORS,
+            store=store,
+            tournament_id=tournament_id,
+        )
+        if store is not None:
+            resend_orphans(st.session_state.score_writer, store)
+    return st.session_state.score_writer
+
+
+def resend_orphans(writer, store):
+    """
+    Reenvia os placares confirmados localmente por uma execução anterior
+    do processo e que não chegaram ao banco central.
+    """
+    orphans = store.take_orphans(st.session_state.tournament_id)
+    if not orphans:
+        return
+    bracket_maker = st.session_state.bracket_maker
+    changes = [change for entry in orphans.values() for change in entry]
+    conflicts = bracket_maker.merge_changes(changes)
+    changes = [change for change in changes if change not in conflicts]
+    writer.submit(
+        bracket_maker,
+        changes,
+        st.session_state.state_version,
+        entries=list(orphans),
+    )
+    reset_score_inputs()
+    if conflicts:
+        st.warning(conflict_warning(conflicts))
+
+
+def save_pending_changes(bracket_maker):
+    """
+    Envia de uma só vez os placares guardados de todas as chaves para a
+    fila de gravação, sem esperar o banco. Retorna quantos foram enviados.
+    """
+    pending = pending_changes()
+    scores = {
+        match.number: (match.score1, match.score2)
+        for match in bracket_maker.all_matches()
+    }
+    changes = [
+        change
+        for change in pending.values()
+        if scores.get(change.number) != change.score
+    ]
+    # O estado pode ter sido atualizado depois que os placares foram
+    # guardados: quem mudou nesse meio-tempo é conflito
+    conflicts = bracket_maker.merge_changes(changes)
+    changes = [change for change in changes if change not in conflicts]
+    score_writer().submit(
+        bracket_maker, changes, st.session_state.state_version
+    )
+    pending.clear()
+    # Os campos voltam a ler o estado, que já tem os placares enviados
+    reset_score_inputs()
+    if conflicts:
+        st.session_state.save_warning = conflict_warning(conflicts)
+    return len(changes)
+
+
+def conflict_warning(conflicts):
+    """Aviso dos placares descartados por conflito."""
+    return (
+        f'{len(conflicts)} placar(es) foram alterados por outro marcador '
+        'ao mesmo tempo e não foram salvos.'
+    )
+
+
+def display_save_status():
+    """
+    Situação da fila de gravação: placares pendentes, falhas e conflitos.
+    Depois de gravar, a sessão adota a versão gravada (sem recarregar).
+    """
+    writer = st.session_state.get('score_writer')
+    if writer is None:
+        return
+    status = writer.status()
+    if (
+        not status.pending
+        and status.version is not None
+        and status.version > st.session_state.state_version
+    ):
+        st.session_state.state_version = status.version
+    if status.conflicts:
+        # Mostra o placar gravado pelo outro marcador
+        refresh_state()
+        st.warning(conflict_warning(status.conflicts))
+    if status.failed:
+        st.error(
+            f'{status.pending} placar(es) ainda não foram salvos: '
+            f'{status.error}'
+        )
+        if st.button('Tentar salvar de novo', key='retry_save'):
+            writer.retry()
+            st.rerun(scope='fragment')
+    elif status.pending and status.attempt and writer.store is not None:
+        st.caption(
+            f'📴 {status.pending} placar(es) guardado(s) neste aparelho; '
+            'serão enviados quando a conexão voltar.'
+        )
+    elif status.pending:
+        retrying = (
+            f' (tentativa {status.attempt + 1}: banco indisponível)'
+            if status.attempt
+            else ''
+        )
+        st.caption(f'💾 Salvando {status.pending} placar(es)...{retrying}')
+    elif status.saved:
+        st.caption('✅ Todos os placares enviados estão salvos.')
+
+
+def visible_matches(group, bracket_data):
+    """
+    Jogos a exibir, com a sua posição na tabela: os próximos ainda sem
+    placar ou uma página da lista completa. Os demais não são renderizados.
+    """
+    numbered = list(enumerate(bracket_data, 1))
+    view = st.radio(
+        'Exibir',
+        MATCH_VIEWS,
+        horizontal=True,
+        key=f'view_{group}',
+        label_visibility='collapsed',
+    )
+    if view == MATCH_VIEWS[0]:
+        pending = pending_changes()
+        upcoming = [
+            (i, match)
+            for i, match in numbered
+            if match.winner is None or match.number in pending
+        ]
+        if not upcoming:
+            st.info('Todos os jogos desta chave já têm placar.')
+        return upcoming[:MATCHES_PER_PAGE]
+
+    pages = max(1, math.ceil(len(numbered) / MATCHES_PER_PAGE))
+    page = st.number_input(
+        f'Página (de {pages})',
+        min_value=1,
+        max_value=pages,
+        key=f'page_{group}',
+    )
+    start = (min(page, pages) - 1) * MATCHES_PER_PAGE
+    return numbered[start : start + MATCHES_PER_PAGE]
+
+
+def display_match_results(group, bracket_data, title=None, label=None):
+    """
+    Campos de placar dos jogos. `label(i, match)` dá o nome de cada jogo
+    (por padrão, "Jogo i").
+    """
+    bracket_maker = st.session_state.bracket_maker
+    pending = pending_changes()
+    bracket_side = group_label(group)
+    st.subheader(title or f'Jogos da Chave {bracket_side}')
+    shown = visible_matches(group, bracket_data)
+    if not shown:
+        return
+    with st.form(key=f'form_{group}'):
+        for i, match in shown:
+            dupla1_str = ' & '.join(bracket_maker.pair_names(match.first))
+            dupla2_str = ' & '.join(bracket_maker.pair_names(match.second))
+            change = pending.get(match.number)
+            score = change.score if change else (match.score1, match.score2)
             with st.container(border=True):
-                st.markdown(f'**Jogo {i}**: `{dupla1_str}` vs `{dupla2_str}`')
+                name = label(i, match) if label else f'Jogo {i}'
+                st.markdown(f'**{name}**: `{dupla1_str}` vs `{dupla2_str}`')
                 cols = st.columns(2)
                 with cols[0]:
-                    score1 = st.number_input(
+                    st.number_input(
                         'Placar Dupla 1',
                         min_value=0,
-                        value=match.get('score1', 0),
-                        key=f'{bracket_side}_{i}_score1',
+                        value=score[0] or 0,
+                        key=f'score1_{match.number}',
                         label_visibility='collapsed',
                     )
                 with cols[1]:
-                    score2 = st.number_input(
+                    st.number_input(
                         'Placar Dupla 2',
                         min_value=0,
-                        value=match.get('score2', 0),
-                        key=f'{bracket_side}_{i}_score2',
+                        value=score[1] or 0,
+                        key=f'score2_{match.number}',
                         label_visibility='collapsed',
                     )
-                if 'winner' in match:
+                if change:
+                    st.caption('✏️ Guardado, ainda não salvo')
+                elif match.winner:
                     status_text = ''
-                    if match['winner'] == 'dupla1':
+                    if match.winner == 'dupla1':
                         status_text = f'👑 Parcial: **{dupla1_str}** vencendo'
-                    elif match['winner'] == 'dupla2':
+                    elif match.winner == 'dupla2':
                         status_text = f'👑 Parcial: **{dupla2_str}** vencendo'
                     else:
                         status_text = '🤝 Parcial: Empate'
                     st.caption(status_text)
-        submitted = st.form_submit_button(
-            'Salvar Parciais / Resultados', use_container_width=True
-        )
-        if submitted:
-            for i, match in enumerate(bracket_data, 1):
-                score1_val = st.session_state[f'{bracket_side}_{i}_score1']
-                score2_val = st.session_state[f'{bracket_side}_{i}_score2']
-                if score1_val > score2_val:
-                    match['winner'] = 'dupla1'
-                elif score2_val > score1_val:
-                    match['winner'] = 'dupla2'
-                else:
-                    match['winner'] = 'draw'
-                match['score1'], match['score2'] = score1_val, score2_val
-            save_state(st.session_state.bracket_maker)
-            st.toast(
-                f'Placares da Chave {bracket_side.capitalize()} atualizados!'
+        cols = st.columns(2)
+        with cols[0]:
+            staged = st.form_submit_button(
+                'Guardar', use_container_width=True, key=f'stage_{group}'
             )
+        with cols[1]:
+            submitted = st.form_submit_button(
+                'Salvar todas as quadras',
+                use_container_width=True,
+                type='primary',
+                key=f'submit_{group}',
+            )
+        if (staged or submitted) and group == PLAYOFF_GROUP:
+            # Na fase final alguém precisa vencer: empates não são guardados
+            typed = {
+                match.number: (
+                    st.session_state[f'score1_{match.number}'],
+                    st.session_state[f'score2_{match.number}'],
+                )
+                for _, match in shown
+            }
+            draws = [
+                label(i, match) if label else f'Jogo {i}'
+                for i, match in shown
+                if typed[match.number][0] == typed[match.number][1]
+                and typed[match.number]
+                != (match.score1 or 0, match.score2 or 0)
+            ]
+            if draws:
+                st.error(
+                    f'A fase final não tem empates: corrija o placar de '
+                    f'{", ".join(draws)}.'
+                )
+                return
+        if staged or submitted:
+            stage_changes([match for _, match in shown])
+        if submitted:
+            saved = save_pending_changes(bracket_maker)
+            st.toast(f'{saved} placar(es) enviado(s) para gravação!')
+        if staged or submitted:
             st.rerun()
 
 
 # --- FUNÇÃO DE RANKING ---
-def calculate_and_display_ranking(
-    bracket_side_name, bracket_data, athletes_list
-):
-    st.subheader(f'Ranking da Chave {bracket_side_name.capitalize()}')
-    point_counts = {player: 0 for player in athletes_list}
-    for match in bracket_data:
-        if 'winner' in match:
-            pair1_players, pair2_players = match['first'], match['second']
-            score1, score2 = match.get('score1', 0), match.get('score2', 0)
-            for player in pair1_players:
-                if player in point_counts:
-                    point_counts[player] += score1
-            for player in pair2_players:
-                if player in point_counts:
-                    point_counts[player] += score2
-    if not any(point_counts.values()):
+def calculate_and_display_ranking(bracket_maker, side):
+    st.subheader(f'Ranking da Chave {group_label(side)}')
+    # Ranking incremental do Bracket, já ordenado (com o confronto direto
+    # entre empatados): nada é recalculado a cada atualização da página
+    standings = bracket_maker.standings(side)
+    if not any(standing.played for standing, _ in standings):
         st.info('Aguardando o registro dos primeiros resultados.')
         return
-    ranking_df = pd.DataFrame(
-        list(point_counts.items()), columns=['Atleta', 'Pontos']
+    st.dataframe(
+        [
+            {
+                'Posição': position,
+                'Atleta': bracket_maker.names[standing.athlete],
+                'Pontos': standing.points,
+                'Sofridos': standing.points - standing.diff,
+                'Vitórias': standing.wins,
+                'Aproveitamento': standing.wins / (standing.played or 1),
+                'Saldo': standing.diff,
+                'Confronto direto': head_to_head,
+            }
+            for position, (standing, head_to_head) in enumerate(standings, 1)
+        ],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Aproveitamento': st.column_config.ProgressColumn(
+                format='percent', min_value=0, max_value=1
+            ),
+        },
+    )
+
+
+def show_odds(placeholder, bracket_maker, result):
+    """Tabela das chances, da maior para a menor."""
+    rows = sorted(
+        zip(
+            result.athletes,
+            result.qualify,
+            result.first,
+            result.mean_position,
+            result.status,
+        ),
+        key=lambda row: (-row[1], row[3]),
+    )
+    with placeholder.container():
+        st.dataframe(
+            {
+                'Atleta': [bracket_maker.names[row[0]] for row in rows],
+                'Classificação': [row[1] for row in rows],
+                '1º lugar': [row[2] for row in rows],
+                'Posição média': [round(row[3], 1) for row in rows],
+                'Situação': [row[4] for row in rows],
+            },
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                name: st.column_config.ProgressColumn(
+                    format='percent', min_value=0, max_value=1
+                )
+                for name in ('Classificação', '1º lugar')
+            },
+        )
+        st.caption(
+            f'{result.simulations} simulação(ões) dos {result.remaining} '
+            'jogo(s) restante(s)' + ('' if result.done else ', calculando…')
+        )
+
+
+def display_qualification_odds(bracket_maker, side):
+    """
+    Chance de cada atleta terminar entre os classificados da chave (ver
+    odds.py). O fragmento ao vivo reexecuta esta função a cada poucos
+    segundos: a simulação de cada chave fica na sessão, por versão do
+    estado, e só recomeça quando o estado muda; a cada execução ela avança
+    por até ODDS_TIME_BUDGET, até o teto de simulações.
+    """
+    if not st.toggle('🎯 Chances de classificação', key=f'odds_{side}'):
+        return
+    # Só aqui: o NumPy não entra na partida a frio
+    import odds  # noqa: PLC0415
+
+    qualifiers = st.number_input(
+        'Classificados por chave',
+        min_value=1,
+        max_value=bracket_maker.limit,
+        value=min(4, bracket_maker.limit),
+        key=f'odds_qualifiers_{side}',
+    )
+    version = (st.session_state.tournament_id, st.session_state.state_version)
+    simulations = st.session_state.setdefault('odds_simulations', {})
+    simulation = simulations.get((version, side, qualifiers))
+    if simulation is None:
+        # As simulações de versões anteriores do estado não servem mais
+        for key in [key for key in simulations if key[0] != version]:
+            del simulations[key]
+        simulation = simulations[version, side, qualifiers] = odds.Simulation(
+            bracket_maker, side, qualifiers, max_score=MAX_SCORE
+        )
+    placeholder = st.empty()
+    if simulation.simulations:
+        show_odds(placeholder, bracket_maker, simulation.odds())
+    for result in simulation.run(ODDS_TIME_BUDGET):
+        show_odds(placeholder, bracket_maker, result)
+
+
+def display_export(bracket_maker):
+    """Download dos jogos e das estatísticas de todas as chaves."""
+    with st.expander('📤 Exportar Campeonato'):
+        # As tabelas (e o pandas) só são montadas quando pedidas
+        if not st.toggle('Preparar arquivos', key='export_ready'):
+            return
+        # Só aqui: o pandas não entra na partida a frio
+        import stats  # noqa: PLC0415
+
+        file_format = st.radio(
+            'Formato',
+            stats.EXPORT_FORMATS,
+            format_func=str.upper,
+            horizontal=True,
+            key='export_format',
+        )
+        matches = stats.match_table(bracket_maker)
+        tables = {
+            'jogos': matches,
+            'atletas': stats.athlete_stats(bracket_maker, matches),
+        }
+        for name, table in tables.items():
+            st.download_button(
+                f'Baixar {name}',
+                stats.export_table(table, file_format),
+                file_name=f'{name}.{file_format}',
+                mime=stats.MIME_TYPES[file_format],
+                use_container_width=True,
+            )
+
+
+# --- AGENDA DAS QUADRAS ---
+def display_schedule(bracket_maker):
+    """Jogos de todas as chaves distribuídos nas quadras, por horário."""
+    with st.expander('🗓️ Agenda das Quadras'):
+        cols = st.columns([1, 2], vertical_alignment='bottom')
+        with cols[0]:
+            courts = st.number_input(
+                'Quadras',
+                min_value=1,
+                value=max(
+                    map(len, bracket_maker.schedule), default=DEFAULT_COURTS
+                ),
+                key='courts',
+            )
+        with cols[1]:
+            if st.button('Gerar Agenda', use_container_width=True):
+                with st.spinner('Montando a agenda...'):
+                    bracket_maker.gen_schedule(courts)
+                save_state(bracket_maker, events.SCHEDULE)
+                st.rerun()
+        if not bracket_maker.schedule:
+            st.info(
+                'Informe o número de quadras e gere a agenda: a ordem dos '
+                'jogos passa a seguir os horários.'
+            )
+            return
+
+        positions = {
+            match.number: f'{group_label(side)} · Jogo {i}'
+            for side in bracket_maker.groups
+            for i, match in enumerate(
+                bracket_maker.shuffle_brackets[side]
+                or bracket_maker.brackets[side],
+                1,
+            )
+        }
+        scheduled = bracket_maker.scheduled_matches()
+        stats = bracket_maker.schedule_stats()
+        st.caption(
+            f'{stats["makespan"]} horários · {stats["consecutive"]} jogo(s) '
+            f'seguido(s) de um mesmo atleta · maior espera: '
+            f'{stats["max_wait"]} horário(s)'
+        )
+        table = {'Horário': range(1, len(scheduled) + 1)}
+        for court in range(max(map(len, scheduled))):
+            table[f'Quadra {court + 1}'] = [
+                (
+                    positions[slot[court].number]
+                    + (' ✅' if slot[court].winner else '')
+                    if court < len(slot)
+                    else ''
+                )
+                for slot in scheduled
+            ]
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+
+# --- HISTÓRICO DE PLACARES (MODO 'events') ---
+def display_score_history(bracket_maker):
+    """Últimas alterações de placar, lidas do log de eventos."""
+    with st.expander('📜 Histórico de Placares'):
+        positions = {
+            match.number: f'{group_label(side)} · Jogo {i}'
+            for side in bracket_maker.groups
+            for i, match in enumerate(
+                bracket_maker.shuffle_brackets[side]
+                or bracket_maker.brackets[side],
+                1,
+            )
+        }
+        try:
+            rows = remote_read(
+                get_events,
+                st.session_state.tournament_id,
+                events.SCORES,
+                SCORE_HISTORY_SIZE,
+            )
+        except OFFLINE_ERRORS:
+            st.info('Histórico indisponível sem conexão com o banco central.')
+            return
+        history = {'Quando': [], 'Jogo': [], 'Antes': [], 'Depois': []}
+        for row in rows:
+            for change in events.read_scores(json.loads(row['payload'])):
+                previous1, previous2 = change.previous
+                score1, score2 = change.score
+                history['Quando'].append(row['created'])
+                history['Jogo'].append(
+                    positions.get(change.number, f'#{change.number}')
+                )
+                history['Antes'].append(
+                    '-' if previous1 is None else f'{previous1} x {previous2}'
+                )
+                history['Depois'].append(f'{score1} x {score2}')
+        if not history['Jogo']:
+            st.info('Nenhum placar registrado ainda.')
+            return
+        st.dataframe(history, use_container_width=True, hide_index=True)
+
+
+# --- FASE FINAL ---
+def display_playoff_setup(bracket_maker):
+    """Geração (ou descarte) da fase final a partir do ranking."""
+    with st.expander('🏅 Fase Final'):
+        if bracket_maker.playoff:
+            st.info(
+                f'Fase final com {len(bracket_maker.playoff.pairs)} duplas. '
+                'Descarte-a para gerar de novo com outro ranking ou formato.'
+            )
+            if st.button('Descartar Fase Final', use_container_width=True):
+                bracket_maker.playoff = None
+                save_state(bracket_maker, events.PLAYOFF)
+                st.rerun()
+            return
+        unplayed = sum(
+            match.winner is None for match in bracket_maker.matches()
+        )
+        if unplayed:
+            st.warning(
+                f'{unplayed} jogo(s) das chaves ainda sem placar: o ranking '
+                'atual será usado.'
+            )
+        qualifiers = st.number_input(
+            'Classificados por chave',
+            min_value=1,
+            max_value=bracket_maker.limit,
+            value=min(4, bracket_maker.limit),
+            key='playoff_qualifiers',
+        )
+        double = st.radio(
+            'Formato',
+            (False, True),
+            format_func=lambda double: (
+                'Dupla eliminação' if double else 'Eliminação simples'
+            ),
+            horizontal=True,
+            key='playoff_double',
+        )
+        rule = st.radio(
+            'Duplas',
+            playoff.PAIRING_RULES,
+            format_func=PAIRING_LABELS.get,
+            horizontal=True,
+            key='playoff_rule',
+        )
+        if st.button('Gerar Fase Final', use_container_width=True):
+            try:
+                bracket_maker.gen_playoff(qualifiers, double, rule)
+            except ValueError as error:
+                st.error(str(error))
+                return
+            save_state(bracket_maker, events.PLAYOFF)
+            st.session_state.selected_group = PLAYOFF_GROUP
+            st.rerun()
+
+
+def pair_label(bracket_maker, pair):
+    """Nome de exibição de um lado de um jogo da fase final."""
+    if pair == PENDING:
+        return 'A definir'
+    if pair == BYE:
+        return 'Folga'
+    return ' & '.join(bracket_maker.pair_names(pair))
+
+
+def display_playoff(bracket_maker):
+    """Placares dos jogos da fase final e a árvore completa."""
+    knockout = bracket_maker.playoff
+    col3, col4 = st.columns(2)
+    with col3:
+        display_match_results(
+            PLAYOFF_GROUP,
+            knockout.playable(),
+            title='Jogos da Fase Final',
+            label=lambda i, match: knockout.round_name(match),
+        )
+    with col4:
+        st.header('🏅 Chave da Fase Final')
+        champion = knockout.champion()
+        if champion:
+            st.success(f'🏆 Campeões: {pair_label(bracket_maker, champion)}')
+        # Jogos com folga não são exibidos: a dupla avança sem jogar
+        games = [
+            match
+            for match in knockout.matches
+            if BYE not in (match.first, match.second)
+        ]
+        st.dataframe(
+            {
+                'Rodada': [knockout.round_name(match) for match in games],
+                'Dupla 1': [
+                    pair_label(bracket_maker, match.first) for match in games
+                ],
+                'Placar': [
+                    f'{match.score1} x {match.score2}' if match.winner else ''
+                    for match in games
+                ],
+                'Dupla 2': [
+                    pair_label(bracket_maker, match.second) for match in games
+                ],
+            },
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
+# --- JOGOS E RANKING, ATUALIZADOS AO VIVO ---
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+@metrics.timed('app.live_results')
+def display_live_results():
+    """
+    Jogos e ranking. Reexecutado sozinho a cada poucos segundos: quando
+    outro marcador salva, só esta parte da página é refeita.
+    """
+    display_save_status()
+    # Durante o envio de placares (e enquanto a fila grava) o estado não é
+    # trocado: conflitos com outros marcadores são tratados ao salvar
+    writer = st.session_state.get('score_writer')
+    submitting = (writer is not None and writer.busy()) or any(
+        st.session_state[key]
+        for key in st.session_state
+        if key.startswith(('submit_', 'stage_'))
+    )
+    if (
+        not submitting
+        and remote_state_version()
+        not in {None, st.session_state.state_version}
+        and refresh_state()
+    ):
+        st.rerun()
+    if st.session_state.get('offline'):
+        st.warning(
+            'Sem conexão com o banco central: exibindo a cópia local. Os '
+            'placares enviados ficam guardados e são sincronizados depois.'
+        )
+    bracket_maker = st.session_state.bracket_maker
+
+    if not any(bracket_maker.brackets.values()):
+        return
+
+    st.header('Resultados e Parciais dos Jogos')
+    if st.button('Embaralhar Ordem dos Jogos', use_container_width=True):
+        for group in bracket_maker.groups:
+            bracket_maker.gen_shuffle_brackets(group)
+        save_state(bracket_maker, events.SHUFFLE)
+        st.rerun()
+    display_schedule(bracket_maker)
+    display_playoff_setup(bracket_maker)
+    if STORAGE_MODE == 'events':
+        display_score_history(bracket_maker)
+
+    pending = pending_changes()
+    if pending:
+        st.caption(
+            f'{len(pending)} placar(es) guardado(s), aguardando '
+            '"Salvar todas as quadras".'
+        )
+
+    # Só o grupo escolhido é renderizado
+    group = st.radio(
+        'Chave',
+        bracket_maker.groups
+        + ((PLAYOFF_GROUP,) if bracket_maker.playoff else ()),
+        format_func=group_label,
+        horizontal=True,
+        key='selected_group',
+    )
+    if group == PLAYOFF_GROUP:
+        display_playoff(bracket_maker)
+        return
+    display_brackets = (
+        bracket_maker.shuffle_brackets[group] or bracket_maker.brackets[group]
     )
-    ranking_df = ranking_df.sort_values(
-        by='Pontos', ascending=False
-    ).reset_index(drop=True)
-    ranking_df.index += 1
-    ranking_df = ranking_df.rename_axis('Posição').reset_index()
-    st.dataframe(ranking_df, use_container_width=True, hide_index=True)
+    col3, col4 = st.columns(2)
+    with col3:
+        display_match_results(group, display_brackets)
+    with col4:
+        st.header('🏆 Ranking de Pontos')
+        if any(match.winner for match in display_brackets):
+            calculate_and_display_ranking(bracket_maker, group)
+            display_qualification_odds(bracket_maker, group)
+        else:
+            st.info(
+                'O ranking será exibido aqui assim que os primeiros resultados forem registrados.'
+            )
+
+
+# --- CADASTRO DE ATLETAS ---
+def resolve_group(value, groups):
+    """Grupo de `groups` pelo nome ou pelo nome de exibição (ou None)."""
+    lookup = {group.casefold(): group for group in groups}
+    lookup.update({group_label(group).casefold(): group for group in groups})
+    return lookup.get(value.strip().casefold())
+
+
+def register_roster(groups, names, sides=None):
+    """
+    Cria o campeonato com os atletas informados, de uma só vez. `sides`
+    traz a chave de cada atleta (nome ou nome de exibição); sem ela, as
+    chaves são sorteadas. Retorna uma mensagem de erro, se a lista não
+    puder ser cadastrada.
+    """
+    if sides is not None:
+        resolved = [resolve_group(side, groups) for side in sides]
+        unknown = {
+            side or '(vazia)'
+            for side, group in zip(sides, resolved)
+            if group is None
+        }
+        if unknown:
+            return f'Chaves desconhecidas: {", ".join(sorted(unknown))}.'
+        sides = resolved
+
+    unique = unique_names(names)
+    if sides is None:
+        if not unique or len(unique) % len(groups):
+            return (
+                f'O número de atletas ({len(unique)}, sem repetidos) deve '
+                'ser múltiplo do número de chaves.'
+            )
+        limit = len(unique) // len(groups)
+    else:
+        sides = [sides[i] for i, _ in unique]
+        sizes = Counter(sides)
+        if set(sizes) != set(groups) or len(set(sizes.values())) != 1:
+            return 'Todas as chaves devem ter o mesmo número de atletas.'
+        limit = len(unique) // len(groups)
+
+    bracket = Bracket(limit=limit, groups=groups)
+    try:
+        bracket.add_athletes([name for _, name in unique], sides)
+    except ValueError as error:
+        return str(error)
+    st.session_state.bracket_maker = bracket
+    save_state(bracket, events.REGISTER)
+    return None
+
+
+# --- MÉTRICAS ---
+def display_metrics():
+    """Painel de depuração com os tempos e contadores do processo."""
+    with st.expander('🔧 Métricas'):
+        data = metrics.snapshot()
+        if data['series']:
+            st.dataframe(
+                [
+                    {
+                        'Métrica': name,
+                        **{
+                            key: round(value, 4)
+                            for key, value in summary.items()
+                        },
+                    }
+                    for name, summary in sorted(data['series'].items())
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+        if data['counters']:
+            st.dataframe(
+                [
+                    {'Contador': name, 'Valor': value}
+                    for name, value in sorted(data['counters'].items())
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+        st.download_button(
+            'Baixar (Prometheus)',
+            metrics.prometheus_text(),
+            file_name='metrics.txt',
+            mime='text/plain',
+        )
+        if st.button('Zerar métricas'):
+            metrics.reset()
+            st.rerun()
+
+
+# --- CAMPEONATOS ---
+@st.cache_data(ttl=TOURNAMENTS_TTL_SECONDS, show_spinner=False)
+def tournaments():
+    """Nomes dos campeonatos por id, compartilhados pelas sessões."""
+    return {row['tournament_id']: row['name'] for row in list_tournaments()}
+
+
+def available_tournaments():
+    """
+    Campeonatos para escolher. Sem conexão com o banco central (e com
+    armazenamento local), só o da sessão.
+    """
+    try:
+        return remote_read(tournaments)
+    except OFFLINE_ERRORS:
+        if local_store() is None:
+            raise
+        tournament_id = st.session_state.get(
+            'tournament_id', DEFAULT_TOURNAMENT
+        )
+        return {tournament_id: f'Campeonato {tournament_id}'}
+
+
+def initial_tournament():
+    """Campeonato do link (?campeonato=<id>) ou o padrão."""
+    value = st.query_params.get('campeonato', '')
+    if value.isdigit() and int(value) in available_tournaments():
+        return int(value)
+    return DEFAULT_TOURNAMENT
+
+
+def switch_tournament(tournament_id):
+    """
+    Troca o campeonato da sessão. O estado dele é carregado na próxima
+    execução; os placares já enviados do anterior são gravados antes.
+    """
+    writer = st.session_state.pop('score_writer', None)
+    if writer is not None:
+        writer.flush(FLUSH_TIMEOUT_SECONDS)
+    pending_changes().clear()
+    reset_score_inputs()
+    for key in ('bracket_maker', 'state_version', 'selected_group'):
+        st.session_state.pop(key, None)
+    st.session_state.tournament_id = tournament_id
+    st.query_params['campeonato'] = str(tournament_id)
+
+
+def display_tournament_selector():
+    """Escolha do campeonato exibido e criação de um novo."""
+    names = available_tournaments()
+    current = st.session_state.tournament_id
+    ids = list(names)
+    selected = st.selectbox(
+        '🏆 Campeonato',
+        ids,
+        index=ids.index(current) if current in ids else 0,
+        format_func=names.get,
+    )
+    if selected != current:
+        switch_tournament(selected)
+        st.rerun()
+    with st.expander('Novo Campeonato'):
+        name = st.text_input(
+            'Nome (ex.: Categoria B, Mista)', key='new_tournament'
+        ).strip()
+        if st.button('Criar Campeonato'):
+            if not name:
+                st.error('Informe o nome do campeonato.')
+            elif name in names.values():
+                st.error('Já existe um campeonato com esse nome.')
+            else:
+                tournament_id = create_tournament(name)
+                tournaments.clear()
+                switch_tournament(tournament_id)
+                st.rerun()
 
 
 # --- FUNÇÃO PRINCIPAL ---
+@metrics.timed('app.render')
 def main():
     st.title('Painel do Campeonato')
+    if 'save_warning' in st.session_state:
+        st.warning(st.session_state.pop('save_warning'))
 
+    if 'tournament_id' not in st.session_state:
+        st.session_state.tournament_id = initial_tournament()
     if 'bracket_maker' not in st.session_state:
-        loaded_bracket_maker = load_state()
+        loaded_bracket_maker, st.session_state.state_version = load_state()
         if loaded_bracket_maker:
             st.session_state.bracket_maker = loaded_bracket_maker
             st.toast('Progresso anterior restaurado!')
         else:
             st.session_state.bracket_maker = Bracket(limit=8)
+    if local_store() is not None:
+        # Reenvia os placares que ficaram no armazenamento local
+        score_writer()
 
     bracket_maker = st.session_state.bracket_maker
 
     with st.sidebar:
+        display_tournament_selector()
+        st.markdown('---')
         st.header('⚙️ Configuração')
         with st.expander(
             'Adicionar Atletas',
-            expanded=not bracket_maker.athlete_by_side['left'].values,
+            expanded=not any(
+                side.values for side in bracket_maker.athlete_by_side.values()
+            ),
         ):
+            groups = group_names(
+                st.number_input(
+                    'Número de chaves',
+                    min_value=2,
+                    max_value=len(ascii_uppercase),
+                    value=len(bracket_maker.groups),
+                )
+            )
             is_random_assignment = st.toggle(
                 'Distribuir aleatoriamente', value=True
             )
@@ -150,78 +1475,51 @@ def main():
                 athletes_input = st.text_area(
                     'Insira todos os nomes', height=250
                 )
+                uploaded = st.file_uploader(
+                    'Ou envie uma lista (.txt ou .csv)', type=['txt', 'csv']
+                )
                 if st.button('Adicionar e Sortear Lados'):
-                    athletes = [
-                        name.strip()
-                        for name in athletes_input.split('\n')
-                        if name.strip()
-                    ]
-                    if athletes and len(athletes) % 2 == 0:
-                        st.session_state.bracket_maker = Bracket(
-                            limit=len(athletes) // 2
-                        )
-                        for athlete in athletes:
-                            st.session_state.bracket_maker.add_athlete(
-                                athlete, random=True
-                            )
-                        save_state(st.session_state.bracket_maker)
-                        st.rerun()
+                    text = (
+                        roster.decode(uploaded.getvalue())
+                        if uploaded
+                        else athletes_input
+                    )
+                    # Se a lista já diz a chave de cada atleta, ela é usada
+                    error = register_roster(groups, *roster.read_roster(text))
+                    if error:
+                        st.error(error)
                     else:
-                        st.error('Insira um número par de atletas.')
+                        st.rerun()
             else:
-                left_athletes_input = st.text_area(
-                    'Atletas do Lado Esquerdo', height=150
-                )
-                right_athletes_input = st.text_area(
-                    'Atletas do Lado Direito', height=150
-                )
+                athletes_inputs = {
+                    group: st.text_area(
+                        f'Atletas da Chave {group_label(group)}', height=150
+                    )
+                    for group in groups
+                }
                 if st.button('Adicionar Atletas Manualmente'):
-                    left_athletes = [
-                        name.strip()
-                        for name in left_athletes_input.split('\n')
-                        if name.strip()
-                    ]
-                    right_athletes = [
-                        name.strip()
-                        for name in right_athletes_input.split('\n')
-                        if name.strip()
-                    ]
-                    if left_athletes and len(left_athletes) == len(
-                        right_athletes
-                    ):
-                        st.session_state.bracket_maker = Bracket(
-                            limit=len(left_athletes)
-                        )
-                        for athlete in left_athletes:
-                            st.session_state.bracket_maker.add_athlete(
-                                athlete, side='left'
-                            )
-                        for athlete in right_athletes:
-                            st.session_state.bracket_maker.add_athlete(
-                                athlete, side='right'
-                            )
-                        save_state(st.session_state.bracket_maker)
-                        st.rerun()
+                    names, sides = [], []
+                    for group, athletes_input in athletes_inputs.items():
+                        group_athletes = athletes_input.splitlines()
+                        names += group_athletes
+                        sides += [group] * len(group_athletes)
+                    error = register_roster(groups, names, sides)
+                    if error:
+                        st.error(error)
                     else:
-                        st.error(
-                            'Ambos os lados devem ter o mesmo número de atletas.'
-                        )
+                        st.rerun()
 
         st.markdown('---')
         st.warning('Atenção: A ação abaixo é irreversível.')
         if st.button('🔴 Resetar Campeonato', use_container_width=True):
             try:
-                with open('initial_state.pkl', 'rb') as f:
-                    old_state = pickle.load(f)
-                new_bracket = Bracket(limit=old_state._Bracket__limit)
-                left_athletes = old_state.athlete_by_side['left'].values
-                right_athletes = old_state.athlete_by_side['right'].values
-                for athlete in left_athletes:
-                    new_bracket.add_athlete(athlete, side='left')
-                for athlete in right_athletes:
-                    new_bracket.add_athlete(athlete, side='right')
+                limit, groups, athletes = initial_roster()
+                new_bracket = Bracket(limit=limit, groups=groups)
+                for group in groups:
+                    for athlete in athletes[group]:
+                        new_bracket.add_athlete(athlete, side=group)
                 st.session_state.bracket_maker = new_bracket
-                save_state(new_bracket)
+                save_state(new_bracket, events.REGISTER)
                 st.toast(
                     'Campeonato resetado! Apenas os atletas foram mantidos.'
                 )
@@ -233,94 +1531,56 @@ def main():
             except Exception as e:
                 st.error(f'Ocorreu um erro ao resetar: {e}')
 
+        if any(bracket_maker.brackets.values()):
+            st.markdown('---')
+            display_export(bracket_maker)
+
+        if DEBUG_METRICS:
+            st.markdown('---')
+            display_metrics()
+
     st.markdown('---')
     st.header('Atletas por Chave')
-    col1, col2 = st.columns(2)
-    left_athletes_list = list(bracket_maker.athlete_by_side['left'].values)
-    right_athletes_list = list(bracket_maker.athlete_by_side['right'].values)
-    with col1:
-        st.subheader(f'Lado Esquerdo ({len(left_athletes_list)} atletas)')
-        if left_athletes_list:
-            st.info(', '.join(left_athletes_list))
-        else:
-            st.warning('Nenhum atleta adicionado.')
-    with col2:
-        st.subheader(f'Lado Direito ({len(right_athletes_list)} atletas)')
-        if right_athletes_list:
-            st.info(', '.join(right_athletes_list))
-        else:
-            st.warning('Nenhum atleta adicionado.')
+    athletes_by_group = {
+        group: bracket_maker.athletes(group) for group in bracket_maker.groups
+    }
+    columns = st.columns(min(len(athletes_by_group), GROUP_COLUMNS))
+    for i, (group, athletes) in enumerate(athletes_by_group.items()):
+        with columns[i % len(columns)]:
+            st.subheader(
+                f'Chave {group_label(group)} ({len(athletes)} atletas)'
+            )
+            if athletes:
+                st.info(', '.join(athletes))
+            else:
+                st.warning('Nenhum atleta adicionado.')
 
     st.markdown('---')
 
     # Removido o bloco de debug
 
-    if (
-        left_athletes_list
-        and right_athletes_list
-        and not bracket_maker.brackets['left']
+    if all(athletes_by_group.values()) and not any(
+        bracket_maker.brackets.values()
     ):
         if st.button('Gerar Jogos', use_container_width=True, type='primary'):
-            # Funções de geração são chamadas como antes
-            bracket_maker.gen_combinations('left')
-            bracket_maker.gen_combinations('right')
+            # Os jogos saem do modelo de tabela do tamanho de cada chave
             bracket_maker.gen_brackets()
 
             # NOVO: Bloco de verificação de segurança
-            if (
-                not bracket_maker.brackets['left']
-                or not bracket_maker.brackets['right']
-            ):
+            if not all(bracket_maker.brackets.values()):
                 st.error(
                     'Ocorreu um erro ao gerar os jogos. O algoritmo do backend não produziu um resultado. '
                     'Isso pode acontecer se o número de combinações for insuficiente. Tente resetar com um número diferente de atletas.'
                 )
             else:
                 st.success('Jogos gerados com sucesso!')
-                save_state(bracket_maker)
+                save_state(bracket_maker, events.GENERATE)
                 st.rerun()
 
-    left_display_brackets = (
-        bracket_maker.shuffle_brackets['left']
-        or bracket_maker.brackets['left']
-    )
-    right_display_brackets = (
-        bracket_maker.shuffle_brackets['right']
-        or bracket_maker.brackets['right']
-    )
-
-    if left_display_brackets:
-        st.header('Resultados e Parciais dos Jogos')
-        if st.button('Embaralhar Ordem dos Jogos', use_container_width=True):
-            bracket_maker.gen_shuffle_brackets('left')
-            bracket_maker.gen_shuffle_brackets('right')
-            save_state(bracket_maker)
-            st.rerun()
-        col3, col4 = st.columns(2)
-        with col3:
-            display_match_results('esquerda', left_display_brackets)
-        with col4:
-            display_match_results('direita', right_display_brackets)
-        st.markdown('---')
-        st.header('🏆 Ranking de Pontos')
-        has_results = any(
-            'winner' in match for match in left_display_brackets
-        ) or any('winner' in match for match in right_display_brackets)
-        if has_results:
-            rank_col1, rank_col2 = st.columns(2)
-            with rank_col1:
-                calculate_and_display_ranking(
-                    'Esquerda', left_display_brackets, left_athletes_list
-                )
-            with rank_col2:
-                calculate_and_display_ranking(
-                    'Direita', right_display_brackets, right_athletes_list
-                )
-        else:
-            st.info(
-                'O ranking será exibido aqui assim que os primeiros resultados forem registrados.'
-            )
+    display_live_results()
 
 
 if __name__ == '__main__':
+    # /metrics para o Prometheus, se METRICS_PORT estiver definido
+    metrics.start_http_server()
     main()
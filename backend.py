@@ -1,55 +1,713 @@
-# backend.py (CORRIGIDO)
+from __future__ import annotations
 
-import math
+import base64
 import random
-from collections import deque
-from dataclasses import dataclass, asdict
-from itertools import combinations, count
-from random import choice
-from typing import Deque, List, Literal, get_args
-from copy import copy
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import chain, zip_longest
+from operator import or_
+from random import randrange
+from typing import Deque, Dict, Iterable, List, Mapping, Sequence, Tuple
 
-SideVar = Literal['left', 'right']
+import metrics
+import templates
+from playoff import BALANCED, form_pairs, knockout_tree
+from scheduler import TIME_BUDGET, schedule_matches, schedule_stats
+
+# Nome de um grupo (chave); por padrão, os dois lados 'left' e 'right'
+SideVar = str
+DEFAULT_GROUPS = ('left', 'right')
+
+# Grupos a partir deste tamanho têm o modelo de tabela gerado em processos
+# paralelos, quando ainda não está gravado
+PARALLEL_GROUP_SIZE = 192
+Game = Tuple[int, int]
+# Lado de um jogo da fase final ainda sem dupla, ou com folga
+PENDING = 0
+BYE = -1
+
+
+def make_pair(first: int, second: int) -> int:
+    """Pack two athlete ids into a pair bitmask."""
+    return (1 << first) | (1 << second)
+
+
+def pair_members(pair: int) -> Tuple[int, int]:
+    """Unpack a pair bitmask into its two athlete ids."""
+    return (pair & -pair).bit_length() - 1, pair.bit_length() - 1
+
+
+def pair_columns(pairs: Sequence[int]) -> Tuple[List[int], List[int]]:
+    """Unpack many pair bitmasks into a column of each member's id."""
+    return (
+        [(pair & -pair).bit_length() - 1 for pair in pairs],
+        [pair.bit_length() - 1 for pair in pairs],
+    )
+
+
+def pack_column(values: Sequence[int]) -> str:
+    """Pack a column of ints as little-endian int32, in base64 text."""
+    column = array('i', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return base64.b64encode(column.tobytes()).decode('ascii')
+
+
+def unpack_column(text: str) -> array:
+    """Read back a column packed by `pack_column`."""
+    column = array('i', base64.b64decode(text))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def _rotation_rounds(order: List[int]) -> List[List[int]]:
+    """Split all pairs of `order` into rounds using the circle method."""
+    slots = order + [None] if len(order) % 2 else list(order)
+    half = len(slots) // 2
+    rounds = []
+    for _ in range(len(slots) - 1):
+        rounds.append([
+            make_pair(slots[i], slots[-1 - i])
+            for i in range(half)
+            if slots[i] is not None and slots[-1 - i] is not None
+        ])
+        # Mantém o primeiro slot fixo e gira os demais
+        slots.insert(1, slots.pop())
+    return rounds
+
+
+def _augment(games: List[Game], unmatched: List[int]) -> bool:
+    """Match two leftover pairs by splitting one already scheduled game."""
+    for u_index, u in enumerate(unmatched):
+        for v_index in range(u_index + 1, len(unmatched)):
+            v = unmatched[v_index]
+            for g_index, (a, b) in enumerate(games):
+                for x, y in ((a, b), (b, a)):
+                    if not u & x and not v & y:
+                        games[g_index] = (x, u)
+                        games.append((y, v))
+                        del unmatched[v_index], unmatched[u_index]
+                        return True
+    return False
+
+
+def round_robin_games(size: int, seed: int | None = None) -> List[Game]:
+    """
+    Build the maximum set of disjoint pair-vs-pair games for `size` athletes.
+
+    Every pair of athletes plays exactly once, giving C(size, 2) // 2 games
+    for any `size` >= 4. Pairs are bitmasks of athlete indexes. Without
+    `seed` the table is deterministic; with it, athletes and rounds are
+    shuffled reproducibly.
+    """
+    rng = random.Random(seed) if seed is not None else None
+    order = list(range(size))
+    if rng:
+        rng.shuffle(order)
+    rounds = _rotation_rounds(order)
+    if rng:
+        rng.shuffle(rounds)
+
+    # Cada rodada tem duplas disjuntas: basta emparelhá-las duas a duas
+    games: List[Game] = []
+    leftovers: List[int] = []
+    for pairs in rounds:
+        games.extend(zip(pairs[0::2], pairs[1::2]))
+        if len(pairs) % 2:
+            leftovers.append(pairs[-1])
+
+    # Sobras de rodadas ímpares: emparelha as disjuntas e, se preciso,
+    # desfaz um jogo já montado para encaixar as restantes
+    unmatched: List[int] = []
+    for pair in leftovers:
+        for i, other in enumerate(unmatched):
+            if not pair & other:
+                games.append((unmatched.pop(i), pair))
+                break
+        else:
+            unmatched.append(pair)
+    while len(unmatched) >= 2 and _augment(games, unmatched):
+        metrics.increment('generation.augmented_games')
+
+    return games
+
+
+def normalize_name(name: str) -> str:
+    """Normalize an athlete name: NFC form, single spaces, no edges."""
+    return ' '.join(unicodedata.normalize('NFC', name).split())
+
+
+def unique_names(
+    athletes: Iterable[str], registered: Iterable[str] = ()
+) -> List[Tuple[int, str]]:
+    """
+    Return (position, normalized name) of the first occurrence of each name,
+    ignoring case, blanks and the names in `registered`.
+    """
+    seen = {name.casefold() for name in registered}
+    unique = []
+    for i, athlete in enumerate(athletes):
+        name = normalize_name(athlete)
+        if name and name.casefold() not in seen:
+            seen.add(name.casefold())
+            unique.append((i, name))
+    return unique
+
+
+def template_games(size: int) -> List[templates.Quad]:
+    """Round-robin table of `size` athletes as (a, b, c, d) index games."""
+    return [
+        (*pair_members(first), *pair_members(second))
+        for first, second in round_robin_games(size)
+    ]
+
+
+# Modelos de tabela por tamanho de grupo (ver templates.py)
+TEMPLATES = templates.ScheduleTemplates(template_games)
+
+
+def _schedule_groups(sizes: List[int]) -> List[templates.Template]:
+    """Template of every group size; large missing ones built in parallel."""
+    missing = sorted({
+        size
+        for size in sizes
+        if size >= PARALLEL_GROUP_SIZE and not TEMPLATES.stored(size)
+    })
+    built = {}
+    if len(missing) > 1:
+        with ProcessPoolExecutor() as executor:
+            for size, games in zip(
+                missing, executor.map(template_games, missing)
+            ):
+                built[size] = TEMPLATES.add(size, games)
+    return [built.get(size) or TEMPLATES.get(size) for size in sizes]
 
 
 @dataclass
 class Side:
-    values: Deque[str]
+    values: Deque[int]
     brackets: bool = False
 
 
-@dataclass
+@dataclass(frozen=True)
+class ScoreChange:
+    """
+    A score edit made by one session: the match, identified by its number
+    and the pair bitmasks it had, and the score it replaced.
+    """
+
+    number: int
+    pairs: Tuple[int, int]
+    previous: Tuple[int | None, int | None]
+    score: Tuple[int, int]
+
+    def row(self) -> dict:
+        """Return the storage row of the edit, with the match's pairs."""
+        first_a, first_b = pair_members(self.pairs[0])
+        second_a, second_b = pair_members(self.pairs[1])
+        return {
+            'match_id': self.number,
+            'first_a': first_a,
+            'first_b': first_b,
+            'second_a': second_a,
+            'second_b': second_b,
+            'score1': self.score[0],
+            'score2': self.score[1],
+            'previous1': self.previous[0],
+            'previous2': self.previous[1],
+        }
+
+
 class Match:
-    first: tuple[str, str]
-    second: tuple[str, str]
+    """A game between two pairs, each stored as a bitmask of athlete ids."""
 
+    __slots__ = ('first', 'second', 'score1', 'score2', 'number')
 
-class Bracket:
-    def _create_side_distribution(self, side: str) -> List[str]:
-        """Cria a lista de distribuição para um lado específico."""
-        return [side for _ in range(self.__limit)]
+    def __init__(
+        self,
+        first: int,
+        second: int,
+        score1: int | None = None,
+        score2: int | None = None,
+        number: int | None = None,
+    ):
+        self.first = first
+        self.second = second
+        self.score1 = score1
+        self.score2 = score2
+        self.number = number
+
+    def __reduce__(self):
+        return Match, (
+            self.first,
+            self.second,
+            self.score1,
+            self.score2,
+            self.number,
+        )
+
+    @property
+    def winner(self) -> str | None:
+        """Return 'dupla1', 'dupla2' or 'draw', or None if not played."""
+        if self.score1 is None or self.score2 is None:
+            return None
+        if self.score1 > self.score2:
+            return 'dupla1'
+        if self.score2 > self.score1:
+            return 'dupla2'
+        return 'draw'
+
+
+class Standing:
+    """Accumulated results of one athlete in the ranking."""
+
+    __slots__ = ('athlete', 'group', 'points', 'wins', 'diff', 'played')
+
+    def __init__(
+        self,
+        athlete: int,
+        group: str,
+        points: int = 0,
+        wins: int = 0,
+        diff: int = 0,
+        played: int = 0,
+    ):
+        self.athlete = athlete
+        self.group = group
+        self.points = points
+        self.wins = wins
+        self.diff = diff
+        self.played = played
+
+    def __reduce__(self):
+        return Standing, (
+            self.athlete,
+            self.group,
+            self.points,
+            self.wins,
+            self.diff,
+            self.played,
+        )
 
-    def __init__(self, limit: int = 8):
+    def key(self) -> Tuple[int, int, int, int]:
+        """Sort key: points, then wins, then point differential."""
+        return -self.points, -self.wins, -self.diff, self.athlete
+
+    def add(self, scored: int, conceded: int, sign: int = 1) -> None:
+        """Add (or, with `sign=-1`, remove) the result of one game."""
+        self.points += sign * scored
+        self.wins += sign * (scored > conceded)
+        self.diff += sign * (scored - conceded)
+        self.played += sign
+
+
+class Ranking:
+    """
+    Incremental leaderboard of a bracket.
+
+    Each recorded match touches only its four athletes, and every group keeps
+    its standings sorted, so reading the leaderboard needs no recomputation.
+    """
+
+    def __init__(self):
+        self.standings: Dict[int, Standing] = {}
+        self.boards: Dict[str, List[Tuple[int, int, int, int]]] = {}
+
+    def register(self, athlete: int, group: str) -> None:
+        """Add an athlete with no results to the leaderboard of `group`."""
+        if athlete in self.standings:
+            return
+        standing = Standing(athlete, group)
+        self.standings[athlete] = standing
+        insort(self.boards.setdefault(group, []), standing.key())
+
+    def _apply(self, pair: int, scored: int, conceded: int, sign: int):
+        for athlete in pair_members(pair):
+            standing = self.standings.get(athlete)
+            if standing is None:
+                continue
+            board = self.boards[standing.group]
+            del board[bisect_left(board, standing.key())]
+            standing.add(scored, conceded, sign)
+            insort(board, standing.key())
+
+    def record(self, match: Match, sign: int = 1) -> None:
+        """Add (or, with `sign=-1`, remove) the result of a played match."""
+        self._apply(match.first, match.score1, match.score2, sign)
+        self._apply(match.second, match.score2, match.score1, sign)
+
+    def rebuild(self, matches: Iterable[Match]) -> None:
+        """Recompute every standing from `matches`, sorting boards once."""
+        for standing in self.standings.values():
+            standing.points = standing.wins = standing.diff = 0
+            standing.played = 0
+        for match in matches:
+            if not match.winner:
+                continue
+            for pair, scored, conceded in (
+                (match.first, match.score1, match.score2),
+                (match.second, match.score2, match.score1),
+            ):
+                for athlete in pair_members(pair):
+                    if athlete in self.standings:
+                        self.standings[athlete].add(scored, conceded)
+        boards = {group: [] for group in self.boards}
+        for standing in self.standings.values():
+            boards[standing.group].append(standing.key())
+        for board in boards.values():
+            board.sort()
+        self.boards = boards
+
+    def restore(self, group: str, standings: Iterable[Standing]) -> None:
+        """Load already computed standings of `group`, sorting it once."""
+        board = []
+        for standing in standings:
+            self.standings[standing.athlete] = standing
+            board.append(standing.key())
+        board.sort()
+        self.boards[group] = board
+
+    def leaderboard(self, group: str) -> List[Standing]:
+        """Return the standings of `group`, best first."""
+        return [self.standings[key[-1]] for key in self.boards.get(group, [])]
+
+
+class Playoff:
+    """
+    Knockout stage: seeded pairs advancing through an elimination tree.
+
+    A result only touches the matches fed by it: the winner (and, in double
+    elimination, the loser) moves on, and a score recorded for a pair that
+    is no longer in a match is cleared. Byes advance on their own.
+    """
+
+    def __init__(
+        self,
+        pairs: Sequence[int],
+        double: bool = False,
+        first_number: int = 0,
+    ):
+        self.pairs = list(pairs)
+        self.double = double
+        self.first_number = first_number
+        tree = knockout_tree(len(self.pairs), double)
+        self.rounds = tree.rounds
+        self.winner_to = tree.winner_to
+        self.loser_to = tree.loser_to
+        self.matches = [
+            Match(PENDING, PENDING, number=first_number + index)
+            for index in range(len(tree.rounds))
+        ]
+        for index, seeds in enumerate(tree.seeds):
+            for side, seed in enumerate(seeds):
+                if seed is not None:
+                    self._place(
+                        index,
+                        side,
+                        self.pairs[seed] if seed < len(self.pairs) else BYE,
+                    )
+
+    def owns(self, number: int) -> bool:
+        """Tell whether match `number` belongs to the knockout stage."""
+        return 0 <= number - self.first_number < len(self.matches)
+
+    def round_name(self, match: Match) -> str:
+        """Return the name of the round of a knockout match."""
+        return self.rounds[match.number - self.first_number]
+
+    def _outcome(self, index: int) -> Tuple[int, int]:
+        """Return (winner, loser) of a match, PENDING while undecided."""
+        match = self.matches[index]
+        if PENDING in (match.first, match.second):
+            return PENDING, PENDING
+        if match.first == BYE:
+            return match.second, BYE
+        if match.second == BYE:
+            return match.first, BYE
+        if match.winner == 'dupla1':
+            return match.first, match.second
+        if match.winner == 'dupla2':
+            return match.second, match.first
+        return PENDING, PENDING
+
+    def _place(self, index: int, side: int, pair: int) -> None:
+        match = self.matches[index]
+        if (match.first, match.second)[side] == pair:
+            return
+        before = self._outcome(index)
+        if side == 0:
+            match.first = pair
+        else:
+            match.second = pair
+        # O placar era de outra dupla
+        match.score1 = match.score2 = None
+        self._advance(index, before)
+
+    def _advance(self, index: int, before: Tuple[int, int]) -> None:
+        after = self._outcome(index)
+        if after == before:
+            return
+        for link, pair in zip(
+            (self.winner_to[index], self.loser_to[index]), after
+        ):
+            if link is not None:
+                self._place(*link, pair)
+
+    def set_score(self, match: Match, score1: int, score2: int) -> bool:
+        """
+        Record the score of a match and advance its pairs.
+
+        Returns False when the match already had this score or its pairs
+        are not both known yet. A knockout match has no draws: equal scores
+        raise ValueError.
+        """
+        if score1 == score2:
+            raise ValueError(
+                f'Jogo {match.number}: a fase final não tem empates.'
+            )
+        if (match.score1, match.score2) == (score1, score2) or (
+            min(match.first, match.second) <= PENDING
+        ):
+            return False
+        index = match.number - self.first_number
+        before = self._outcome(index)
+        match.score1, match.score2 = score1, score2
+        self._advance(index, before)
+        return True
+
+    def playable(self) -> List[Match]:
+        """Return the matches whose two pairs are known, in tree order."""
+        return [
+            match
+            for match in self.matches
+            if min(match.first, match.second) > PENDING
+        ]
+
+    def champion(self) -> int | None:
+        """Return the pair that won the final, if already decided."""
+        winner, _ = self._outcome(len(self.matches) - 1)
+        return winner if winner > PENDING else None
+
+    def score_row(self, match: Match) -> dict:
+        """Return the storage row of a knockout score, with its pairs."""
+        first_a, first_b = pair_members(match.first)
+        second_a, second_b = pair_members(match.second)
+        return {
+            'match_id': match.number,
+            'first_a': first_a,
+            'first_b': first_b,
+            'second_a': second_a,
+            'second_b': second_b,
+            'score1': match.score1,
+            'score2': match.score2,
+        }
+
+    def to_state(self) -> dict:
+        """Return a JSON-friendly snapshot: seeded pairs and scores."""
+        return {
+            'pairs': [list(pair_members(pair)) for pair in self.pairs],
+            'double': self.double,
+            'first_number': self.first_number,
+            'scores': [
+                None if match.winner is None else [match.score1, match.score2]
+                for match in self.matches
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> Playoff:
+        """Rebuild a knockout stage from a snapshot made by `to_state`."""
+        playoff = cls(
+            [make_pair(a, b) for a, b in state['pairs']],
+            state['double'],
+            state['first_number'],
+        )
+        # Um jogo só alimenta jogos seguintes: em ordem, cada placar
+        # encontra as suas duplas já definidas
+        for match, score in zip(playoff.matches, state.get('scores', [])):
+            if score is not None:
+                playoff.set_score(match, *score)
+        return playoff
+
+
+class Bracket:
+    def __init__(self, limit: int = 8, groups: Sequence[str] = DEFAULT_GROUPS):
         self.__limit = limit
+        self.groups = tuple(groups)
 
-        self.distribution = self._create_side_distribution(
-            'left'
-        ) + self._create_side_distribution('right')
+        # Nomes internados: o id de um atleta é o índice em `names`
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
 
         self.athlete_by_side = {
-            'left': Side(values=deque(maxlen=self.__limit), brackets=False),
-            'right': Side(values=deque(maxlen=self.__limit), brackets=False),
+            group: Side(values=deque(maxlen=self.__limit), brackets=False)
+            for group in self.groups
         }
-        self.combinations = {'left': None, 'right': None}
-        self.brackets = {'left': [], 'right': []}
-        self.shuffle_brackets = {'left': [], 'right': []}
+        self.brackets = {group: [] for group in self.groups}
+        self.shuffle_brackets = {group: [] for group in self.groups}
+        # Agenda do dia: números dos jogos por horário, na ordem das quadras
+        self.schedule: List[List[int]] = []
+        self.ranking = Ranking()
+        self.playoff: Playoff | None = None
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled bracket, upgrading the legacy name-based one."""
+        if 'names' in state:
+            self.__dict__.update(state)
+            # Pares de cada chave, que a geração dos jogos já não usa, e
+            # vagas livres, que saem do tamanho de cada chave
+            self.__dict__.pop('combinations', None)
+            self.__dict__.pop('distribution', None)
+            self.__dict__.setdefault('groups', DEFAULT_GROUPS)
+            self.__dict__.setdefault('schedule', [])
+            self.__dict__.setdefault('playoff', None)
+            self._number_matches()
+            if 'ranking' not in state:
+                self._rebuild_ranking()
+            return
+
+        self.__init__(limit=state['_Bracket__limit'])
+        for side in DEFAULT_GROUPS:
+            for athlete in state['athlete_by_side'][side].values:
+                self.add_athlete(athlete, side=side)
+            upgraded = {}
+            for item in state['brackets'][side]:
+                upgraded[id(item)] = self._legacy_match(item)
+            self.brackets[side] = list(upgraded.values())
+            self.shuffle_brackets[side] = [
+                upgraded.get(id(item)) or self._legacy_match(item)
+                for item in state['shuffle_brackets'][side]
+            ]
+        self._number_matches()
+        self._rebuild_ranking()
+
+    def _legacy_match(self, item: dict) -> Match:
+        """Convert a match dict from the legacy layout."""
+        match = Match(
+            first=make_pair(*map(self._intern, item['first'])),
+            second=make_pair(*map(self._intern, item['second'])),
+        )
+        if 'winner' in item:
+            match.score1 = item.get('score1', 0)
+            match.score2 = item.get('score2', 0)
+        return match
+
+    def matches(self) -> Iterable[Match]:
+        """Iterate over the matches of every side."""
+        return chain.from_iterable(self.brackets.values())
+
+    def all_matches(self) -> Iterable[Match]:
+        """Iterate over the group matches and then the knockout matches."""
+        if self.playoff is None:
+            return self.matches()
+        return chain(self.matches(), self.playoff.matches)
+
+    def standings(self, side: SideVar) -> List[Tuple[Standing, int]]:
+        """
+        Return the standings of `side`, best first, each with its
+        head-to-head wins: wins over rivals tied on points, wins and
+        differential, which break those ties.
+        """
+        board = self.ranking.leaderboard(side)
+        tie = {s.athlete: (s.points, s.wins, s.diff) for s in board}
+        head_to_head = dict.fromkeys(tie, 0)
+        if len(set(tie.values())) == len(tie):
+            return [(s, 0) for s in board]
+        for match in self.brackets[side]:
+            if match.winner not in ('dupla1', 'dupla2'):
+                continue
+            won, lost = (
+                (match.first, match.second)
+                if match.winner == 'dupla1'
+                else (match.second, match.first)
+            )
+            for athlete in pair_members(won):
+                head_to_head[athlete] += sum(
+                    tie[rival] == tie[athlete] for rival in pair_members(lost)
+                )
+        board.sort(key=lambda s: (*s.key()[:3], -head_to_head[s.athlete]))
+        return [(s, head_to_head[s.athlete]) for s in board]
+
+    def structure(self) -> tuple:
+        """Return a summary of athletes and schedule, ignoring scores."""
+        return (
+            tuple(self.names),
+            tuple(
+                (
+                    tuple(self.athlete_by_side[side].values),
+                    tuple((m.first, m.second) for m in self.brackets[side]),
+                    tuple(m.number for m in self.shuffle_brackets[side]),
+                )
+                for side in self.groups
+            ),
+            tuple(map(tuple, self.schedule)),
+            self.playoff and (tuple(self.playoff.pairs), self.playoff.double),
+        )
+
+    def _number_matches(self) -> None:
+        """Give every match a bracket-wide number, used as its storage key."""
+        for number, match in enumerate(self.matches()):
+            match.number = number
+
+    def _rebuild_ranking(self) -> None:
+        """Recompute the ranking from scratch from the recorded matches."""
+        self.ranking = Ranking()
+        for side in self.groups:
+            for athlete in self.athlete_by_side[side].values:
+                self.ranking.register(athlete, side)
+        self.ranking.rebuild(self.matches())
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    def _intern(self, athlete: str) -> int:
+        """Return the integer id of an athlete, registering it if needed."""
+        if athlete not in self.ids:
+            self.ids[athlete] = len(self.names)
+            self.names.append(athlete)
+        return self.ids[athlete]
+
+    def athletes(self, side: SideVar) -> List[str]:
+        """Return the athlete names of the given side."""
+        return [self.names[i] for i in self.athlete_by_side[side].values]
+
+    def pair_names(self, pair: int) -> Tuple[str, str]:
+        """Return the athlete names of a pair bitmask."""
+        first, second = pair_members(pair)
+        return self.names[first], self.names[second]
+
+    @property
+    def distribution(self) -> List[SideVar]:
+        """One entry per slot still open in each side."""
+        return [
+            group
+            for group in self.groups
+            for _ in range(
+                self.__limit - len(self.athlete_by_side[group].values)
+            )
+        ]
 
     def random_select(self) -> SideVar:
-        """Select a random side from the distribution."""
-        if self.distribution:
-            side = choice(self.distribution)
-            self.distribution.remove(side)
-            return side
+        """Select a random side, weighted by the slots each one has left."""
+        # Vagas de cada chave pelo tamanho da sua fila, que todo cadastro
+        # (com ou sem sorteio) já atualiza: O(chaves) por atleta
+        free = [
+            self.__limit - len(self.athlete_by_side[group].values)
+            for group in self.groups
+        ]
+        if any(free):
+            slot = randrange(sum(free))
+            for group, slots in zip(self.groups, free):
+                if slot < slots:
+                    return group
+                slot -= slots
 
     def add_athlete(
         self, athlete: str, side: SideVar = '', random: bool = False
@@ -58,190 +716,503 @@ class Bracket:
         if random:
             side = self.random_select()
 
-        if side in {'left', 'right'}:
-            self.athlete_by_side[side].values.append(athlete)
+        if side in self.athlete_by_side:
+            if len(self.athlete_by_side[side].values) >= self.__limit:
+                raise ValueError(
+                    f'A chave {side} já tem {self.__limit} atletas.'
+                )
+            athlete_id = self._intern(athlete)
+            self.athlete_by_side[side].values.append(athlete_id)
+            self.ranking.register(athlete_id, side)
             return self.athlete_by_side[side].values
 
-    def gen_combinations(self, side: SideVar) -> Deque:
-        """Generate combinations of athletes for the given side."""
-        if not self.athlete_by_side[side].brackets:
-            comb = combinations(self.athlete_by_side[side].values, r=2)
-            self.combinations[side] = Side(
-                values=deque(maxlen=math.comb(self.__limit, 2)), brackets=True
-            )
-            self.combinations[side].values.extend(comb)
-            return self.combinations[side].values
-
-    def gen_brackets(self) -> Deque:
+    def add_athletes(
+        self,
+        athletes: Iterable[str],
+        sides: Sequence[SideVar] | None = None,
+        seed: int | None = None,
+    ) -> List[str]:
         """
-        Gera os jogos (brackets) de forma aleatória, garantindo um número
-        balanceado e máximo de jogos através de um sistema de tentativas.
+        Register many athletes in one step and return the names added.
+
+        Names are normalized and repeated ones (ignoring case, including the
+        already registered) are dropped. Without `sides`, each athlete gets
+        a side drawn from the distribution by a seeded shuffle. Nothing is
+        registered if a side would go over the limit.
         """
-        self.brackets = {'left': [], 'right': []}
+        unique = unique_names(
+            athletes,
+            registered=(
+                self.names[athlete]
+                for side in self.athlete_by_side.values()
+                for athlete in side.values
+            ),
+        )
+        names = [name for _, name in unique]
+        chosen = [] if sides is None else [sides[i] for i, _ in unique]
 
-        # Calcula o número máximo de jogos esperado. Para 8 atletas, são C(8,2) = 28 duplas,
-        # resultando em 28 / 2 = 14 jogos.
-        expected_games = math.comb(self.__limit, 2) // 2
+        if sides is None:
+            free = self.distribution
+            if len(names) > len(free):
+                raise ValueError(
+                    f'{len(names)} atletas novos, mas só há '
+                    f'{len(free)} vagas nas chaves.'
+                )
+            random.Random(seed).shuffle(free)
+            chosen = [free.pop() for _ in names]
+        else:
+            unknown = set(chosen) - set(self.groups)
+            if unknown:
+                raise ValueError(
+                    f'Chaves desconhecidas: {", ".join(sorted(unknown))}.'
+                )
+            for side, added in Counter(chosen).items():
+                if (
+                    len(self.athlete_by_side[side].values) + added
+                    > self.__limit
+                ):
+                    raise ValueError(
+                        f'A chave {side} passaria de {self.__limit} atletas.'
+                    )
 
-        for side in get_args(SideVar):
-            if (
-                not self.combinations[side]
-                or not self.combinations[side].values
-            ):
-                continue
+        by_side = {side: [] for side in self.groups}
+        for name, side in zip(names, chosen):
+            by_side[side].append(self._intern(name))
+        for side, ids in by_side.items():
+            self.athlete_by_side[side].values.extend(ids)
+            for athlete_id in ids:
+                self.ranking.register(athlete_id, side)
+        return names
 
-            # Adiciona um loop de tentativas para garantir o resultado desejado
-            MAX_TRIES = 100  # Limite para evitar loops infinitos
-            for _ in range(MAX_TRIES):
-                # Limpa os resultados da tentativa anterior para este lado
-                self.brackets[side] = []
-
-                # Pega e embaralha a lista de combinações
-                combination_list = list(self.combinations[side].values)
-                random.shuffle(combination_list)
-
-                # Loop para criar os jogos (mesma lógica da versão anterior)
-                while len(combination_list) >= 2:
-                    current_team = combination_list.pop(0)
-                    opponent_found_index = -1
-                    for i, next_team in enumerate(combination_list):
-                        if set(current_team).isdisjoint(set(next_team)):
-                            opponent_found_index = i
-                            break
-
-                    if opponent_found_index != -1:
-                        next_team = combination_list.pop(opponent_found_index)
-                        match = asdict(
-                            Match(first=current_team, second=next_team)
-                        )
-                        self.brackets[side].append(match)
-
-                # --- VERIFICAÇÃO DE SUCESSO ---
-                # Se o número de jogos gerados for o esperado, para as tentativas.
-                if len(self.brackets[side]) == expected_games:
-                    break
-
-            # Se após todas as tentativas não conseguir o número esperado, pode lançar um aviso (opcional)
-            if len(self.brackets[side]) != expected_games:
-                print(
-                    f"Aviso: Não foi possível gerar os {expected_games} jogos esperados para o lado '{side}' após {MAX_TRIES} tentativas."
+    @metrics.timed('generation.gen_brackets')
+    def gen_brackets(self, seed: int | None = None) -> dict:
+        """
+        Gera os jogos (brackets) de cada grupo encaixando os atletas no
+        modelo de tabela do tamanho do grupo (templates.py), com o número
+        máximo de jogos. Com `seed`, a ordem dos atletas no modelo e a dos
+        jogos são sorteadas de forma reproduzível.
+        """
+        self.brackets = {group: [] for group in self.groups}
+        self.schedule = []
+        self.playoff = None
+        rng = random.Random(seed) if seed is not None else None
+        sizes = [
+            len(self.athlete_by_side[side].values) for side in self.groups
+        ]
+
+        for side, template in zip(self.groups, _schedule_groups(sizes)):
+            ids = list(self.athlete_by_side[side].values)
+            games = template
+            if rng:
+                rng.shuffle(ids)
+                games = rng.sample(template, len(template))
+            self.brackets[side] = [
+                Match(
+                    first=make_pair(ids[a], ids[b]),
+                    second=make_pair(ids[c], ids[d]),
                 )
+                for a, b, c, d in games
+            ]
 
+        self._number_matches()
         return self.brackets
 
-    def gen_brackets(self) -> Deque:
-        static_left = [
-    {'first': ('Carol', 'Rayza'), 'second': ('Lari', 'Isabella')},           # Jogo 1
-    {'first': ('Sarah', 'Isabella'), 'second': ('Thayna', 'Isa Pires')},    # Jogo 2
-    {'first': ('Thayna', 'Rayza'), 'second': ('Sarah', 'Isa Pires')},       # Jogo 3
-    {'first': ('Sarah', 'Rayza'), 'second': ('Lari', 'Isa Pires')},         # Jogo 4
-    {'first': ('Carol', 'Paloma'), 'second': ('Sarah', 'Thayna')},          # Jogo 5
-    {'first': ('Paloma', 'Isabella'), 'second': ('Isa Pires', 'Rayza')},    # Jogo 6
-    {'first': ('Isabella', 'Rayza'), 'second': ('Lari', 'Thayna')},         # Jogo 7
-    {'first': ('Carol', 'Thayna'), 'second': ('Paloma', 'Lari')},           # Jogo 8
-    {'first': ('Paloma', 'Isa Pires'), 'second': ('Thayna', 'Isabella')},   # Jogo 9
-    {'first': ('Paloma', 'Rayza'), 'second': ('Carol', 'Lari')},            # Jogo 10
-    {'first': ('Isabella', 'Isa Pires'), 'second': ('Carol', 'Sarah')},     # Jogo 11
-    {'first': ('Sarah', 'Lari'), 'second': ('Carol', 'Isabella')},          # Jogo 12
-    {'first': ('Carol', 'Isa Pires'), 'second': ('Paloma', 'Thayna')},      # Jogo 13
-    {'first': ('Paloma', 'Sarah'), 'second': ('Lari', 'Rayza')}             # Jogo 14
-]
-
-
-        static_right = [
-            {
-                'first': ('Clara', 'Ines'),
-                'second': ('Duda', 'Joana'),
-            },  # Jogo 1
-            {
-                'first': ('Sther', 'Cinthia'),
-                'second': ('Gabi', 'Ines'),
-            },  # Jogo 2
-            {
-                'first': ('Sther', 'Duda'),
-                'second': ('Ines', 'Joana'),
-            },  # Jogo 3
-            {
-                'first': ('Marina', 'Clara'),
-                'second': ('Gabi', 'Duda'),
-            },  # Jogo 4
-            {
-                'first': ('Sther', 'Ines'),
-                'second': ('Gabi', 'Joana'),
-            },  # Jogo 5
-            {
-                'first': ('Marina', 'Ines'),
-                'second': ('Cinthia', 'Joana'),
-            },  # Jogo 6
-            {
-                'first': ('Clara', 'Joana'),
-                'second': ('Duda', 'Ines'),
-            },  # Jogo 7
-            {
-                'first': ('Marina', 'Duda'),
-                'second': ('Sther', 'Gabi'),
-            },  # Jogo 8
-            {
-                'first': ('Sther', 'Clara'),
-                'second': ('Gabi', 'Cinthia'),
-            },  # Jogo 9
-            {
-                'first': ('Marina', 'Joana'),
-                'second': ('Cinthia', 'Duda'),
-            },  # Jogo 10
-            {
-                'first': ('Sther', 'Joana'),
-                'second': ('Clara', 'Cinthia'),
-            },  # Jogo 11
-            {
-                'first': ('Marina', 'Sther'),
-                'second': ('Clara', 'Gabi'),
-            },  # Jogo 12
+    def set_score(self, match: Match, score1: int, score2: int) -> bool:
+        """
+        Record the score of a match, updating the ranking in place.
+
+        Returns False when the match already had this score.
+        """
+        if self.playoff is not None and self.playoff.owns(match.number):
+            return self.playoff.set_score(match, score1, score2)
+        if (match.score1, match.score2) == (score1, score2):
+            return False
+        if match.winner:
+            self.ranking.record(match, sign=-1)
+        match.score1, match.score2 = score1, score2
+        self.ranking.record(match)
+        return True
+
+    def merge_changes(self, changes: List[ScoreChange]) -> List[ScoreChange]:
+        """
+        Reapply score edits made on an older copy of this bracket.
+
+        Returns the edits that clash with a different score recorded for the
+        same match in the meantime, or whose match number now belongs to
+        other pairs (games regenerated or reset); those are left untouched.
+        """
+        matches = {match.number: match for match in self.all_matches()}
+        conflicts = []
+        for change in changes:
+            match = matches.get(change.number)
+            if match is None or (match.first, match.second) != change.pairs:
+                conflicts.append(change)
+                continue
+            current = match.score1, match.score2
+            if current == change.score:
+                continue
+            if current != change.previous:
+                conflicts.append(change)
+                continue
+            self.set_score(match, *change.score)
+        return conflicts
+
+    @staticmethod
+    def score_row(match: Match) -> dict:
+        """Return the storage row with the score of a match."""
+        return {
+            'match_id': match.number,
+            'score1': match.score1,
+            'score2': match.score2,
+        }
+
+    def to_rows(
+        self,
+    ) -> Tuple[List[dict], List[dict], List[dict], List[dict]]:
+        """Flatten the bracket into group, athlete, match and score rows."""
+        groups = [
+            {'position': position, 'side': side, 'athlete_limit': self.__limit}
+            for position, side in enumerate(self.groups)
+        ]
+        sides = {}
+        for side in self.groups:
+            for position, athlete in enumerate(
+                self.athlete_by_side[side].values
+            ):
+                sides[athlete] = side, position
+        athletes = [
             {
-                'first': ('Marina', 'Cinthia'),
-                'second': ('Clara', 'Duda'),
-            },  # Jogo 13
+                'athlete_id': athlete,
+                'name': name,
+                'side': sides.get(athlete, (None, None))[0],
+                'position': sides.get(athlete, (None, None))[1],
+            }
+            for athlete, name in enumerate(self.names)
+        ]
+
+        courts = {
+            number: (slot, court)
+            for slot, numbers in enumerate(self.schedule)
+            for court, number in enumerate(numbers)
+        }
+        matches, scores = [], []
+        for side in self.groups:
+            shuffled = {
+                match.number: position
+                for position, match in enumerate(self.shuffle_brackets[side])
+            }
+            for position, match in enumerate(self.brackets[side]):
+                first_a, first_b = pair_members(match.first)
+                second_a, second_b = pair_members(match.second)
+                matches.append({
+                    'match_id': match.number,
+                    'side': side,
+                    'position': position,
+                    'shuffle_position': shuffled.get(match.number),
+                    'first_a': first_a,
+                    'first_b': first_b,
+                    'second_a': second_a,
+                    'second_b': second_b,
+                    'slot': courts.get(match.number, (None, None))[0],
+                    'court': courts.get(match.number, (None, None))[1],
+                })
+                if match.winner:
+                    scores.append(self.score_row(match))
+        return groups, athletes, matches, scores
+
+    def playoff_rows(self) -> Tuple[List[dict], List[dict]]:
+        """Flatten the knockout stage into seeded pair and score rows."""
+        if self.playoff is None:
+            return [], []
+        pairs = [
             {
-                'first': ('Marina', 'Gabi'),
-                'second': ('Cinthia', 'Ines'),
-            },  # Jogo 14
+                'seed': seed,
+                'athlete_a': athlete_a,
+                'athlete_b': athlete_b,
+                'double_elimination': self.playoff.double,
+            }
+            for seed, (athlete_a, athlete_b) in enumerate(
+                map(pair_members, self.playoff.pairs)
+            )
+        ]
+        scores = [
+            self.playoff.score_row(match)
+            for match in self.playoff.matches
+            if match.winner
         ]
-        self.brackets['right'].extend(static_right)
-        self.brackets['left'].extend(static_left)
+        return pairs, scores
+
+    @classmethod
+    def from_rows(
+        cls,
+        groups: List[dict],
+        athletes: List[dict],
+        matches: List[dict],
+        playoff: List[dict] = (),
+        playoff_scores: List[dict] = (),
+    ) -> Bracket:
+        """
+        Rebuild a bracket from group rows (order and athlete limit),
+        athlete rows and match rows with scores.
+        """
+        groups = sorted(groups, key=lambda row: row['position'])
+        bracket = cls(
+            limit=groups[0]['athlete_limit'],
+            groups=[row['side'] for row in groups],
+        )
+        for row in sorted(athletes, key=lambda row: row['athlete_id']):
+            bracket._intern(row['name'])
+        for row in sorted(
+            (row for row in athletes if row['side']),
+            key=lambda row: (row['side'], row['position']),
+        ):
+            side = row['side']
+            bracket.athlete_by_side[side].values.append(row['athlete_id'])
+            bracket.ranking.register(row['athlete_id'], side)
+
+        shuffled = {side: [] for side in bracket.groups}
+        scheduled = []
+        for row in sorted(matches, key=lambda row: row['position']):
+            match = Match(
+                first=make_pair(row['first_a'], row['first_b']),
+                second=make_pair(row['second_a'], row['second_b']),
+                number=row['match_id'],
+            )
+            bracket.brackets[row['side']].append(match)
+            if row['shuffle_position'] is not None:
+                shuffled[row['side']].append((row['shuffle_position'], match))
+            match.score1, match.score2 = row['score1'], row['score2']
+            if row.get('slot') is not None:
+                scheduled.append((row['slot'], row['court'], match.number))
+        for side, ordered in shuffled.items():
+            bracket.shuffle_brackets[side] = [
+                match for _, match in sorted(ordered, key=lambda x: x[0])
+            ]
+        if scheduled:
+            bracket.schedule = [[] for _ in range(max(scheduled)[0] + 1)]
+            for slot, _, number in sorted(scheduled):
+                bracket.schedule[slot].append(number)
+        bracket._rebuild_ranking()
+        if playoff:
+            pairs = sorted(playoff, key=lambda row: row['seed'])
+            bracket.playoff = Playoff(
+                [
+                    make_pair(row['athlete_a'], row['athlete_b'])
+                    for row in pairs
+                ],
+                bool(pairs[0]['double_elimination']),
+                len(matches),
+            )
+            # Placares de duplas que já não estão no jogo são ignorados
+            for row in sorted(playoff_scores, key=lambda row: row['match_id']):
+                match = bracket.playoff.matches[
+                    row['match_id'] - bracket.playoff.first_number
+                ]
+                pairs = (
+                    make_pair(row['first_a'], row['first_b']),
+                    make_pair(row['second_a'], row['second_b']),
+                )
+                if (match.first, match.second) == pairs:
+                    bracket.playoff.set_score(
+                        match, row['score1'], row['score2']
+                    )
+        return bracket
+
+    def to_state(self) -> dict:
+        """Return a plain, JSON-friendly snapshot of the bracket."""
+        state = {
+            'limit': self.__limit,
+            'names': self.names,
+            'sides': {},
+            'schedule': self.schedule,
+            'playoff': self.playoff and self.playoff.to_state(),
+        }
+        for side in self.groups:
+            positions = {
+                match.number: position
+                for position, match in enumerate(self.brackets[side])
+            }
+            matches = self.brackets[side]
+            state['sides'][side] = {
+                'athletes': list(self.athlete_by_side[side].values),
+                # Em colunas binárias (atletas das duplas e placares, -1
+                # sem placar): milhares de números pequenos custam bem mais
+                # para o JSON que um bloco base64
+                'matches': list(
+                    map(
+                        pack_column,
+                        (
+                            *pair_columns([match.first for match in matches]),
+                            *pair_columns([match.second for match in matches]),
+                            [
+                                -1 if match.score1 is None else match.score1
+                                for match in matches
+                            ],
+                            [
+                                -1 if match.score2 is None else match.score2
+                                for match in matches
+                            ],
+                        ),
+                    )
+                ),
+                'shuffle': pack_column([
+                    positions[match.number]
+                    for match in self.shuffle_brackets[side]
+                ]),
+                # Totais do ranking, para não recalcular ao carregar
+                'standings': [
+                    [s.points, s.wins, s.diff, s.played]
+                    for s in map(
+                        self.ranking.standings.__getitem__,
+                        self.athlete_by_side[side].values,
+                    )
+                ],
+            }
+        return state
 
-    def gen_shuffle_brackets(self, side: SideVar) -> List[dict]:
+    @classmethod
+    def from_state(cls, state: dict) -> Bracket:
+        """Rebuild a bracket from a snapshot made by `to_state`."""
+        bracket = cls(limit=state['limit'], groups=tuple(state['sides']))
+        for name in state['names']:
+            bracket._intern(name)
+        # Bit de cada atleta: as duplas saem de `or_` sobre estes bits sem
+        # chamar `make_pair` (função Python) para cada jogo
+        bit = [
+            1 << athlete for athlete in range(len(bracket.names))
+        ].__getitem__
+        for side, data in state['sides'].items():
+            bracket.athlete_by_side[side].values.extend(data['athletes'])
+            first_a, first_b, second_a, second_b, *scores = map(
+                unpack_column, data['matches']
+            )
+            score1, score2 = (
+                [None if score < 0 else score for score in column]
+                for column in scores
+            )
+            bracket.brackets[side] = list(
+                map(
+                    Match,
+                    map(or_, map(bit, first_a), map(bit, first_b)),
+                    map(or_, map(bit, second_a), map(bit, second_b)),
+                    score1,
+                    score2,
+                )
+            )
+            bracket.shuffle_brackets[side] = [
+                bracket.brackets[side][position]
+                for position in unpack_column(data['shuffle'])
+            ]
+            bracket.ranking.restore(
+                side,
+                (
+                    Standing(athlete, side, *totals)
+                    for athlete, totals in zip(
+                        data['athletes'], data['standings']
+                    )
+                ),
+            )
+        bracket._number_matches()
+        bracket.schedule = [list(slot) for slot in state.get('schedule', [])]
+        if state.get('playoff'):
+            bracket.playoff = Playoff.from_state(state['playoff'])
+        return bracket
+
+    def gen_shuffle_brackets(self, side: SideVar) -> List[Match]:
         bracket = random.sample(self.brackets[side], len(self.brackets[side]))
         self.shuffle_brackets[side] = bracket
+        # A ordem dos jogos mudou: a agenda das quadras deixa de valer
+        self.schedule = []
         return bracket
 
+    @metrics.timed('generation.gen_schedule')
+    def gen_schedule(
+        self,
+        courts: int,
+        time_budget: float = TIME_BUDGET,
+        seed: int | None = None,
+    ) -> List[List[Match]]:
+        """
+        Assign every match of every group to a court and a time slot (see
+        scheduler.py); each group's display order then follows the schedule.
+        """
+        # Grupos intercalados: as quadras são divididas entre eles
+        ordered = [
+            match
+            for round_ in zip_longest(
+                *(
+                    self.shuffle_brackets[side] or self.brackets[side]
+                    for side in self.groups
+                )
+            )
+            for match in round_
+            if match is not None
+        ]
+        players = [
+            (*pair_members(match.first), *pair_members(match.second))
+            for match in ordered
+        ]
+        slots = schedule_matches(players, courts, time_budget, seed)
+        self.schedule = [
+            [ordered[index].number for index in slot] for slot in slots
+        ]
 
-if __name__ == '__main__':
-    m = Bracket(limit=8)
-    group_1 = [
-        'Carol',
-        'Paloma',
-        'Sarah',
-        'Lari',
-        'Thayna',
-        'Isabella',
-        'Isa Pires',
-        'Rayza',
-    ]
-    group_2 = [
-        'Clara',
-        'Cinthia',
-        'Sther',
-        'Marina',
-        'Duda',
-        'Inês',
-        'Gabi',
-        'Joana',
-    ]
-    for name in group_1:
-        m.add_athlete(name, side='left', random=False)
-    for name in group_2:
-        m.add_athlete(name, side='right', random=False)
-    m.gen_combinations('left')
-    m.gen_combinations('right')
-    m.gen_brackets()
-    1
+        scheduled = self.scheduled_matches()
+        sides = {
+            match.number: side
+            for side in self.groups
+            for match in self.brackets[side]
+        }
+        for side in self.groups:
+            self.shuffle_brackets[side] = [
+                match
+                for slot in scheduled
+                for match in slot
+                if sides[match.number] == side
+            ]
+        return scheduled
+
+    def scheduled_matches(self) -> List[List[Match]]:
+        """Return the schedule with matches instead of match numbers."""
+        matches = {match.number: match for match in self.matches()}
+        return [[matches[number] for number in slot] for slot in self.schedule]
+
+    def schedule_stats(self) -> dict:
+        """Return makespan, back-to-back games and longest wait."""
+        ordered = list(self.matches())
+        index = {match.number: i for i, match in enumerate(ordered)}
+        players = [
+            (*pair_members(match.first), *pair_members(match.second))
+            for match in ordered
+        ]
+        return schedule_stats(
+            players,
+            [[index[number] for number in slot] for slot in self.schedule],
+        )
+
+    def gen_playoff(
+        self,
+        qualifiers: int,
+        double: bool = False,
+        rule: str = BALANCED,
+        rankings: Mapping[SideVar, Sequence[int]] | None = None,
+    ) -> Playoff:
+        """
+        Seed the top `qualifiers` of each group into a knockout stage (see
+        playoff.py). `rankings` gives the athlete ids of each group, best
+        first; by default, the order of the group standings.
+        """
+        if rankings is None:
+            rankings = {
+                side: [s.athlete for s, _ in self.standings(side)]
+                for side in self.groups
+            }
+        pairs = form_pairs(
+            [rankings[side] for side in self.groups], qualifiers, rule
+        )
+        self.playoff = Playoff(
+            [make_pair(*pair) for pair in pairs],
+            double,
+            first_number=sum(map(len, self.brackets.values())),
+        )
+        return self.playoff
@@ -0,0 +1,225 @@
+"""
+Perfil da partida a frio do app: tempo até a primeira página renderizada,
+isto é, a primeira execução do app.py em um processo Python novo (como no
+servidor que acabou de acordar), com um banco SQLite local no lugar do
+Neon. Cada medição roda em um subprocesso, para não reaproveitar módulos
+já importados nem recursos em cache.
+
+Cenários: 'cadastro' (atletas cadastrados, sem jogos) e 'jogos' (jogos
+gerados e com placar, com o ranking na tela). Para cada um mostra a
+importação do Streamlit, a primeira execução do script (p50/p95) e os
+módulos pesados carregados por ela.
+
+Uso:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10
+    python benchmarks/bench_startup.py --profile jogos
+
+Com --profile, uma medição mostra as importações mais caras e o tempo das
+seções medidas pelo metrics.py (banco, serialização, fragmentos).
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+APP = ROOT / 'app.py'
+TABLE_NAME = 'tb_app_state'
+LIMIT = 16
+REPEAT = 5
+HEAVY_MODULES = ('numpy', 'pandas', 'pyarrow', 'PIL')
+SCENARIOS = ('cadastro', 'jogos')
+PROFILE_LINES = 15
+# Linha do -X importtime: "import time: próprio | acumulado | módulo"; o
+# nome sem recuo é uma importação de primeiro nível
+TOP_LEVEL_IMPORT = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| (\S+)$')
+
+
+def secrets(database: Path) -> dict:
+    return {
+        'DATABASE_URL': f'sqlite:///{database}',
+        'NEON_TABLENAME': TABLE_NAME,
+        'STORAGE_MODE': 'blob',
+    }
+
+
+# --- PREPARAÇÃO DO BANCO ---
+def create_database(path: Path, scenario: str):
+    """
+    Cria o banco (primeira execução do app) e grava o estado do cenário.
+    Roda em um subprocesso: a engine fica em cache no processo.
+    """
+    # Importações aqui dentro: o subprocesso da medição não deve pagar por
+    # elas antes de começar a contar
+    from bench_state import build_bracket  # noqa: PLC0415
+    from sqlalchemy import create_engine, text  # noqa: PLC0415
+    from streamlit.testing.v1 import AppTest  # noqa: PLC0415
+
+    import serializer  # noqa: PLC0415
+    from backend import Bracket  # noqa: PLC0415
+
+    app = AppTest.from_file(str(APP), default_timeout=120)
+    app.secrets['database'] = secrets(path)
+    app.run()
+
+    if scenario == 'jogos':
+        bracket = build_bracket(LIMIT)
+    else:
+        bracket = Bracket(limit=LIMIT)
+        for i in range(LIMIT):
+            bracket.add_athlete(f'Atleta Esquerda {i}', side='left')
+            bracket.add_athlete(f'Atleta Direita {i}', side='right')
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f'UPDATE {TABLE_NAME} SET payload = :payload, '
+                'version = version + 1'
+            ),
+            {'payload': serializer.dumps(bracket)},
+        )
+    engine.dispose()
+
+
+# --- MEDIÇÃO (NO SUBPROCESSO) ---
+def first_render(database: Path) -> dict:
+    """Importa o Streamlit e executa o app uma vez, medindo cada parte."""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest  # noqa: PLC0415
+
+    imported = time.perf_counter()
+    app = AppTest.from_file(str(APP), default_timeout=120)
+    app.secrets['database'] = secrets(database)
+    ran = time.perf_counter()
+    app.run()
+    end = time.perf_counter()
+    # O app importa o metrics.py deste mesmo processo
+    import metrics  # noqa: PLC0415
+
+    return {
+        'import_streamlit': imported - start,
+        'first_run': end - ran,
+        'total': end - start,
+        'exception': [str(item.value) for item in app.exception],
+        'heavy_modules': [
+            name for name in HEAVY_MODULES if name in sys.modules
+        ],
+        'sections': {
+            name.removesuffix('.seconds'): summary['sum']
+            for name, summary in metrics.snapshot()['series'].items()
+            if name.endswith('.seconds')
+        },
+    }
+
+
+def setup(database: Path, scenario: str):
+    subprocess.run(
+        [sys.executable, __file__, '--setup', scenario, str(database)],
+        capture_output=True,
+        check=True,
+        cwd=ROOT,
+    )
+
+
+def measure(database: Path, importtime: bool = False) -> dict:
+    """
+    Uma medição em um processo novo. Com `importtime`, inclui as
+    importações de primeiro nível (python -X importtime) por tempo total.
+    """
+    options = ['-X', 'importtime'] if importtime else []
+    child = subprocess.run(
+        [sys.executable, *options, __file__, '--child', str(database)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+    )
+    result = json.loads(child.stdout.splitlines()[-1])
+    result['imports'] = sorted(
+        (
+            (int(match[1]), match[2])
+            for match in map(TOP_LEVEL_IMPORT.match, child.stderr.splitlines())
+            if match
+        ),
+        reverse=True,
+    )
+    return result
+
+
+def print_profile(scenario: str, result: dict):
+    first_run = result['first_run'] * 1000
+    print(f'== {scenario}: primeira execução {first_run:.0f}ms')
+    print('Importações de primeiro nível (ms acumulados):')
+    for microseconds, name in result['imports'][:PROFILE_LINES]:
+        print(f'{microseconds / 1000:>10.1f}  {name}')
+    print('Seções medidas pelo metrics.py (ms):')
+    for name, seconds in sorted(
+        result['sections'].items(), key=lambda item: -item[1]
+    ):
+        print(f'{seconds * 1000:>10.1f}  {name}')
+
+
+def percentile(samples, quantile):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--profile', choices=SCENARIOS)
+    parser.add_argument('--child', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--setup', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.setup:
+        scenario, database = args.setup
+        create_database(Path(database), scenario)
+        return
+
+    if args.child:
+        result = first_render(args.child)
+        sys.stdout.write('\n' + json.dumps(result) + '\n')
+        return
+
+    scenarios = (args.profile,) if args.profile else SCENARIOS
+    if not args.profile:
+        print(
+            f'{"cenário":<10}{"import st":>11}{"1ª exec p50":>13}'
+            f'{"p95":>8}{"total p50":>11}  módulos pesados'
+        )
+    with tempfile.TemporaryDirectory() as directory:
+        for scenario in scenarios:
+            database = Path(directory) / f'{scenario}.sqlite'
+            setup(database, scenario)
+            if args.profile:
+                print_profile(scenario, measure(database, importtime=True))
+                continue
+            runs = [measure(database) for _ in range(args.repeat)]
+            errors = [error for run in runs for error in run['exception']]
+            if errors:
+                sys.exit(f'{scenario}: {errors[0]}')
+            imports, first, total = (
+                [run[key] * 1000 for run in runs]
+                for key in ('import_streamlit', 'first_run', 'total')
+            )
+            print(
+                f'{scenario:<10}{statistics.median(imports):>9.0f}ms'
+                f'{statistics.median(first):>11.0f}ms'
+                f'{percentile(first, 0.95):>6.0f}ms'
+                f'{statistics.median(total):>9.0f}ms'
+                f'  {", ".join(runs[-1]["heavy_modules"]) or "-"}'
+            )
+
+
+if __name__ == '__main__':
+    main()
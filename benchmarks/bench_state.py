@@ -0,0 +1,63 @@
+"""
+Compara o formato antigo do estado (pickle + base64) com o formato binário
+versionado (serializer.py): tamanho e tempo de codificação/decodificação.
+
+Uso: python benchmarks/bench_state.py
+"""
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serializer
+from backend import Bracket
+
+SIZES = (8, 16, 32, 64)
+REPEAT = 50
+
+
+def build_bracket(limit: int) -> Bracket:
+    """Monta um campeonato com todos os jogos já pontuados."""
+    rng = random.Random(limit)
+    bracket = Bracket(limit=limit)
+    for i in range(limit):
+        bracket.add_athlete(f'Atleta Esquerda {i}', side='left')
+        bracket.add_athlete(f'Atleta Direita {i}', side='right')
+    bracket.gen_brackets(seed=limit)
+    for side in ('left', 'right'):
+        for match in bracket.brackets[side]:
+            bracket.set_score(match, rng.randint(0, 6), rng.randint(0, 6))
+    return bracket
+
+
+def measure(encode, decode, bracket):
+    data = encode(bracket)
+    encode_ms = timeit.timeit(lambda: encode(bracket), number=REPEAT)
+    decode_ms = timeit.timeit(lambda: decode(data), number=REPEAT)
+    return len(data), encode_ms * 1000 / REPEAT, decode_ms * 1000 / REPEAT
+
+
+def main():
+    formats = {
+        'pickle+base64': (serializer.dumps_legacy, serializer.loads_legacy),
+        'binário v1': (serializer.dumps, serializer.loads),
+    }
+    print(
+        f'{"limit":>5}  {"formato":<14}{"bytes":>9}'
+        f'{"encode ms":>11}{"decode ms":>11}'
+    )
+    for limit in SIZES:
+        bracket = build_bracket(limit)
+        for name, (encode, decode) in formats.items():
+            size, encode_ms, decode_ms = measure(encode, decode, bracket)
+            print(
+                f'{limit:>5}  {name:<14}{size:>9}'
+                f'{encode_ms:>11.3f}{decode_ms:>11.3f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Benchmark reproduzível dos caminhos principais do app: geração dos jogos,
+cálculo do ranking e gravação/leitura do estado em um banco SQLite local
+(no lugar do Neon). Para cada caso e cada `limit` mostra as latências
+(p50/p95/p99), o pico de memória e o tamanho do resultado.
+
+Uso:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --limits 8 16 --repeat 50
+    python benchmarks/bench_suite.py --save antes.json
+    python benchmarks/bench_suite.py --compare antes.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_state import build_bracket
+from sqlalchemy import create_engine, text
+
+import serializer
+import stats
+from backend import Bracket
+from connection import DDL_NORMALIZED, DEFAULT_TOURNAMENT, UPSERT_SCORE
+
+LIMITS = tuple(range(4, 65, 4))
+REPEAT = 20
+TABLE_NAME = 'tb_app_state'
+
+
+# --- BANCO LOCAL ---
+def create_database(path: Path):
+    """Cria o banco SQLite com as mesmas tabelas do app."""
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f'CREATE TABLE {TABLE_NAME} (state TEXT, '
+                'updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, '
+                'version BIGINT NOT NULL DEFAULT 0, payload BLOB)'
+            )
+        )
+        conn.execute(text(f"INSERT INTO {TABLE_NAME} (state) VALUES ('')"))
+        for statement in DDL_NORMALIZED.read_text(encoding='utf-8').split(';'):
+            if statement.strip():
+                conn.execute(text(statement))
+    return engine
+
+
+def save_blob(engine, bracket):
+    payload = serializer.dumps(bracket)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f'UPDATE {TABLE_NAME} SET payload = :payload, '
+                'version = version + 1, updated = CURRENT_TIMESTAMP'
+            ),
+            {'payload': payload},
+        )
+    return len(payload)
+
+
+def load_blob(engine):
+    with engine.connect() as conn:
+        payload, _ = conn.execute(
+            text(f'SELECT payload, version FROM {TABLE_NAME} LIMIT 1')
+        ).one()
+    return serializer.loads(payload)
+
+
+def save_rows(engine, bracket):
+    groups, athletes, matches, scores = (
+        [{**row, 'tournament_id': DEFAULT_TOURNAMENT} for row in rows]
+        for rows in bracket.to_rows()
+    )
+    with engine.begin() as conn:
+        conn.execute(text('DELETE FROM tb_score'))
+        conn.execute(text('DELETE FROM tb_match'))
+        conn.execute(text('DELETE FROM tb_athlete'))
+        conn.execute(text('DELETE FROM tb_group'))
+        conn.execute(
+            text(
+                'INSERT INTO tb_group '
+                '(tournament_id, position, side, athlete_limit) '
+                'VALUES (:tournament_id, :position, :side, :athlete_limit)'
+            ),
+            groups,
+        )
+        conn.execute(
+            text(
+                'INSERT INTO tb_athlete '
+                '(tournament_id, athlete_id, name, side, position) '
+                'VALUES (:tournament_id, :athlete_id, :name, :side, :position)'
+            ),
+            athletes,
+        )
+        conn.execute(
+            text(
+                'INSERT INTO tb_match (tournament_id, match_id, side, '
+                'position, shuffle_position, first_a, first_b, second_a, '
+                'second_b, slot, court) '
+                'VALUES (:tournament_id, :match_id, :side, :position, '
+                ':shuffle_position, :first_a, :first_b, :second_a, '
+                ':second_b, :slot, :court)'
+            ),
+            matches,
+        )
+        if scores:
+            conn.execute(UPSERT_SCORE, scores)
+    return len(groups) + len(athletes) + len(matches) + len(scores)
+
+
+def load_rows(engine):
+    with engine.connect() as conn:
+        groups = conn.execute(
+            text('SELECT position, side, athlete_limit FROM tb_group')
+        )
+        athletes = conn.execute(
+            text('SELECT athlete_id, name, side, position FROM tb_athlete')
+        )
+        matches = conn.execute(
+            text(
+                'SELECT m.match_id, m.side, m.position, m.shuffle_position, '
+                'm.first_a, m.first_b, m.second_a, m.second_b, '
+                'm.slot, m.court, s.score1, s.score2 '
+                'FROM tb_match m '
+                'LEFT JOIN tb_score s USING (tournament_id, match_id)'
+            )
+        )
+        return Bracket.from_rows(
+            [dict(row._mapping) for row in groups],
+            [dict(row._mapping) for row in athletes],
+            [dict(row._mapping) for row in matches],
+        )
+
+
+# --- CASOS ---
+def generate(limit: int, seed: int):
+    """Cadastro + gen_brackets, como no botão do app."""
+    bracket = Bracket(limit=limit)
+    for i in range(limit):
+        bracket.add_athlete(f'Atleta Esquerda {i}', side='left')
+        bracket.add_athlete(f'Atleta Direita {i}', side='right')
+    bracket.gen_brackets(seed=seed)
+    return bracket
+
+
+def ranking_tables(bracket):
+    """Ranking recalculado e tabelas de exibição de todos os grupos."""
+    bracket._rebuild_ranking()
+    tables = []
+    for side in bracket.groups:
+        leaderboard = bracket.ranking.leaderboard(side)
+        tables.append({
+            'Posição': range(1, len(leaderboard) + 1),
+            'Atleta': [bracket.names[s.athlete] for s in leaderboard],
+            'Pontos': [s.points for s in leaderboard],
+            'Vitórias': [s.wins for s in leaderboard],
+            'Saldo': [s.diff for s in leaderboard],
+        })
+    return sum(len(table['Atleta']) for table in tables)
+
+
+def count_matches(bracket) -> int:
+    return sum(len(matches) for matches in bracket.brackets.values())
+
+
+def expected_games(limit: int) -> int:
+    """Máximo de jogos por lado: cada dupla joga uma única vez."""
+    return limit * (limit - 1) // 4
+
+
+def cases(limit: int, engine):
+    """
+    Casos medidos para um `limit`: nome -> função(i) que devolve o
+    tamanho do resultado e, na geração, se atingiu o máximo de jogos.
+    """
+    bracket = build_bracket(limit)
+    save_blob(engine, bracket)
+    save_rows(engine, bracket)
+
+    def run_generate(i):
+        games = count_matches(generate(limit, seed=i))
+        return games, games == 2 * expected_games(limit)
+
+    return {
+        'gerar jogos': run_generate,
+        'ranking': lambda i: (ranking_tables(bracket), True),
+        'estatísticas': lambda i: (len(stats.athlete_stats(bracket)), True),
+        'salvar blob': lambda i: (save_blob(engine, bracket), True),
+        'carregar blob': lambda i: (count_matches(load_blob(engine)), True),
+        'salvar normalizado': lambda i: (save_rows(engine, bracket), True),
+        'carregar normalizado': lambda i: (
+            count_matches(load_rows(engine)),
+            True,
+        ),
+    }
+
+
+def measure(case, repeat: int) -> dict:
+    """Latências (sem tracemalloc) e, em uma execução à parte, memória."""
+    timings = []
+    successes = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        size, ok = case(i)
+        timings.append((time.perf_counter() - start) * 1000)
+        successes += ok
+
+    tracemalloc.start()
+    case(repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50_ms': percentiles[49],
+        'p95_ms': percentiles[94],
+        'p99_ms': percentiles[98],
+        'peak_kib': peak / 1024,
+        'size': size,
+        'success': successes / repeat,
+    }
+
+
+def run(limits, repeat: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_database(Path(tmp) / 'bench.sqlite')
+        for limit in limits:
+            for name, case in cases(limit, engine).items():
+                results[f'{name}|{limit}'] = measure(case, repeat)
+        engine.dispose()
+    return results
+
+
+def report(results: dict, baseline: dict | None = None):
+    print(
+        f'{"caso":<22}{"limit":>6}{"p50 ms":>10}{"p95 ms":>10}'
+        f'{"p99 ms":>10}{"pico KiB":>11}{"tamanho":>10}{"sucesso":>9}'
+        + (f'{"Δ p50":>9}' if baseline else '')
+    )
+    for key, row in results.items():
+        name, limit = key.split('|')
+        line = (
+            f'{name:<22}{limit:>6}{row["p50_ms"]:>10.3f}'
+            f'{row["p95_ms"]:>10.3f}{row["p99_ms"]:>10.3f}'
+            f'{row["peak_kib"]:>11.1f}{row["size"]:>10}'
+            f'{row["success"]:>9.0%}'
+        )
+        if baseline and key in baseline:
+            before = baseline[key]['p50_ms']
+            line += f'{(row["p50_ms"] - before) / before:>+9.0%}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--limits', type=int, nargs='+', default=LIMITS)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--save', type=Path, help='grava os resultados')
+    parser.add_argument(
+        '--compare', type=Path, help='compara com resultados gravados'
+    )
+    args = parser.parse_args()
+
+    results = run(args.limits, max(args.repeat, 2))
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+    report(results, baseline)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
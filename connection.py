@@ -21,16 +21,66 @@
 #         return True
 
 
+import functools
+from pathlib import Path
+
 import streamlit as st
-from sqlalchemy import create_engine, text
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    LargeBinary,
+    MetaData,
+    Table,
+    Text,
+    create_engine,
+    exc,
+    func,
+    insert,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.pool import StaticPool
+
+import metrics
+
+# Pool ajustado para o Neon Serverless: o compute é suspenso após alguns
+# minutos ociosos, então as conexões são recicladas antes disso e testadas
+# (pre-ping) antes de cada uso, evitando erros com conexões mortas.
+POOL_OPTIONS = {
+    'pool_pre_ping': True,
+    'pool_size': 5,
+    'max_overflow': 5,
+    'pool_recycle': 240,
+    'pool_timeout': 15,
+}
+
+# Erros que costumam passar sozinhos (compute do Neon acordando, conexão
+# derrubada, pool esgotado) e justificam tentar de novo
+TRANSIENT_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.TimeoutError)
+
+# Cada campeonato é uma linha da tabela do estado, com a sua própria
+# versão. O campeonato das instalações anteriores (uma linha só) é o 1,
+# ver sql/migrate_app_state.sql
+DEFAULT_TOURNAMENT = 1
+DEFAULT_TOURNAMENT_NAME = 'Campeonato'
+# Tentativas de criar um campeonato quando outra sessão pega o mesmo id
+CREATE_TOURNAMENT_ATTEMPTS = 5
 
 
 # Função para criar e cachear a conexão com o banco de dados.
-# `@st.cache_resource` garante que a conexão seja criada apenas uma vez.
+# `@st.cache_resource` garante que a engine (e o seu pool) seja criada
+# apenas uma vez por processo e compartilhada por todas as sessões.
+@st.cache_resource
 def init_connection():
     """
     Inicializa a conexão com o banco de dados Neon Serverless.
     Usa o connection string armazenado nos segredos do Streamlit.
+
+    Uma URL `sqlite:///arquivo.db` cria um banco local equivalente para
+    testes, já com as tabelas necessárias.
     """
     # Recupera a URL do banco de dados a partir dos segredos do Streamlit
     db_url = st.secrets.database.DATABASE_URL
@@ -40,34 +90,608 @@ def init_connection():
         )
 
     # Cria a engine do SQLAlchemy
-    engine = create_engine(db_url)
-    return engine
+    if db_url.startswith('sqlite'):
+        engine = create_engine(
+            db_url,
+            connect_args={'check_same_thread': False},
+            poolclass=StaticPool if ':memory:' in db_url else None,
+        )
+        create_local_tables(engine)
+        return engine
+    return create_engine(
+        db_url, connect_args={'connect_timeout': 10}, **POOL_OPTIONS
+    )
 
 
-# Inicializa a engine de conexão
-engine = init_connection()
+@functools.lru_cache
+def _state_table(name: str) -> Table:
+    return Table(
+        name,
+        MetaData(),
+        Column(
+            'tournament_id', Integer, primary_key=True, autoincrement=False
+        ),
+        Column(
+            'name',
+            Text,
+            nullable=False,
+            server_default=DEFAULT_TOURNAMENT_NAME,
+        ),
+        Column('state', Text),
+        Column('updated', DateTime, server_default=func.current_timestamp()),
+        Column('version', BigInteger, nullable=False, server_default='0'),
+        Column('payload', LargeBinary),
+    )
 
 
-def get_state() -> str:
+def state_table() -> Table:
     """
-    Busca o valor do campo 'state' no banco de dados.
+    Tabela do estado, com o nome definido nos segredos. As consultas são
+    montadas pelo SQLAlchemy, que cita o nome, em vez de interpolá-lo no
+    texto do SQL.
     """
-    table_name = st.secrets.database.NEON_TABLENAME
-    with engine.connect() as conn:
-        # Usa text() para definir a query e scalar_one() para obter um único resultado
-        query = text(f'SELECT state FROM {table_name} LIMIT 1')
-        result = conn.execute(query).scalar_one()
-        return result
+    return _state_table(st.secrets.database.NEON_TABLENAME)
 
 
-def set_state(state):
-    engine = init_connection()
-    table_name = st.secrets.database.NEON_TABLENAME
+def create_local_tables(engine):
+    """
+    Cria as tabelas do banco local de testes, com o campeonato padrão.
+    """
+    table = state_table()
+    table.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if not conn.execute(select(table.c.tournament_id)).first():
+            conn.execute(
+                insert(table).values(
+                    tournament_id=DEFAULT_TOURNAMENT,
+                    name=DEFAULT_TOURNAMENT_NAME,
+                    state='',
+                )
+            )
+    create_normalized_tables(engine)
+    create_event_tables(engine)
+
+
+# --- CAMPEONATOS ---
+@metrics.timed('db.list_tournaments')
+def list_tournaments() -> list[dict]:
+    """Campeonatos cadastrados (id e nome), na ordem de criação."""
+    table = state_table()
+    with init_connection().connect() as conn:
+        rows = conn.execute(
+            select(table.c.tournament_id, table.c.name).order_by(
+                table.c.tournament_id
+            )
+        )
+        return [dict(row._mapping) for row in rows]
+
+
+@metrics.timed('db.create_tournament')
+def create_tournament(name: str) -> int:
+    """
+    Cria um campeonato vazio. Retorna o seu id.
+
+    O id é o maior já usado mais um: se outra sessão cria um campeonato ao
+    mesmo tempo e fica com esse id, a chave primária recusa a inserção e o
+    próximo id é tentado.
+    """
+    table = state_table()
+    for _ in range(CREATE_TOURNAMENT_ATTEMPTS):
+        try:
+            with init_connection().begin() as conn:
+                tournament_id = conn.execute(
+                    select(
+                        func.coalesce(func.max(table.c.tournament_id), 0) + 1
+                    )
+                ).scalar_one()
+                conn.execute(
+                    insert(table).values(
+                        tournament_id=tournament_id, name=name, state=''
+                    )
+                )
+                return tournament_id
+        except exc.IntegrityError:
+            metrics.increment('db.create_tournament_conflicts')
+    raise RuntimeError(
+        'Não foi possível criar o campeonato: outros foram criados ao mesmo '
+        'tempo a cada tentativa.'
+    )
+
+
+def _tournament_row(table: Table, tournament_id: int):
+    return table.c.tournament_id == tournament_id
+
+
+@metrics.timed('db.get_state')
+def get_state(tournament_id: int) -> str:
+    """
+    Busca o valor do campo 'state' do campeonato no banco de dados.
+    """
+    table = state_table()
+    with init_connection().connect() as conn:
+        query = select(table.c.state).where(
+            _tournament_row(table, tournament_id)
+        )
+        return conn.execute(query).scalar_one()
+
+
+@metrics.timed('db.get_state_version')
+def get_state_version(tournament_id: int) -> int:
+    """
+    Busca apenas a versão do estado do campeonato, que muda a cada escrita.
+    Consulta barata usada para revalidar o cache do estado.
+    """
+    table = state_table()
+    with init_connection().connect() as conn:
+        query = select(table.c.version).where(
+            _tournament_row(table, tournament_id)
+        )
+        return conn.execute(query).scalar_one()
 
-    query = text(f'UPDATE {table_name} SET state = :state')
+
+def _bump(table: Table, tournament_id: int, expected_version=None):
+    """UPDATE que incrementa a versão (se ainda for `expected_version`)."""
+    query = update(table).where(_tournament_row(table, tournament_id))
+    if expected_version is not None:
+        query = query.where(table.c.version == expected_version)
+    return query.values(
+        version=table.c.version + 1, updated=func.current_timestamp()
+    )
+
+
+def bump_version(conn, tournament_id: int) -> int:
+    """
+    Incrementa a versão do estado dentro da transação corrente. Retorna a
+    nova versão.
+    """
+    table = state_table()
+    return conn.execute(
+        _bump(table, tournament_id).returning(table.c.version)
+    ).scalar_one()
+
+
+@metrics.timed('db.set_state')
+def set_state(tournament_id: int, state):
+    table = state_table()
+    query = _bump(table, tournament_id).values(state=state)
 
     with (
-        engine.begin() as conn
+        init_connection().begin() as conn
     ):  # engine.begin() inicia uma transação automaticamente
-        conn.execute(query, {'state': state})
+        conn.execute(query)
         return True
+
+
+def get_payload(tournament_id: int) -> bytes | None:
+    """
+    Busca o estado do campeonato no formato binário (coluna 'payload').
+    """
+    return get_versioned_payload(tournament_id)[0]
+
+
+@metrics.timed('db.get_versioned_payload')
+def get_versioned_payload(tournament_id: int) -> tuple[bytes | None, int]:
+    """
+    Busca o estado do campeonato no formato binário junto com a sua versão.
+    """
+    table = state_table()
+    with init_connection().connect() as conn:
+        query = select(table.c.payload, table.c.version).where(
+            _tournament_row(table, tournament_id)
+        )
+        return tuple(conn.execute(query).one())
+
+
+@metrics.timed('db.set_payload')
+def set_payload(
+    tournament_id: int, payload: bytes, expected_version: int | None = None
+):
+    """
+    Grava o estado do campeonato no formato binário (coluna 'payload').
+
+    Com `expected_version`, grava apenas se a versão no banco ainda for a
+    esperada (compare-and-swap). Retorna a nova versão, ou None se outro
+    escritor alterou o estado antes.
+    """
+    table = state_table()
+    query = (
+        _bump(table, tournament_id, expected_version)
+        .values(payload=payload)
+        .returning(table.c.version)
+    )
+
+    with init_connection().begin() as conn:
+        return conn.execute(query).scalar_one_or_none()
+
+
+# --- ARMAZENAMENTO NORMALIZADO (atletas, jogos e placares) ---
+DDL_NORMALIZED = Path(__file__).parent / 'sql' / 'ddl_normalized_state.sql'
+DDL_PLAYOFF = Path(__file__).parent / 'sql' / 'ddl_playoff.sql'
+
+UPSERT_SCORE = text(
+    'INSERT INTO tb_score (tournament_id, match_id, score1, score2) '
+    'VALUES (:tournament_id, :match_id, :score1, :score2) '
+    'ON CONFLICT (tournament_id, match_id) DO UPDATE SET '
+    'score1 = excluded.score1, score2 = excluded.score2, '
+    'updated = CURRENT_TIMESTAMP'
+)
+
+# Só grava se o jogo ainda for o das mesmas duplas (os jogos não foram
+# refeitos) e só sobrescreve um placar que ainda for o lido pela sessão
+UPSERT_SCORE_CHECKED = text(
+    'INSERT INTO tb_score (tournament_id, match_id, score1, score2) '
+    'SELECT tournament_id, match_id, :score1, :score2 FROM tb_match '
+    'WHERE tournament_id = :tournament_id AND match_id = :match_id '
+    'AND first_a = :first_a AND first_b = :first_b '
+    'AND second_a = :second_a AND second_b = :second_b '
+    'ON CONFLICT (tournament_id, match_id) DO UPDATE SET '
+    'score1 = excluded.score1, score2 = excluded.score2, '
+    'updated = CURRENT_TIMESTAMP '
+    'WHERE tb_score.score1 = :previous1 AND tb_score.score2 = :previous2 '
+    'RETURNING match_id'
+)
+
+# Placar da fase final: também sobrescreve o de outras duplas, que deixou
+# de valer quando um resultado anterior mudou quem está no jogo. A fase
+# final em si é conferida antes (ver `set_scores`)
+UPSERT_PLAYOFF_SCORE_CHECKED = text(
+    'INSERT INTO tb_playoff_score (tournament_id, match_id, first_a, '
+    'first_b, second_a, second_b, score1, score2) '
+    'VALUES (:tournament_id, :match_id, :first_a, :first_b, :second_a, '
+    ':second_b, :score1, :score2) '
+    'ON CONFLICT (tournament_id, match_id) DO UPDATE SET '
+    'first_a = excluded.first_a, first_b = excluded.first_b, '
+    'second_a = excluded.second_a, second_b = excluded.second_b, '
+    'score1 = excluded.score1, score2 = excluded.score2, '
+    'updated = CURRENT_TIMESTAMP '
+    'WHERE (tb_playoff_score.score1 = :previous1 '
+    'AND tb_playoff_score.score2 = :previous2) '
+    'OR tb_playoff_score.first_a <> excluded.first_a '
+    'OR tb_playoff_score.first_b <> excluded.first_b '
+    'OR tb_playoff_score.second_a <> excluded.second_a '
+    'OR tb_playoff_score.second_b <> excluded.second_b '
+    'RETURNING match_id'
+)
+
+# Apagam as linhas de um campeonato, na ordem das chaves estrangeiras,
+# antes de regravar a estrutura
+DELETE_NORMALIZED = tuple(
+    text(f'DELETE FROM {table_name} WHERE tournament_id = :tournament_id')
+    for table_name in (
+        'tb_playoff_score',
+        'tb_playoff_pair',
+        'tb_score',
+        'tb_match',
+        'tb_athlete',
+        'tb_group',
+    )
+)
+
+
+def run_ddl(path, engine=None):
+    """Executa os comandos de um arquivo .sql, um por vez."""
+    statements = path.read_text(encoding='utf-8').split(';')
+    with (engine or init_connection()).begin() as conn:
+        for statement in statements:
+            if statement.strip():
+                conn.execute(text(statement))
+
+
+def create_normalized_tables(engine=None):
+    """
+    Cria as tabelas do armazenamento normalizado, se ainda não existirem.
+    """
+    run_ddl(DDL_NORMALIZED, engine)
+    run_ddl(DDL_PLAYOFF, engine)
+
+
+def _rows(tournament_id: int, rows) -> list[dict]:
+    """As linhas, com o id do campeonato."""
+    return [{**row, 'tournament_id': tournament_id} for row in rows]
+
+
+@metrics.timed('db.get_bracket')
+def get_bracket(tournament_id: int) -> tuple[list[dict], ...]:
+    """
+    Busca as chaves, os atletas, os jogos (com o placar, quando houver) e a
+    fase final do campeonato: duplas classificadas e placares.
+    """
+    params = {'tournament_id': tournament_id}
+    with init_connection().connect() as conn:
+        groups = conn.execute(
+            text(
+                'SELECT position, side, athlete_limit FROM tb_group '
+                'WHERE tournament_id = :tournament_id'
+            ),
+            params,
+        )
+        athletes = conn.execute(
+            text(
+                'SELECT athlete_id, name, side, position FROM tb_athlete '
+                'WHERE tournament_id = :tournament_id'
+            ),
+            params,
+        )
+        matches = conn.execute(
+            text(
+                'SELECT m.match_id, m.side, m.position, m.shuffle_position, '
+                'm.first_a, m.first_b, m.second_a, m.second_b, '
+                'm.slot, m.court, s.score1, s.score2 '
+                'FROM tb_match m '
+                'LEFT JOIN tb_score s USING (tournament_id, match_id) '
+                'WHERE m.tournament_id = :tournament_id'
+            ),
+            params,
+        )
+        playoff = conn.execute(
+            text(
+                'SELECT seed, athlete_a, athlete_b, double_elimination '
+                'FROM tb_playoff_pair WHERE tournament_id = :tournament_id'
+            ),
+            params,
+        )
+        playoff_scores = conn.execute(
+            text(
+                'SELECT match_id, first_a, first_b, second_a, second_b, '
+                'score1, score2 FROM tb_playoff_score '
+                'WHERE tournament_id = :tournament_id'
+            ),
+            params,
+        )
+        return tuple(
+            [dict(row._mapping) for row in result]
+            for result in (groups, athletes, matches, playoff, playoff_scores)
+        )
+
+
+@metrics.timed('db.set_bracket')
+def set_bracket(
+    tournament_id: int,
+    groups,
+    athletes,
+    matches,
+    scores,
+    playoff=(),
+    playoff_scores=(),
+):
+    """
+    Regrava chaves, atletas, jogos, placares e fase final do campeonato em
+    uma única transação. Usado apenas quando a estrutura muda (cadastro,
+    geração, embaralhamento, fase final). Retorna a nova versão.
+    """
+    with init_connection().begin() as conn:
+        for query in DELETE_NORMALIZED:
+            conn.execute(query, {'tournament_id': tournament_id})
+        conn.execute(
+            text(
+                'INSERT INTO tb_group (tournament_id, position, side, '
+                'athlete_limit) '
+                'VALUES (:tournament_id, :position, :side, :athlete_limit)'
+            ),
+            _rows(tournament_id, groups),
+        )
+        if athletes:
+            conn.execute(
+                text(
+                    'INSERT INTO tb_athlete (tournament_id, athlete_id, '
+                    'name, side, position) '
+                    'VALUES (:tournament_id, :athlete_id, :name, :side, '
+                    ':position)'
+                ),
+                _rows(tournament_id, athletes),
+            )
+        if matches:
+            conn.execute(
+                text(
+                    'INSERT INTO tb_match (tournament_id, match_id, side, '
+                    'position, shuffle_position, first_a, first_b, '
+                    'second_a, second_b, slot, court) '
+                    'VALUES (:tournament_id, :match_id, :side, :position, '
+                    ':shuffle_position, :first_a, :first_b, :second_a, '
+                    ':second_b, :slot, :court)'
+                ),
+                _rows(tournament_id, matches),
+            )
+        if scores:
+            conn.execute(UPSERT_SCORE, _rows(tournament_id, scores))
+        if playoff:
+            conn.execute(
+                text(
+                    'INSERT INTO tb_playoff_pair (tournament_id, seed, '
+                    'athlete_a, athlete_b, double_elimination) '
+                    'VALUES (:tournament_id, :seed, :athlete_a, '
+                    ':athlete_b, :double_elimination)'
+                ),
+                _rows(tournament_id, playoff),
+            )
+        if playoff_scores:
+            conn.execute(
+                text(
+                    'INSERT INTO tb_playoff_score (tournament_id, match_id, '
+                    'first_a, first_b, second_a, second_b, score1, score2) '
+                    'VALUES (:tournament_id, :match_id, :first_a, :first_b, '
+                    ':second_a, :second_b, :score1, :score2)'
+                ),
+                _rows(tournament_id, playoff_scores),
+            )
+        return bump_version(conn, tournament_id)
+
+
+def _playoff_seeds(conn, tournament_id: int) -> list[tuple]:
+    """Duplas da fase final gravada, por ordem de semente."""
+    rows = conn.execute(
+        text(
+            'SELECT seed, athlete_a, athlete_b, double_elimination '
+            'FROM tb_playoff_pair WHERE tournament_id = :tournament_id '
+            'ORDER BY seed'
+        ),
+        {'tournament_id': tournament_id},
+    )
+    return [(*row[:3], bool(row[3])) for row in rows]
+
+
+@metrics.timed('db.set_scores')
+def set_scores(
+    tournament_id: int, scores, playoff_scores=(), playoff=()
+) -> tuple[int | None, list[int]]:
+    """
+    Grava apenas os placares alterados do campeonato (uma linha por jogo),
+    das chaves e da fase final, e incrementa a versão na mesma transação.
+
+    Cada linha traz as duplas do jogo e o placar anterior (`previous1`,
+    `previous2`); jogos que já são de outras duplas ou cujo placar no banco
+    já é outro não são gravados, e nenhum placar da fase final é gravado se
+    ela não for mais a de `playoff` (linhas de sementes, como em
+    `set_bracket`). Retorna a nova versão (None se nada foi gravado) e os
+    ids dos jogos em conflito.
+    """
+    version, conflicts, written = None, [], False
+    if not scores and not playoff_scores:
+        return version, conflicts
+    with init_connection().begin() as conn:
+        if playoff_scores and _playoff_seeds(conn, tournament_id) != [
+            (
+                row['seed'],
+                row['athlete_a'],
+                row['athlete_b'],
+                bool(row['double_elimination']),
+            )
+            for row in playoff
+        ]:
+            # A fase final foi descartada ou refeita desde a leitura
+            conflicts += [row['match_id'] for row in playoff_scores]
+            playoff_scores = ()
+        for query, rows in (
+            (UPSERT_SCORE_CHECKED, scores),
+            (UPSERT_PLAYOFF_SCORE_CHECKED, playoff_scores),
+        ):
+            for row in _rows(tournament_id, rows):
+                if conn.execute(query, row).first() is None:
+                    conflicts.append(row['match_id'])
+                else:
+                    written = True
+        if written:
+            version = bump_version(conn, tournament_id)
+    return version, conflicts
+
+
+# --- LOG DE EVENTOS (cadastro, jogos, agenda e placares) ---
+DDL_EVENTS = Path(__file__).parent / 'sql' / 'ddl_event_log.sql'
+
+
+def create_event_tables(engine=None):
+    """
+    Cria as tabelas do log de eventos, se ainda não existirem.
+    """
+    run_ddl(DDL_EVENTS, engine)
+
+
+@metrics.timed('db.append_event')
+def append_event(
+    tournament_id: int, kind: str, payload: str, expected_version=None
+):
+    """
+    Anexa um evento ao log do campeonato, com id igual à nova versão do
+    estado.
+
+    Com `expected_version`, só anexa se ninguém gravou desde essa versão.
+    Retorna a nova versão, ou None se outro escritor chegou antes.
+    """
+    table = state_table()
+    query = _bump(table, tournament_id, expected_version).returning(
+        table.c.version
+    )
+
+    with init_connection().begin() as conn:
+        version = conn.execute(query).scalar_one_or_none()
+        if version is not None:
+            conn.execute(
+                text(
+                    'INSERT INTO tb_event (tournament_id, event_id, kind, '
+                    'payload) '
+                    'VALUES (:tournament_id, :event_id, :kind, :payload)'
+                ),
+                {
+                    'tournament_id': tournament_id,
+                    'event_id': version,
+                    'kind': kind,
+                    'payload': payload,
+                },
+            )
+        return version
+
+
+@metrics.timed('db.get_event_log')
+def get_event_log(
+    tournament_id: int,
+) -> tuple[int, int, bytes | None, list[dict]]:
+    """
+    Busca a versão do estado do campeonato, o último snapshot (id do
+    evento e conteúdo) e os eventos posteriores a ele, em ordem.
+    """
+    table = state_table()
+    with init_connection().connect() as conn:
+        version = conn.execute(
+            select(table.c.version).where(
+                _tournament_row(table, tournament_id)
+            )
+        ).scalar_one()
+        snapshot = conn.execute(
+            text(
+                'SELECT event_id, payload FROM tb_snapshot '
+                'WHERE tournament_id = :tournament_id '
+                'ORDER BY event_id DESC LIMIT 1'
+            ),
+            {'tournament_id': tournament_id},
+        ).first()
+        snapshot_id, payload = snapshot or (0, None)
+        events = conn.execute(
+            text(
+                'SELECT event_id, kind, payload FROM tb_event '
+                'WHERE tournament_id = :tournament_id '
+                'AND event_id > :snapshot_id ORDER BY event_id'
+            ),
+            {'tournament_id': tournament_id, 'snapshot_id': snapshot_id},
+        )
+        return (
+            version,
+            snapshot_id,
+            payload,
+            [dict(row._mapping) for row in events],
+        )
+
+
+@metrics.timed('db.set_snapshot')
+def set_snapshot(tournament_id: int, event_id: int, payload: bytes):
+    """Grava o estado completo até o evento `event_id` (se ainda não há)."""
+    with init_connection().begin() as conn:
+        conn.execute(
+            text(
+                'INSERT INTO tb_snapshot (tournament_id, event_id, payload) '
+                'VALUES (:tournament_id, :event_id, :payload) '
+                'ON CONFLICT (tournament_id, event_id) DO NOTHING'
+            ),
+            {
+                'tournament_id': tournament_id,
+                'event_id': event_id,
+                'payload': payload,
+            },
+        )
+
+
+@metrics.timed('db.get_events')
+def get_events(tournament_id: int, kind: str, limit: int = 50) -> list[dict]:
+    """
+    Busca os eventos mais recentes de um tipo no campeonato, do mais novo
+    ao mais antigo.
+    """
+    with init_connection().connect() as conn:
+        rows = conn.execute(
+            text(
+                'SELECT event_id, kind, payload, created FROM tb_event '
+                'WHERE tournament_id = :tournament_id AND kind = :kind '
+                'ORDER BY event_id DESC LIMIT :limit'
+            ),
+            {'tournament_id': tournament_id, 'kind': kind, 'limit': limit},
+        )
+        return [dict(row._mapping) for row in rows]
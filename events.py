@@ -0,0 +1,201 @@
+"""
+Log de eventos do campeonato (STORAGE_MODE = "events").
+
+Cada alteração vira um evento pequeno anexado a tb_event, em vez de uma
+nova cópia do estado inteiro: cadastro, geração dos jogos, embaralhamento,
+agenda das quadras, fase final e placares. Os eventos guardam o resultado
+da alteração (jogos gerados, ordem sorteada), não o comando, então a
+reprodução não depende de sorteios nem do tempo da busca da agenda.
+
+O estado é o último snapshot (serializer.py) mais os eventos seguintes,
+reaplicados em ordem. Ver sql/ddl_event_log.sql.
+"""
+
+import json
+from typing import Callable, Dict, Iterable, List
+
+from backend import (
+    Bracket,
+    Match,
+    Playoff,
+    ScoreChange,
+    make_pair,
+    pair_members,
+)
+
+REGISTER = 'register'
+GENERATE = 'generate'
+SHUFFLE = 'shuffle'
+SCHEDULE = 'schedule'
+SCORES = 'scores'
+PLAYOFF = 'playoff'
+
+
+def encode(data) -> str:
+    """Conteúdo do evento em JSON compacto."""
+    return json.dumps(data, separators=(',', ':'))
+
+
+# --- CONTEÚDO DOS EVENTOS, LIDO DO BRACKET JÁ ALTERADO ---
+def _describe_register(bracket: Bracket) -> dict:
+    return {
+        'limit': bracket.limit,
+        'groups': list(bracket.groups),
+        'names': bracket.names,
+        'athletes': {
+            side: list(bracket.athlete_by_side[side].values)
+            for side in bracket.groups
+        },
+    }
+
+
+def _describe_generate(bracket: Bracket) -> dict:
+    return {
+        side: [
+            [*pair_members(match.first), *pair_members(match.second)]
+            for match in bracket.brackets[side]
+        ]
+        for side in bracket.groups
+    }
+
+
+def _describe_shuffle(bracket: Bracket) -> dict:
+    order = {}
+    for side in bracket.groups:
+        positions = {
+            match.number: position
+            for position, match in enumerate(bracket.brackets[side])
+        }
+        order[side] = [
+            positions[match.number] for match in bracket.shuffle_brackets[side]
+        ]
+    return order
+
+
+def _describe_schedule(bracket: Bracket) -> dict:
+    # A agenda também reordena os jogos de cada chave
+    return {
+        'schedule': bracket.schedule,
+        'shuffle': _describe_shuffle(bracket),
+    }
+
+
+def _describe_playoff(bracket: Bracket) -> dict | None:
+    # Fase final descartada: None
+    if bracket.playoff is None:
+        return None
+    return {
+        'pairs': [list(pair_members(pair)) for pair in bracket.playoff.pairs],
+        'double': bracket.playoff.double,
+    }
+
+
+DESCRIBE: Dict[str, Callable[[Bracket], dict | None]] = {
+    REGISTER: _describe_register,
+    GENERATE: _describe_generate,
+    SHUFFLE: _describe_shuffle,
+    SCHEDULE: _describe_schedule,
+    PLAYOFF: _describe_playoff,
+}
+
+
+def describe(kind: str, bracket: Bracket) -> dict:
+    """Conteúdo do evento `kind` para o bracket que acabou de mudar."""
+    return DESCRIBE[kind](bracket)
+
+
+def describe_scores(changes: Iterable[ScoreChange]) -> List[list]:
+    """
+    Conteúdo do evento de placares: jogo (número e duplas), placar
+    anterior e novo.
+    """
+    return [
+        [change.number, *change.pairs, *change.previous, *change.score]
+        for change in changes
+    ]
+
+
+def read_scores(data: Iterable[list]) -> List[ScoreChange]:
+    """Mudanças de placar descritas por `describe_scores`."""
+    return [
+        ScoreChange(
+            number, (first, second), (previous1, previous2), (score1, score2)
+        )
+        for number, first, second, previous1, previous2, score1, score2 in data
+    ]
+
+
+# --- REPRODUÇÃO ---
+def _apply_register(bracket: Bracket | None, data: dict) -> Bracket:
+    new = Bracket(limit=data['limit'], groups=data['groups'])
+    for name in data['names']:
+        new._intern(name)
+    for side, ids in data['athletes'].items():
+        new.athlete_by_side[side].values.extend(ids)
+        for athlete_id in ids:
+            new.ranking.register(athlete_id, side)
+    return new
+
+
+def _apply_generate(bracket: Bracket, data: dict) -> Bracket:
+    for side in bracket.groups:
+        bracket.brackets[side] = [
+            Match(make_pair(a, b), make_pair(c, d))
+            for a, b, c, d in data[side]
+        ]
+    bracket.schedule = []
+    bracket.playoff = None
+    bracket._number_matches()
+    return bracket
+
+
+def _apply_shuffle(bracket: Bracket, data: dict) -> Bracket:
+    for side, positions in data.items():
+        bracket.shuffle_brackets[side] = [
+            bracket.brackets[side][position] for position in positions
+        ]
+    bracket.schedule = []
+    return bracket
+
+
+def _apply_schedule(bracket: Bracket, data: dict) -> Bracket:
+    _apply_shuffle(bracket, data['shuffle'])
+    bracket.schedule = [list(slot) for slot in data['schedule']]
+    return bracket
+
+
+def _apply_playoff(bracket: Bracket, data: dict | None) -> Bracket:
+    bracket.playoff = data and Playoff(
+        [make_pair(a, b) for a, b in data['pairs']],
+        data['double'],
+        first_number=sum(map(len, bracket.brackets.values())),
+    )
+    return bracket
+
+
+def _apply_scores(bracket: Bracket, data: List[list]) -> Bracket:
+    matches = {match.number: match for match in bracket.all_matches()}
+    for number, _, _, _, _, score1, score2 in data:
+        bracket.set_score(matches[number], score1, score2)
+    return bracket
+
+
+APPLY = {
+    REGISTER: _apply_register,
+    GENERATE: _apply_generate,
+    SHUFFLE: _apply_shuffle,
+    SCHEDULE: _apply_schedule,
+    SCORES: _apply_scores,
+    PLAYOFF: _apply_playoff,
+}
+
+
+def replay(bracket: Bracket | None, rows: Iterable[dict]) -> Bracket | None:
+    """Reaplica, em ordem, os eventos (linhas de tb_event) sobre o bracket."""
+    for row in rows:
+        if bracket is None and row['kind'] != REGISTER:
+            raise ValueError(
+                f'Evento {row["event_id"]} ({row["kind"]}) sem cadastro antes.'
+            )
+        bracket = APPLY[row['kind']](bracket, json.loads(row['payload']))
+    return bracket
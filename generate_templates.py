@@ -0,0 +1,42 @@
+"""
+Pré-gera os modelos de tabela de jogos (templates.py) para cada tamanho de
+grupo, em schedule_templates/ (versionada com o app), para o app não
+precisar gerá-los na primeira vez que um tamanho aparece. Os modelos já
+gravados são conferidos e mantidos.
+
+Uso: python generate_templates.py [menor] [maior]
+(por padrão, de 4 a 64 atletas por grupo)
+"""
+
+import sys
+import time
+
+import templates
+from backend import template_games
+
+TEMPLATES = templates.ScheduleTemplates(
+    template_games, directory=templates.TEMPLATE_DIR
+)
+
+
+def generate(first: int, last: int):
+    """Gera, verifica e grava os modelos de `first` a `last` atletas."""
+    for size in range(first, last + 1):
+        if TEMPLATES.load(size) is not None:
+            print(f'{size} atletas: modelo já gravado.')
+            continue
+        start = time.perf_counter()
+        games = TEMPLATES.generate(size)
+        if not TEMPLATES.save(size, games):
+            sys.exit(f'Não foi possível gravar em {TEMPLATES.directory}.')
+        print(
+            f'{size} atletas: {len(games)} jogos '
+            f'({time.perf_counter() - start:.3f}s).'
+        )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:3]]
+    first = sizes[0] if sizes else templates.MIN_SIZE
+    last = sizes[1] if len(sizes) > 1 else max(first, templates.MAX_SIZE)
+    generate(first, last)
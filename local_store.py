@@ -0,0 +1,135 @@
+"""
+Armazenamento local (offline-first) dos placares.
+
+Os placares enviados são gravados primeiro em um SQLite local em modo WAL,
+o que leva só o tempo do disco: a partir daí o envio está confirmado, mesmo
+que o banco central esteja fora do ar. A fila de gravação (writer.py) manda
+essas mudanças ao banco central em lotes e as apaga daqui quando gravadas;
+os conflitos são detectados lá, pelas duplas e pelo placar anterior de
+cada jogo.
+
+O SQLite guarda também uma réplica do último estado lido (ou gravado) do
+banco central, para a página abrir sem conexão. Mudanças que sobraram de
+uma execução anterior do processo são entregues uma vez, por
+`take_orphans`, para a primeira sessão do campeonato reenviar. Fila e
+réplica são separadas por campeonato.
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+import events
+from backend import ScoreChange
+
+DDL = (
+    'CREATE TABLE IF NOT EXISTS tb_outbox ('
+    'entry_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'tournament_id INTEGER NOT NULL, '
+    'changes TEXT NOT NULL, '
+    'created TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+    'CREATE INDEX IF NOT EXISTS ix_outbox_tournament '
+    'ON tb_outbox (tournament_id, entry_id)',
+    'CREATE TABLE IF NOT EXISTS tb_replica ('
+    'tournament_id INTEGER PRIMARY KEY, '
+    'payload BLOB, '
+    'version BIGINT NOT NULL, '
+    'updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+)
+
+
+class LocalStore:
+    """Fila de placares e réplica do estado em um arquivo SQLite local."""
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        # WAL: gravações sem bloquear leituras; NORMAL faz fsync só nos
+        # checkpoints, o que ainda sobrevive a uma queda do processo
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in DDL:
+            self.conn.execute(statement)
+        self.orphans = {
+            entry_id
+            for (entry_id,) in self.conn.execute(
+                'SELECT entry_id FROM tb_outbox'
+            )
+        }
+
+    def append(self, tournament_id: int, changes: List[ScoreChange]) -> int:
+        """Grava as mudanças na fila local. Retorna o id da entrada."""
+        with self.lock:
+            return self.conn.execute(
+                'INSERT INTO tb_outbox (tournament_id, changes) VALUES (?, ?)',
+                (
+                    tournament_id,
+                    events.encode(events.describe_scores(changes)),
+                ),
+            ).lastrowid
+
+    def pending(
+        self, tournament_id: int
+    ) -> List[Tuple[int, List[ScoreChange]]]:
+        """Entradas ainda não gravadas no banco central, em ordem."""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT entry_id, changes FROM tb_outbox '
+                'WHERE tournament_id = ? ORDER BY entry_id',
+                (tournament_id,),
+            ).fetchall()
+        return [
+            (entry_id, events.read_scores(json.loads(changes)))
+            for entry_id, changes in rows
+        ]
+
+    def remove(self, entry_ids: List[int]) -> None:
+        """Apaga as entradas já gravadas (ou descartadas por conflito)."""
+        if not entry_ids:
+            return
+        with self.lock:
+            self.conn.executemany(
+                'DELETE FROM tb_outbox WHERE entry_id = ?',
+                [(entry_id,) for entry_id in entry_ids],
+            )
+
+    def take_orphans(self, tournament_id: int) -> Dict[int, List[ScoreChange]]:
+        """
+        Entradas do campeonato deixadas por uma execução anterior do
+        processo, ainda sem gravar. Só a primeira chamada as recebe.
+        """
+        orphans = {}
+        for entry_id, changes in self.pending(tournament_id):
+            with self.lock:
+                if entry_id not in self.orphans:
+                    continue
+                self.orphans.discard(entry_id)
+            orphans[entry_id] = changes
+        return orphans
+
+    def save_replica(
+        self, tournament_id: int, payload: bytes, version: int
+    ) -> None:
+        """Guarda o estado do banco central (formato do serializer)."""
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO tb_replica (tournament_id, payload, version) '
+                'VALUES (?, ?, ?) '
+                'ON CONFLICT (tournament_id) DO UPDATE SET '
+                'payload = excluded.payload, version = excluded.version, '
+                'updated = CURRENT_TIMESTAMP '
+                'WHERE excluded.version >= tb_replica.version',
+                (tournament_id, payload, version),
+            )
+
+    def replica(self, tournament_id: int) -> Tuple[bytes | None, int] | None:
+        """Último estado guardado do campeonato e a sua versão, se houver."""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT payload, version FROM tb_replica '
+                'WHERE tournament_id = ?',
+                (tournament_id,),
+            ).fetchone()
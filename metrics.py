@@ -0,0 +1,194 @@
+"""
+Métricas do processo: tempos e contadores das operações do app.
+
+Tudo fica em memória, compartilhado pelas sessões do processo. Cada
+medição vira também uma linha de log estruturado (JSON, logger
+`bracket.metrics`, nível DEBUG). O conjunto pode ser lido como dicionário
+(painel de depuração do app) ou no formato texto do Prometheus, servido
+em /metrics por `start_http_server` quando METRICS_PORT está definido
+(só para a própria máquina, salvo outro endereço em METRICS_HOST).
+
+Uso:
+    with metrics.timed('db.get_state'):
+        ...
+
+    @metrics.timed('serializer.dumps')
+    def dumps(...): ...
+
+    metrics.increment('state.conflicts')
+    metrics.observe('state.payload_bytes', len(payload))
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import quantiles
+from typing import Deque, Dict
+
+logger = logging.getLogger('bracket.metrics')
+
+# Amostras recentes guardadas por série, para os percentis
+SAMPLES = 512
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = 'bracket_'
+
+
+class Series:
+    """Valores observados de uma métrica: total, contagem, máximo, amostras."""
+
+    __slots__ = ('count', 'total', 'maximum', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLES)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        self.samples.append(value)
+
+    def summary(self) -> dict:
+        cuts = (
+            quantiles(self.samples, n=100, method='inclusive')
+            if len(self.samples) > 1
+            else [self.total] * 99
+        )
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.maximum,
+            **{f'p{int(q * 100)}': cuts[int(q * 100) - 1] for q in QUANTILES},
+        }
+
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_series: Dict[str, Series] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Soma `value` ao contador `name`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({'metric': name, 'increment': value}))
+
+
+def observe(name: str, value: float) -> None:
+    """Registra um valor (tempo em segundos, tamanho em bytes...)."""
+    with _lock:
+        _series.setdefault(name, Series()).add(value)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(json.dumps({'metric': name, 'value': value}))
+
+
+class timed(ContextDecorator):
+    """Mede a duração de um bloco ou função (erros em `<name>.errors`)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.local = threading.local()
+
+    def __enter__(self):
+        self.local.__dict__.setdefault('starts', []).append(
+            time.perf_counter()
+        )
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        elapsed = time.perf_counter() - self.local.starts.pop()
+        observe(f'{self.name}.seconds', elapsed)
+        # Só Exception conta: st.rerun/st.stop usam BaseException
+        if error_type is not None and issubclass(error_type, Exception):
+            increment(f'{self.name}.errors')
+        return False
+
+
+def snapshot() -> dict:
+    """Contadores e resumos das séries, para exibição."""
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'series': {name: s.summary() for name, s in _series.items()},
+        }
+
+
+def reset() -> None:
+    """Zera todas as métricas."""
+    with _lock:
+        _counters.clear()
+        _series.clear()
+
+
+def _metric_name(name: str) -> str:
+    return PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def prometheus_text() -> str:
+    """Métricas no formato de exposição em texto do Prometheus."""
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data['counters'].items()):
+        metric = _metric_name(name) + '_total'
+        lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+    for name, summary in sorted(data['series'].items()):
+        metric = _metric_name(name)
+        lines.append(f'# TYPE {metric} summary')
+        lines += [
+            f'{metric}{{quantile="{q}"}} {summary[f"p{int(q * 100)}"]}'
+            for q in QUANTILES
+        ]
+        lines += [
+            f'{metric}_sum {summary["sum"]}',
+            f'{metric}_count {summary["count"]}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+_server = None
+# Endereço do /metrics: só a própria máquina, a não ser que METRICS_HOST
+# diga outro (como '' para todas as interfaces)
+DEFAULT_HOST = '127.0.0.1'
+
+
+def start_http_server(port: int | None = None, host: str | None = None):
+    """
+    Serve /metrics em segundo plano (uma vez por processo). Sem `port`, usa
+    a variável de ambiente METRICS_PORT; sem ela, não faz nada. Sem `host`,
+    usa METRICS_HOST ou, na falta dela, DEFAULT_HOST.
+    """
+    global _server
+    port = port or int(os.environ.get('METRICS_PORT') or 0)
+    if host is None:
+        host = os.environ.get('METRICS_HOST', DEFAULT_HOST)
+    with _lock:
+        if _server is not None or not port:
+            return _server
+        _server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
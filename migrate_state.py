@@ -0,0 +1,54 @@
+"""
+Migra o estado salvo como blob na tabela do estado (formato binário ou o
+antigo pickle em base64) para o armazenamento normalizado
+(sql/ddl_normalized_state.sql), campeonato por campeonato.
+
+Uso: python migrate_state.py
+Depois, configure STORAGE_MODE = "normalized" nos segredos do Streamlit.
+"""
+
+import serializer
+from connection import (
+    create_normalized_tables,
+    get_payload,
+    get_state,
+    list_tournaments,
+    set_bracket,
+)
+
+
+def migrate_tournament(tournament_id: int, name: str):
+    """Copia o estado de um campeonato do blob para as tabelas."""
+    payload = get_payload(tournament_id)
+    if payload:
+        bracket = serializer.loads(payload)
+    else:
+        base64_string = get_state(tournament_id)
+        bracket = base64_string and serializer.loads_legacy(base64_string)
+    if not bracket:
+        print(f'{name}: nenhum estado salvo. Nada a migrar.')
+        return
+    groups, athletes, matches, scores = bracket.to_rows()
+    set_bracket(
+        tournament_id,
+        groups,
+        athletes,
+        matches,
+        scores,
+        *bracket.playoff_rows(),
+    )
+    print(
+        f'{name}: migrados {len(athletes)} atletas, {len(matches)} jogos '
+        f'e {len(scores)} placares.'
+    )
+
+
+def migrate():
+    """Copia o estado atual de cada campeonato para as tabelas."""
+    create_normalized_tables()
+    for tournament in list_tournaments():
+        migrate_tournament(tournament['tournament_id'], tournament['name'])
+
+
+if __name__ == '__main__':
+    migrate()
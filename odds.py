@@ -0,0 +1,259 @@
+"""
+Chances de classificação para a fase final, por simulação (Monte Carlo).
+
+Os jogos ainda sem placar de uma chave são jogados milhares de vezes, em
+lotes vetorizados com NumPy: cada lote é uma matriz (simulações x jogos)
+de placares, e os totais de cada atleta saem de um produto com a matriz de
+participação nos jogos, sem laços por jogo. Ao fim de cada lote as chances
+acumuladas são devolvidas, para a interface mostrar resultados parciais
+dentro do tempo disponível.
+
+Modelo: o placar de um jogo é sorteado entre os já registrados nas chaves
+(maior e menor placar) e a dupla que fica com o maior depende da força de
+cada uma, o saldo médio por jogo dos seus atletas. A ordem é a do
+`Ranking`: pontos, vitórias e saldo (o confronto direto não é simulado).
+
+A situação de cada atleta (classificado ou eliminado) não depende do
+sorteio nem dos placares já vistos: vem dos limites de pontos, vitórias e
+saldo que ele e os outros ainda podem alcançar. No pior caso um atleta
+perde os jogos restantes sem marcar; no melhor, vence todos com o placar
+máximo de um jogo (`max_score`) ou, sem ele, com pontos e saldo sem teto.
+Só aparece o que é certo em qualquer resultado.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+import metrics
+from backend import Bracket, SideVar, pair_members
+
+# Simulações por lote, teto de simulações e tempo (s) de cada `run`
+BATCH_SIZE = 500
+MAX_SIMULATIONS = 20_000
+TIME_BUDGET = 2.0
+# Diferença de força (saldo médio por jogo) que vale ~73% de chance de
+# vitória; jogos fictícios somados aos disputados, para não superestimar
+# quem jogou pouco
+STRENGTH_SCALE = 3.0
+PRIOR_GAMES = 2
+# Placar usado enquanto nenhum jogo foi registrado
+DEFAULT_RESULT = (1, 0)
+
+CLINCHED = 'Classificado'
+ELIMINATED = 'Eliminado'
+ALIVE = 'Em disputa'
+
+
+@dataclass
+class Odds:
+    """Chances acumuladas de cada atleta da chave, na ordem do cadastro."""
+
+    athletes: List[int]
+    simulations: int
+    remaining: int
+    qualify: np.ndarray
+    first: np.ndarray
+    mean_position: np.ndarray
+    status: List[str]
+    done: bool
+
+
+def _results(bracket: Bracket) -> np.ndarray:
+    """Placares registrados nas chaves, como (maior, menor)."""
+    scores = [
+        (max(match.score1, match.score2), min(match.score1, match.score2))
+        for match in bracket.matches()
+        if match.winner
+    ]
+    return np.array(scores or [DEFAULT_RESULT], dtype=np.float64)
+
+
+class Simulation:
+    """Simulação dos jogos restantes de uma chave, feita em lotes."""
+
+    def __init__(
+        self,
+        bracket: Bracket,
+        group: SideVar,
+        qualifiers: int,
+        seed: int | None = None,
+        limit: int = MAX_SIMULATIONS,
+        max_score: int | None = None,
+    ):
+        self.athletes = list(bracket.athlete_by_side[group].values)
+        self.qualifiers = qualifiers
+        # Placar máximo de uma dupla em um jogo; None: sem limite
+        self.max_score = max_score
+        self.rng = np.random.default_rng(seed)
+        self.results = _results(bracket)
+        index = {athlete: i for i, athlete in enumerate(self.athletes)}
+        size = len(self.athletes)
+
+        # Totais já registrados: pontos, vitórias, saldo e jogos
+        self.base = np.zeros((4, size))
+        remaining = []
+        for match in bracket.brackets[group]:
+            first = [index[athlete] for athlete in pair_members(match.first)]
+            second = [index[athlete] for athlete in pair_members(match.second)]
+            if not match.winner:
+                remaining.append((first, second))
+                continue
+            for members, scored, conceded in (
+                (first, match.score1, match.score2),
+                (second, match.score2, match.score1),
+            ):
+                self.base[:, members] += np.array([
+                    [scored],
+                    [scored > conceded],
+                    [scored - conceded],
+                    [1],
+                ])
+
+        # Participação nos jogos restantes: uma linha por jogo
+        self.first = np.zeros((len(remaining), size))
+        self.second = np.zeros((len(remaining), size))
+        for row, (first, second) in enumerate(remaining):
+            self.first[row, first] = 1
+            self.second[row, second] = 1
+
+        strength = self.base[2] / (self.base[3] + PRIOR_GAMES)
+        gap = (self.first - self.second) @ strength
+        self.first_favored = 1 / (1 + np.exp(-gap / STRENGTH_SCALE))
+
+        # Sem jogos restantes, uma só "simulação" dá o ranking final
+        self.limit = limit if remaining else 1
+        self.simulations = 0
+        self.qualify = np.zeros(size)
+        self.first_place = np.zeros(size)
+        self.position_sum = np.zeros(size)
+        self.status = self._status()
+
+    @property
+    def remaining(self) -> int:
+        return len(self.first)
+
+    @property
+    def done(self) -> bool:
+        return self.simulations >= self.limit
+
+    def _bounds(self) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Melhor e pior (pontos, vitórias, saldo) ao alcance de cada um: os
+        jogos restantes todos vencidos por `max_score` a 0 ou todos
+        perdidos por 0 a `max_score` (sem `max_score`, sem limite).
+        """
+        games = (self.first + self.second).sum(axis=0)
+        if self.max_score is None:
+            swing = np.where(games > 0, np.inf, 0.0)
+        else:
+            swing = games * self.max_score
+        points, wins, diff, _ = self.base
+        best = zip(points + swing, wins + games, diff + swing)
+        worst = zip(points, wins, diff - swing)
+        return list(best), list(worst)
+
+    def _status(self) -> List[str]:
+        """
+        Classificado: menos de `qualifiers` atletas ainda podem terminar à
+        frente dele. Eliminado: ao menos `qualifiers` terminam à frente em
+        qualquer resultado. Empates exatos contam contra o atleta.
+        """
+        best, worst = self._bounds()
+        status = []
+        for athlete in range(len(self.athletes)):
+            others = [
+                other
+                for other in range(len(self.athletes))
+                if other != athlete
+            ]
+            may_pass = sum(best[other] >= worst[athlete] for other in others)
+            ahead = sum(worst[other] > best[athlete] for other in others)
+            if may_pass < self.qualifiers:
+                status.append(CLINCHED)
+            elif ahead >= self.qualifiers:
+                status.append(ELIMINATED)
+            else:
+                status.append(ALIVE)
+        return status
+
+    def _batch(self, size: int) -> None:
+        """Joga `size` vezes os jogos restantes e acumula as posições."""
+        shape = (size, self.remaining)
+        favored = self.rng.random(shape) < self.first_favored
+        drawn = self.results[self.rng.integers(len(self.results), size=shape)]
+        high, low = drawn[..., 0], drawn[..., 1]
+        score1 = np.where(favored, high, low)
+        score2 = np.where(favored, low, high)
+
+        points = self.base[0] + score1 @ self.first + score2 @ self.second
+        wins = (
+            self.base[1]
+            + (score1 > score2) @ self.first
+            + (score2 > score1) @ self.second
+        )
+        diff = self.base[2] + (score1 - score2) @ (self.first - self.second)
+        ids = np.broadcast_to(np.array(self.athletes), points.shape)
+        # Mesma ordem de Standing.key: o último critério do lexsort é o 1º
+        order = np.lexsort((ids, -diff, -wins, -points), axis=-1)
+        position = np.empty_like(order)
+        np.put_along_axis(
+            position,
+            order,
+            np.broadcast_to(np.arange(len(self.athletes)), order.shape),
+            axis=-1,
+        )
+
+        self.qualify += (position < self.qualifiers).sum(axis=0)
+        self.first_place += (position == 0).sum(axis=0)
+        self.position_sum += position.sum(axis=0) + size
+        self.simulations += size
+        metrics.increment('odds.simulations', size)
+
+    def odds(self) -> Odds:
+        """Chances acumuladas até aqui."""
+        total = max(self.simulations, 1)
+        return Odds(
+            athletes=self.athletes,
+            simulations=self.simulations,
+            remaining=self.remaining,
+            qualify=self.qualify / total,
+            first=self.first_place / total,
+            mean_position=self.position_sum / total,
+            status=self.status,
+            done=self.done,
+        )
+
+    def run(
+        self, budget: float = TIME_BUDGET, batch: int = BATCH_SIZE
+    ) -> Iterator[Odds]:
+        """
+        Simula em lotes até o teto de simulações ou o fim do tempo
+        `budget`, devolvendo as chances depois de cada lote. Uma nova
+        chamada continua de onde a anterior parou.
+        """
+        deadline = time.perf_counter() + budget
+        while not self.done:
+            self._batch(min(batch, self.limit - self.simulations))
+            yield self.odds()
+            if time.perf_counter() >= deadline:
+                return
+
+
+def qualification_odds(
+    bracket: Bracket,
+    group: SideVar,
+    qualifiers: int,
+    budget: float = TIME_BUDGET,
+    seed: int | None = None,
+    max_score: int | None = None,
+) -> Odds:
+    """Chances da chave, simulando até o teto ou o fim do tempo."""
+    simulation = Simulation(
+        bracket, group, qualifiers, seed=seed, max_score=max_score
+    )
+    for _ in simulation.run(budget):
+        continue
+    return simulation.odds()
@@ -0,0 +1,185 @@
+"""
+Fase final (mata-mata) a partir do ranking das chaves.
+
+Os melhores de cada chave formam duplas pelas regras de posição e entram,
+como cabeças de chave, em uma chave de eliminação simples ou dupla. Com
+um número de duplas que não é potência de dois, as melhores folgam na
+primeira rodada.
+
+O módulo só monta a árvore de jogos: quem entra em cada jogo e para onde
+vão o vencedor e o perdedor. Os jogos, placares e o avanço das duplas
+ficam em `backend.Playoff`.
+"""
+
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+# Regras de formação das duplas a partir das posições no ranking
+BALANCED = 'balanced'  # melhor com pior: 1º + último, 2º + penúltimo...
+SAME_RANK = 'same_rank'  # mesma posição: 1º + 1º (ou 1º + 2º na chave)
+PAIRING_RULES = (BALANCED, SAME_RANK)
+
+# Destino do vencedor ou do perdedor: (jogo, lado 0 ou 1); None se sai
+Link = Tuple[int, int] | None
+
+ROUND_NAMES = {1: 'Final', 2: 'Semifinal', 4: 'Quartas de final'}
+
+
+def seed_positions(size: int) -> List[int]:
+    """
+    Cabeças de chave (índices) na ordem da primeira rodada, para `size`
+    potência de dois: 1º e 2º só se encontram na final.
+    """
+    order = [0]
+    while len(order) < size:
+        mirror = 2 * len(order) - 1
+        order = [seed for top in order for seed in (top, mirror - top)]
+    return order
+
+
+def form_pairs(
+    rankings: Sequence[Sequence[int]], qualifiers: int, rule: str = BALANCED
+) -> List[Tuple[int, int]]:
+    """
+    Duplas da fase final, da melhor para a pior cabeça de chave.
+
+    `rankings` traz os atletas de cada chave na ordem do ranking. Com duas
+    chaves, cada dupla junta um classificado de cada; com outro número de
+    chaves, as duplas são formadas dentro de cada chave.
+    """
+    if rule not in PAIRING_RULES:
+        raise ValueError(f'Regra de formação desconhecida: {rule}.')
+    if qualifiers < 1 or any(
+        len(ranking) < qualifiers for ranking in rankings
+    ):
+        raise ValueError(
+            'Cada chave precisa de ao menos '
+            f'{qualifiers} atleta(s) classificado(s).'
+        )
+    top = [list(ranking[:qualifiers]) for ranking in rankings]
+    if len(top) == 2:
+        first, second = top
+        if rule == BALANCED:
+            second = second[::-1]
+        pairs = list(zip(first, second))
+    else:
+        if qualifiers % 2:
+            raise ValueError(
+                'Com as duplas formadas dentro da chave, o número de '
+                'classificados por chave deve ser par.'
+            )
+        half = qualifiers // 2
+        by_group = [
+            list(zip(group[:half], group[::-1][:half]))
+            if rule == BALANCED
+            else list(zip(group[::2], group[1::2]))
+            for group in top
+        ]
+        # Intercala as chaves: as melhores duplas de cada uma vêm primeiro
+        pairs = [pair for rank in zip(*by_group) for pair in rank]
+    if len(pairs) < 2:
+        raise ValueError('A fase final precisa de ao menos duas duplas.')
+    return pairs
+
+
+@dataclass(frozen=True)
+class Tree:
+    """
+    Árvore de jogos: para cada jogo, o nome da rodada, as cabeças de chave
+    que entram nele (None quando o lado vem de outro jogo) e os destinos do
+    vencedor e do perdedor. Um jogo só alimenta jogos de índice maior.
+    """
+
+    rounds: List[str]
+    seeds: List[List[int | None]]
+    winner_to: List[Link]
+    loser_to: List[Link]
+
+
+class _Builder:
+    def __init__(self):
+        self.rounds: List[str] = []
+        self.seeds: List[List[int | None]] = []
+        self.winner_to: List[Link] = []
+        self.loser_to: List[Link] = []
+
+    def match(self, name: str, seeds=(None, None)) -> int:
+        self.rounds.append(name)
+        self.seeds.append(list(seeds))
+        self.winner_to.append(None)
+        self.loser_to.append(None)
+        return len(self.rounds) - 1
+
+    def round(self, name: str, feeds: Sequence[Tuple[List[Link], int]]):
+        """
+        Jogos de uma rodada; `feeds` diz, para cada jogo, de onde vem cada
+        lado: (lista de destinos do jogo anterior, jogo anterior).
+        """
+        matches = []
+        for index in range(0, len(feeds), 2):
+            target = self.match(name)
+            for side, (links, source) in enumerate(feeds[index : index + 2]):
+                links[source] = (target, side)
+            matches.append(target)
+        return matches
+
+
+def _round_name(matches: int, number: int) -> str:
+    return ROUND_NAMES.get(matches, f'Rodada {number}')
+
+
+def knockout_tree(pairs: int, double: bool = False) -> Tree:
+    """
+    Árvore de eliminação simples ou dupla para `pairs` duplas. As vagas
+    além de `pairs` são folgas (cabeças de chave de índice >= `pairs`).
+    """
+    if pairs < 2:
+        raise ValueError('A fase final precisa de ao menos duas duplas.')
+    if double and pairs < 3:
+        raise ValueError('A dupla eliminação precisa de ao menos três duplas.')
+    size = 1 << (pairs - 1).bit_length()
+    build = _Builder()
+    order = seed_positions(size)
+    prefix = 'Vencedores · ' if double else ''
+
+    winners = [
+        build.match(
+            prefix + _round_name(size // 2, 1), (order[i], order[i + 1])
+        )
+        for i in range(0, size, 2)
+    ]
+    winner_rounds = [winners]
+    while len(winners) > 1:
+        name = prefix + _round_name(len(winners) // 2, len(winner_rounds) + 1)
+        winners = build.round(
+            name, [(build.winner_to, match) for match in winners]
+        )
+        winner_rounds.append(winners)
+    if not double:
+        return Tree(build.rounds, build.seeds, build.winner_to, build.loser_to)
+
+    # Chave dos perdedores: os perdedores da 1ª rodada se enfrentam; depois,
+    # alternam rodadas que recebem os perdedores da chave dos vencedores
+    # (em ordem invertida, para evitar revanches) e rodadas internas
+    number = 1
+    losers = build.round(
+        f'Perdedores · Rodada {number}',
+        [(build.loser_to, match) for match in winner_rounds[0]],
+    )
+    for dropped in winner_rounds[1:]:
+        number += 1
+        feeds = []
+        for survivor, loser in zip(losers, reversed(dropped)):
+            feeds += [(build.winner_to, survivor), (build.loser_to, loser)]
+        losers = build.round(f'Perdedores · Rodada {number}', feeds)
+        if len(losers) > 1:
+            number += 1
+            losers = build.round(
+                f'Perdedores · Rodada {number}',
+                [(build.winner_to, match) for match in losers],
+            )
+    build.round(
+        'Grande final',
+        [(build.winner_to, winners[0]), (build.winner_to, losers[0])],
+    )
+    return Tree(build.rounds, build.seeds, build.winner_to, build.loser_to)
@@ -0,0 +1,69 @@
+"""
+Leitura da lista de atletas para o cadastro em lote.
+
+Aceita texto com um nome por linha ou um CSV (separado por vírgula, ponto e
+vírgula ou tabulação), com ou sem cabeçalho. Com cabeçalho, a coluna do nome
+é `nome`/`atleta`/`name` e a da chave, opcional, `chave`/`grupo`/`lado`.
+Sem cabeçalho, a primeira coluna é o nome e a segunda, se houver, a chave.
+A normalização e a remoção de repetidos ficam em `Bracket.add_athletes`.
+"""
+
+import csv
+from typing import List, Tuple
+
+NAME_COLUMNS = {'nome', 'atleta', 'name', 'athlete'}
+GROUP_COLUMNS = {'chave', 'grupo', 'lado', 'group', 'side'}
+DELIMITERS = ',;\t'
+# Codificações tentadas em arquivos enviados (planilhas exportadas no
+# Windows costumam vir em cp1252)
+ENCODINGS = ('utf-8-sig', 'cp1252')
+
+
+def decode(data: bytes) -> str:
+    """Decodifica o conteúdo de um arquivo enviado."""
+    for encoding in ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def read_roster(text: str) -> Tuple[List[str], List[str] | None]:
+    """
+    Lê os nomes e, se informadas, as chaves de cada atleta (None quando o
+    texto não traz chaves).
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return [], None
+    try:
+        dialect = csv.Sniffer().sniff(lines[0], delimiters=DELIMITERS)
+        rows = [
+            [cell.strip() for cell in row]
+            for row in csv.reader(lines, dialect)
+        ]
+    except csv.Error:
+        rows = [[line.strip()] for line in lines]
+
+    header = [cell.casefold() for cell in rows[0]]
+    name_column = next(
+        (i for i, cell in enumerate(header) if cell in NAME_COLUMNS), None
+    )
+    if name_column is None:
+        name_column = 0
+        group_column = 1 if len(header) > 1 else None
+    else:
+        group_column = next(
+            (i for i, cell in enumerate(header) if cell in GROUP_COLUMNS),
+            None,
+        )
+        rows = rows[1:]
+
+    rows = [row for row in rows if len(row) > name_column]
+    names = [row[name_column] for row in rows]
+    if group_column is None:
+        return names, None
+    return names, [
+        row[group_column] if len(row) > group_column else '' for row in rows
+    ]
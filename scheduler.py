@@ -0,0 +1,242 @@
+"""
+Agenda dos jogos em quadras e horários.
+
+Cada jogo recebe um horário (rodada de quadras) e uma quadra. O objetivo é,
+nesta ordem: terminar o dia no menor número de horários, evitar que um
+atleta jogue dois horários seguidos e equilibrar a espera entre os jogos de
+cada atleta. Uma agenda gulosa é melhorada por busca local (trocas e
+realocações de jogos) até o fim do tempo disponível.
+
+O módulo só conhece os atletas de cada jogo (tuplas de ids); a montagem a
+partir do `Bracket` fica em `Bracket.gen_schedule`.
+"""
+
+import math
+import random
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import partial
+from typing import Dict, List, Sequence, Tuple
+
+# Pesos do custo: a duração do dia domina, depois os jogos seguidos e, por
+# fim, a espera (quadrado dos horários parados entre dois jogos)
+MAKESPAN_WEIGHT = 100_000
+CONSECUTIVE_WEIGHT = 1_000
+TIME_BUDGET = 1.0
+# Temperatura inicial da busca: no começo, aceitar um jogo seguido a mais
+# é comum; no fim, só melhorias são aceitas
+INITIAL_TEMPERATURE = CONSECUTIVE_WEIGHT / 2
+# Passos da busca entre duas consultas ao relógio
+CLOCK_STEPS = 256
+
+
+def gap_cost(gap: int) -> int:
+    """Custo do intervalo (em horários) entre dois jogos de um atleta."""
+    if gap == 1:
+        return CONSECUTIVE_WEIGHT
+    return (gap - 1) ** 2
+
+
+class _Search:
+    """Agenda em construção, com o custo mantido incrementalmente."""
+
+    def __init__(self, players: Sequence[Tuple[int, ...]], courts: int):
+        self.players = players
+        self.courts = courts
+        self.slot_of = [-1] * len(players)
+        self.slots: List[List[int]] = []
+        self.busy: List[set] = []
+        self.timeline: Dict[int, List[int]] = defaultdict(list)
+        self.waiting = 0
+
+    def makespan(self) -> int:
+        while self.slots and not self.slots[-1]:
+            self.slots.pop()
+            self.busy.pop()
+        return len(self.slots)
+
+    def cost(self) -> int:
+        return MAKESPAN_WEIGHT * self.makespan() + self.waiting
+
+    def place(self, match: int, slot: int) -> None:
+        while len(self.slots) <= slot:
+            self.slots.append([])
+            self.busy.append(set())
+        self.slots[slot].append(match)
+        self.busy[slot].update(self.players[match])
+        self.slot_of[match] = slot
+        for athlete in self.players[match]:
+            line = self.timeline[athlete]
+            i = bisect_left(line, slot)
+            before = line[i - 1] if i else None
+            after = line[i] if i < len(line) else None
+            if before is not None and after is not None:
+                self.waiting -= gap_cost(after - before)
+            if before is not None:
+                self.waiting += gap_cost(slot - before)
+            if after is not None:
+                self.waiting += gap_cost(after - slot)
+            line.insert(i, slot)
+
+    def remove(self, match: int) -> int:
+        slot = self.slot_of[match]
+        self.slots[slot].remove(match)
+        self.busy[slot].difference_update(self.players[match])
+        for athlete in self.players[match]:
+            line = self.timeline[athlete]
+            i = bisect_left(line, slot)
+            before = line[i - 1] if i else None
+            after = line[i + 1] if i + 1 < len(line) else None
+            if before is not None:
+                self.waiting -= gap_cost(slot - before)
+            if after is not None:
+                self.waiting -= gap_cost(after - slot)
+            if before is not None and after is not None:
+                self.waiting += gap_cost(after - before)
+            del line[i]
+        return slot
+
+    def fits(self, match: int, slot: int, leaving: int | None = None) -> bool:
+        """`match` cabe em `slot` (se `leaving` sair de lá)?"""
+        if leaving is None and len(self.slots[slot]) >= self.courts:
+            return False
+        freed = () if leaving is None else self.players[leaving]
+        busy = self.busy[slot]
+        return all(
+            athlete not in busy or athlete in freed
+            for athlete in self.players[match]
+        )
+
+    def greedy(self, order: Sequence[int]) -> None:
+        """
+        Preenche os horários em sequência: primeiro com jogos cujos atletas
+        descansaram no horário anterior, depois com quaisquer jogos livres.
+        """
+        remaining = list(order)
+        rested = set()
+        while remaining:
+            slot, chosen, busy = len(self.slots), [], set()
+            for need_rest in (True, False):
+                for match in remaining:
+                    if len(chosen) == self.courts:
+                        break
+                    athletes = self.players[match]
+                    if (
+                        match not in chosen
+                        and busy.isdisjoint(athletes)
+                        and not (need_rest and not rested.isdisjoint(athletes))
+                    ):
+                        chosen.append(match)
+                        busy.update(athletes)
+            for match in chosen:
+                remaining.remove(match)
+                self.place(match, slot)
+            rested = busy
+
+    def improve(self, deadline: float, rng: random.Random) -> List[List[int]]:
+        """
+        Busca local (têmpera simulada): realoca um jogo para um horário com
+        quadra livre ou o troca com um jogo de outro horário. Pioras são
+        aceitas com probabilidade que cai até o fim do tempo; a melhor
+        agenda encontrada é a que fica.
+        """
+        total = len(self.players)
+        start = time.perf_counter()
+        current = best = self.cost()
+        best_slots = [list(slot) for slot in self.slots]
+        temperature = INITIAL_TEMPERATURE
+        step = 0
+        while True:
+            step += 1
+            if step % CLOCK_STEPS == 0:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                temperature = INITIAL_TEMPERATURE * (
+                    1 - (now - start) / (deadline - start)
+                )
+            match = rng.randrange(total)
+            source = self.slot_of[match]
+            target = rng.randrange(len(self.slots))
+            if target == source:
+                continue
+            if self.fits(match, target):
+                self.move(match, target)
+                undo = partial(self.move, match, source)
+            elif self.slots[target]:
+                other = rng.choice(self.slots[target])
+                if not (
+                    self.fits(match, target, leaving=other)
+                    and self.fits(other, source, leaving=match)
+                ):
+                    continue
+                self.swap(match, other)
+                undo = partial(self.swap, match, other)
+            else:
+                continue
+            cost = self.cost()
+            if cost <= current or rng.random() < math.exp(
+                (current - cost) / max(temperature, 1e-9)
+            ):
+                current = cost
+                if cost < best:
+                    best = cost
+                    best_slots = [list(slot) for slot in self.slots]
+            else:
+                undo()
+        return best_slots
+
+    def move(self, match: int, slot: int) -> None:
+        self.remove(match)
+        self.place(match, slot)
+
+    def swap(self, first: int, second: int) -> None:
+        first_slot = self.remove(first)
+        second_slot = self.remove(second)
+        self.place(first, second_slot)
+        self.place(second, first_slot)
+
+
+def schedule_matches(
+    players: Sequence[Tuple[int, ...]],
+    courts: int,
+    time_budget: float = TIME_BUDGET,
+    seed: int | None = None,
+) -> List[List[int]]:
+    """
+    Distribui os jogos (dados pelos atletas de cada um) em horários de até
+    `courts` jogos simultâneos, sem atleta repetido em um mesmo horário.
+
+    Retorna, para cada horário, os índices dos jogos; a posição na lista é a
+    quadra. A ordem de `players` desempata a agenda inicial.
+    """
+    if courts < 1:
+        raise ValueError('É preciso ao menos uma quadra.')
+    deadline = time.perf_counter() + time_budget
+    search = _Search(players, courts)
+    search.greedy(range(len(players)))
+    if not players:
+        return []
+    return search.improve(deadline, random.Random(seed))
+
+
+def schedule_stats(
+    players: Sequence[Tuple[int, ...]], slots: List[List[int]]
+) -> dict:
+    """Duração, jogos seguidos e maior espera de uma agenda."""
+    timeline = defaultdict(list)
+    for slot, matches in enumerate(slots):
+        for match in matches:
+            for athlete in players[match]:
+                timeline[athlete].append(slot)
+    gaps = [
+        later - earlier
+        for line in timeline.values()
+        for earlier, later in zip(line, line[1:])
+    ]
+    return {
+        'makespan': len(slots),
+        'consecutive': sum(gap == 1 for gap in gaps),
+        'max_wait': max((gap - 1 for gap in gaps), default=0),
+    }
@@ -0,0 +1,69 @@
+"""
+Formato binário e versionado do estado do campeonato.
+
+O `Bracket` é convertido em um snapshot simples (ids inteiros; os jogos em
+colunas binárias int32, em base64), serializado em JSON compacto e
+comprimido com zlib. O cabeçalho
+identifica o formato e a versão do esquema, então a leitura não depende do
+layout da classe (como o pickle) nem executa código arbitrário.
+"""
+
+import base64
+import json
+import pickle
+import zlib
+
+import metrics
+from backend import Bracket
+
+MAGIC = b'BKT'
+FORMAT_VERSION = 1
+# Nível baixo: quase o mesmo tamanho, com compressão bem mais rápida
+COMPRESSION_LEVEL = 1
+
+
+@metrics.timed('serializer.dumps')
+def dumps(bracket: Bracket) -> bytes:
+    """Serializa o bracket no formato binário atual."""
+    body = json.dumps(bracket.to_state(), separators=(',', ':'))
+    payload = (
+        MAGIC
+        + bytes([FORMAT_VERSION])
+        + zlib.compress(body.encode('utf-8'), COMPRESSION_LEVEL)
+    )
+    metrics.observe('serializer.payload_bytes', len(payload))
+    return payload
+
+
+def _load_v1(body: bytes) -> Bracket:
+    return Bracket.from_state(json.loads(zlib.decompress(body)))
+
+
+# Um leitor por versão do esquema: versões antigas continuam legíveis
+LOADERS = {1: _load_v1}
+
+
+@metrics.timed('serializer.loads')
+def loads(payload: bytes) -> Bracket:
+    """Desserializa um bracket gravado por `dumps` (qualquer versão)."""
+    payload = bytes(payload)
+    if payload[: len(MAGIC)] != MAGIC:
+        raise ValueError('Formato de estado desconhecido.')
+    version = payload[len(MAGIC)]
+    if version not in LOADERS:
+        raise ValueError(f'Versão de estado não suportada: {version}.')
+    return LOADERS[version](payload[len(MAGIC) + 1 :])
+
+
+@metrics.timed('serializer.loads_legacy')
+def loads_legacy(base64_string: str) -> Bracket | None:
+    """Lê o formato antigo (pickle em base64 na coluna `state`)."""
+    encode_bytes = base64.b64decode(base64_string)
+    if not encode_bytes:
+        return None
+    return pickle.loads(encode_bytes)
+
+
+def dumps_legacy(bracket: Bracket) -> str:
+    """Gera o formato antigo, mantido apenas para comparação."""
+    return base64.b64encode(pickle.dumps(bracket)).decode('utf-8')
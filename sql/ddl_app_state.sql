@@ -0,0 +1,20 @@
+-- Tabela do estado em um banco novo (Postgres/Neon): uma linha por
+-- campeonato, com a sua versão, o estado no formato binário de
+-- serializer.py (`payload`) e a coluna `state` do pickle em base64, lida
+-- apenas como fallback de estados antigos. Já com o campeonato padrão.
+--
+-- O nome da tabela é o NEON_TABLENAME dos segredos, passado ao psql:
+--   psql "$DATABASE_URL" -v state_table=tb_app_state -f sql/ddl_app_state.sql
+
+CREATE TABLE IF NOT EXISTS :"state_table" (
+  tournament_id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL DEFAULT 'Campeonato',
+  state TEXT,
+  updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  version BIGINT NOT NULL DEFAULT 0,
+  payload BYTEA
+);
+
+INSERT INTO :"state_table" (tournament_id, name, state)
+VALUES (1, 'Campeonato', '')
+ON CONFLICT (tournament_id) DO NOTHING;
@@ -0,0 +1,24 @@
+-- Log de eventos do campeonato (STORAGE_MODE = "events", ver events.py):
+-- cada alteração é uma linha nova em tb_event, com id igual à versão da
+-- linha do campeonato na tabela do estado (NEON_TABLENAME) gravada na
+-- mesma transação.
+-- tb_snapshot guarda de tempos em tempos o estado completo (formato de
+-- serializer.py) até um evento, para que a leitura só reaplique os eventos
+-- seguintes. Compatível com Postgres (Neon) e SQLite.
+
+CREATE TABLE IF NOT EXISTS tb_event (
+  tournament_id INTEGER NOT NULL,
+  event_id BIGINT NOT NULL,
+  kind TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (tournament_id, event_id)
+);
+
+CREATE TABLE IF NOT EXISTS tb_snapshot (
+  tournament_id INTEGER NOT NULL,
+  event_id BIGINT NOT NULL,
+  payload BYTEA NOT NULL,
+  created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (tournament_id, event_id)
+);
@@ -0,0 +1,59 @@
+-- Armazenamento normalizado do campeonato: cada placar salvo atualiza
+-- apenas a sua linha em tb_score, em vez de reescrever o blob
+-- da tabela do estado. As chaves começam pelo campeonato (tournament_id,
+-- a sua linha na tabela do estado), então as consultas de um campeonato
+-- usam o índice da chave primária. Compatível com Postgres (Neon) e SQLite.
+
+-- Chaves do campeonato, na ordem do cadastro (mesmo as ainda sem atletas),
+-- com o número de vagas de cada uma
+CREATE TABLE IF NOT EXISTS tb_group (
+  tournament_id INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  side TEXT NOT NULL,
+  athlete_limit INTEGER NOT NULL,
+  PRIMARY KEY (tournament_id, position),
+  UNIQUE (tournament_id, side)
+);
+
+CREATE TABLE IF NOT EXISTS tb_athlete (
+  tournament_id INTEGER NOT NULL,
+  athlete_id INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  side TEXT,
+  position INTEGER,
+  PRIMARY KEY (tournament_id, athlete_id)
+);
+
+CREATE TABLE IF NOT EXISTS tb_match (
+  tournament_id INTEGER NOT NULL,
+  match_id INTEGER NOT NULL,
+  side TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  shuffle_position INTEGER,
+  first_a INTEGER NOT NULL,
+  first_b INTEGER NOT NULL,
+  second_a INTEGER NOT NULL,
+  second_b INTEGER NOT NULL,
+  slot INTEGER,
+  court INTEGER,
+  PRIMARY KEY (tournament_id, match_id),
+  FOREIGN KEY (tournament_id, first_a)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, first_b)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, second_a)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, second_b)
+    REFERENCES tb_athlete (tournament_id, athlete_id)
+);
+
+CREATE TABLE IF NOT EXISTS tb_score (
+  tournament_id INTEGER NOT NULL,
+  match_id INTEGER NOT NULL,
+  score1 INTEGER NOT NULL,
+  score2 INTEGER NOT NULL,
+  updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (tournament_id, match_id),
+  FOREIGN KEY (tournament_id, match_id)
+    REFERENCES tb_match (tournament_id, match_id)
+);
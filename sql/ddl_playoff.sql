@@ -0,0 +1,41 @@
+-- Fase final do armazenamento normalizado (ver playoff.py): as duplas
+-- classificadas, na ordem de cabeça de chave, e os placares dos jogos do
+-- mata-mata. Os jogos não têm linha própria: a árvore é remontada a partir
+-- das duplas, e cada placar guarda as duplas que jogaram, para ser
+-- ignorado se um resultado anterior mudar quem está no jogo. O número do
+-- jogo continua a numeração dos jogos das chaves. Compatível com Postgres
+-- (Neon) e SQLite.
+
+CREATE TABLE IF NOT EXISTS tb_playoff_pair (
+  tournament_id INTEGER NOT NULL,
+  seed INTEGER NOT NULL,
+  athlete_a INTEGER NOT NULL,
+  athlete_b INTEGER NOT NULL,
+  double_elimination BOOLEAN NOT NULL,
+  PRIMARY KEY (tournament_id, seed),
+  FOREIGN KEY (tournament_id, athlete_a)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, athlete_b)
+    REFERENCES tb_athlete (tournament_id, athlete_id)
+);
+
+CREATE TABLE IF NOT EXISTS tb_playoff_score (
+  tournament_id INTEGER NOT NULL,
+  match_id INTEGER NOT NULL,
+  first_a INTEGER NOT NULL,
+  first_b INTEGER NOT NULL,
+  second_a INTEGER NOT NULL,
+  second_b INTEGER NOT NULL,
+  score1 INTEGER NOT NULL,
+  score2 INTEGER NOT NULL,
+  updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (tournament_id, match_id),
+  FOREIGN KEY (tournament_id, first_a)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, first_b)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, second_a)
+    REFERENCES tb_athlete (tournament_id, athlete_id),
+  FOREIGN KEY (tournament_id, second_b)
+    REFERENCES tb_athlete (tournament_id, athlete_id)
+);
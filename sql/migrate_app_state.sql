@@ -0,0 +1,21 @@
+-- Atualiza a tabela do estado de uma instalação anterior (uma linha só,
+-- com o pickle em base64 na coluna `state`) para o formato atual, igual ao
+-- de ddl_app_state.sql: o estado existente vira o campeonato 1, com versão
+-- (incrementada a cada escrita, para revalidar o cache com um SELECT
+-- barato) e a coluna `payload` do formato binário de serializer.py.
+--
+-- O nome da tabela é o NEON_TABLENAME dos segredos, passado ao psql:
+--   psql "$DATABASE_URL" -v state_table=tb_app_state \
+--     -f sql/migrate_app_state.sql
+
+\set state_index :state_table '_tournament_key'
+
+ALTER TABLE :"state_table"
+  ADD COLUMN IF NOT EXISTS tournament_id INTEGER NOT NULL DEFAULT 1,
+  ADD COLUMN IF NOT EXISTS name TEXT NOT NULL DEFAULT 'Campeonato',
+  ADD COLUMN IF NOT EXISTS updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS payload BYTEA;
+ALTER TABLE :"state_table" ALTER COLUMN tournament_id DROP DEFAULT;
+CREATE UNIQUE INDEX IF NOT EXISTS :"state_index"
+  ON :"state_table" (tournament_id);
@@ -0,0 +1,162 @@
+"""
+Estatísticas do campeonato em tabelas colunares (pandas/NumPy).
+
+Os jogos viram uma tabela com uma linha por jogo (número, chave, atletas de
+cada dupla, placar, horário e quadra). As estatísticas por atleta saem dela
+em operações vetorizadas: pontos feitos e sofridos, vitórias,
+aproveitamento, saldo e confronto direto entre empatados. As duas tabelas
+podem ser exportadas em CSV ou Parquet.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from backend import Bracket, pair_members
+
+MATCH_COLUMNS = [
+    'number',
+    'group',
+    'first_a',
+    'first_b',
+    'second_a',
+    'second_b',
+    'score1',
+    'score2',
+    'slot',
+    'court',
+]
+# Ordem do ranking: pontos, vitórias, saldo e, entre empatados nesses três,
+# vitórias no confronto direto
+RANKING_ORDER = ['points_for', 'wins', 'diff', 'head_to_head']
+EXPORT_FORMATS = ('csv', 'parquet')
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def match_table(bracket: Bracket) -> pd.DataFrame:
+    """Uma linha por jogo; placares e agenda ficam vazios (NA) se não há."""
+    courts = {
+        number: (slot, court)
+        for slot, numbers in enumerate(bracket.schedule)
+        for court, number in enumerate(numbers)
+    }
+    records = [
+        (
+            match.number,
+            side,
+            *pair_members(match.first),
+            *pair_members(match.second),
+            match.score1,
+            match.score2,
+            *courts.get(match.number, (None, None)),
+        )
+        for side in bracket.groups
+        for match in bracket.brackets[side]
+    ]
+    table = pd.DataFrame.from_records(records, columns=MATCH_COLUMNS)
+    return table.astype({
+        'number': 'int64',
+        'group': pd.CategoricalDtype(bracket.groups),
+        'first_a': 'int64',
+        'first_b': 'int64',
+        'second_a': 'int64',
+        'second_b': 'int64',
+        'score1': 'Int64',
+        'score2': 'Int64',
+        'slot': 'Int64',
+        'court': 'Int64',
+    })
+
+
+def athlete_stats(
+    bracket: Bracket, matches: pd.DataFrame | None = None
+) -> pd.DataFrame:
+    """
+    Estatísticas de cada atleta cadastrado, já na ordem do ranking de cada
+    chave (coluna `position`). `matches` é a tabela de `match_table`, se já
+    calculada.
+    """
+    if matches is None:
+        matches = match_table(bracket)
+    played = matches.dropna(subset=['score1', 'score2'])
+    score1 = played['score1'].to_numpy(np.int64)
+    score2 = played['score2'].to_numpy(np.int64)
+    first_a, first_b, second_a, second_b = (
+        played[column].to_numpy(np.int64)
+        for column in ('first_a', 'first_b', 'second_a', 'second_b')
+    )
+
+    # Uma participação por atleta em cada jogo (quatro por jogo)
+    athlete = np.concatenate([first_a, first_b, second_a, second_b])
+    scored = np.concatenate([score1, score1, score2, score2])
+    conceded = np.concatenate([score2, score2, score1, score1])
+    rival_a = np.concatenate([second_a, second_a, first_a, first_a])
+    rival_b = np.concatenate([second_b, second_b, first_b, first_b])
+    won = scored > conceded
+
+    size = len(bracket.names)
+
+    def total(weights=None) -> np.ndarray:
+        return np.bincount(athlete, weights=weights, minlength=size)
+
+    groups = [
+        (athlete_id, side)
+        for side in bracket.groups
+        for athlete_id in bracket.athlete_by_side[side].values
+    ]
+    ids = np.fromiter((athlete_id for athlete_id, _ in groups), np.int64)
+    stats = pd.DataFrame({
+        'athlete': ids,
+        'name': [bracket.names[athlete_id] for athlete_id in ids],
+        'group': pd.Categorical(
+            [side for _, side in groups], categories=bracket.groups
+        ),
+        'played': total()[ids].astype(np.int64),
+        'points_for': total(scored)[ids].astype(np.int64),
+        'points_against': total(conceded)[ids].astype(np.int64),
+        'wins': total(won)[ids].astype(np.int64),
+    })
+    stats['losses'] = total(scored < conceded)[ids].astype(np.int64)
+    stats['win_rate'] = np.divide(
+        stats['wins'].to_numpy(np.float64),
+        stats['played'].to_numpy(np.float64),
+        out=np.zeros(len(stats)),
+        where=stats['played'].to_numpy() > 0,
+    )
+    stats['diff'] = stats['points_for'] - stats['points_against']
+
+    # Confronto direto: vitórias sobre adversários empatados com o atleta
+    # (mesma chave, pontos, vitórias e saldo)
+    tie = np.full(size, -1, dtype=np.int64)
+    tie[ids] = stats.groupby(
+        ['group', 'points_for', 'wins', 'diff'], observed=True
+    ).ngroup()
+    rivals_tied = (tie[rival_a] == tie[athlete]).astype(np.int64) + (
+        tie[rival_b] == tie[athlete]
+    )
+    stats['head_to_head'] = total(won * rivals_tied)[ids].astype(np.int64)
+
+    stats = stats.sort_values(
+        ['group', *RANKING_ORDER, 'athlete'],
+        ascending=[True, *[False] * len(RANKING_ORDER), True],
+        ignore_index=True,
+    )
+    stats.insert(
+        0, 'position', stats.groupby('group', observed=True).cumcount() + 1
+    )
+    return stats
+
+
+def export_table(table: pd.DataFrame, file_format: str) -> bytes:
+    """Conteúdo do arquivo `file_format` ('csv' ou 'parquet') da tabela."""
+    if file_format == 'csv':
+        return table.to_csv(index=False).encode('utf-8')
+    if file_format == 'parquet':
+        buffer = io.BytesIO()
+        table.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f'Formato de exportação desconhecido: {file_format}.')
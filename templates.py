@@ -0,0 +1,170 @@
+"""
+Modelos de tabela de jogos por tamanho de grupo.
+
+A tabela de rodízio de um grupo só depende do número de atletas, então ela
+é montada sobre índices (0 a n-1) e os atletas reais são encaixados nela
+depois, em O(n). Os modelos de MIN_SIZE a MAX_SIZE são distribuídos com o
+app (um JSON por tamanho, em TEMPLATE_DIR); os demais são gerados uma vez,
+verificados e gravados em CACHE_DIR, fora do repositório. No processo, os
+modelos usados ficam em um cache LRU.
+
+Um jogo do modelo é (a, b, c, d): a dupla dos índices a e b contra a dupla
+de c e d. A geração em si fica em backend.py (`template_games`).
+
+Pré-geração dos modelos: python generate_templates.py
+"""
+
+import functools
+import json
+import math
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Sequence, Tuple
+
+import metrics
+
+# Modelos pré-gerados, versionados com o app (generate_templates.py)
+TEMPLATE_DIR = Path(__file__).parent / 'schedule_templates'
+# Modelos gerados pelo app para outros tamanhos; SCHEDULE_TEMPLATE_DIR muda
+# o local
+CACHE_DIR = Path(
+    os.environ.get('SCHEDULE_TEMPLATE_DIR')
+    or Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    / 'bracket_schedule_templates'
+)
+# Muda quando o formato do arquivo (ou a geração) deixa de ser compatível
+FORMAT_VERSION = 1
+# Tamanhos de grupo mantidos no cache do processo
+CACHE_SIZE = 64
+# Faixa pré-gerada por padrão pelo generate_templates.py
+MIN_SIZE = 4
+MAX_SIZE = 64
+
+# Atletas em um jogo (duas duplas); também o menor grupo com jogos
+PLAYERS_PER_GAME = 4
+Quad = Tuple[int, int, int, int]
+Template = Tuple[Quad, ...]
+
+
+def expected_games(size: int) -> int:
+    """Número máximo de jogos de um grupo: cada dupla joga uma vez."""
+    return math.comb(size, 2) // 2 if size >= PLAYERS_PER_GAME else 0
+
+
+def verify(size: int, games: Sequence[Quad]) -> None:
+    """
+    Confere um modelo: índices dentro do grupo, quatro atletas diferentes em
+    cada jogo, nenhuma dupla repetida e o número máximo de jogos.
+    """
+    seen = set()
+    for game in games:
+        if len(set(game)) != PLAYERS_PER_GAME:
+            raise ValueError(f'Jogo inválido no modelo de {size}: {game}.')
+        if not all(0 <= index < size for index in game):
+            raise ValueError(f'Índice fora do grupo de {size}: {game}.')
+        for pair in (frozenset(game[:2]), frozenset(game[2:])):
+            if pair in seen:
+                raise ValueError(
+                    f'Dupla {sorted(pair)} repetida no modelo de {size}.'
+                )
+            seen.add(pair)
+    if len(games) != expected_games(size):
+        raise ValueError(
+            f'O modelo de {size} tem {len(games)} jogos; '
+            f'o esperado é {expected_games(size)}.'
+        )
+
+
+def _checked(size: int, games: Iterable[Sequence[int]]) -> Template:
+    games = tuple(tuple(game) for game in games)
+    verify(size, games)
+    return games
+
+
+def _read(path: Path, size: int) -> Template | None:
+    """Modelo gravado em `path`; None se não há ou não serve mais."""
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != FORMAT_VERSION or data.get('size') != size:
+        return None
+    games = tuple(map(tuple, data['games']))
+    try:
+        verify(size, games)
+    except ValueError:
+        return None
+    return games
+
+
+class ScheduleTemplates:
+    """
+    Modelos de tabela por tamanho: cache LRU, disco e geração. Os modelos
+    são lidos de `shipped` (somente leitura) ou de `directory`, onde os
+    gerados são gravados.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[int], Iterable[Sequence[int]]],
+        directory: Path = CACHE_DIR,
+        shipped: Path | None = TEMPLATE_DIR,
+        cache_size: int = CACHE_SIZE,
+    ):
+        self.build = build
+        self.directory = Path(directory)
+        self.paths = list(
+            dict.fromkeys(Path(path) for path in (shipped, directory) if path)
+        )
+        self.get = functools.lru_cache(maxsize=cache_size)(self._get)
+
+    def path(self, size: int) -> Path:
+        return self.directory / f'{size}.json'
+
+    def load(self, size: int) -> Template | None:
+        """Modelo gravado em disco; None se não há ou não serve mais."""
+        for directory in self.paths:
+            games = _read(directory / f'{size}.json', size)
+            if games is not None:
+                return games
+        return None
+
+    def save(self, size: int, games: Template) -> bool:
+        """
+        Grava o modelo (troca atômica do arquivo). Retorna False se o disco
+        não aceita gravação; o modelo continua valendo só no cache.
+        """
+        data = {'version': FORMAT_VERSION, 'size': size, 'games': games}
+        path = self.path(size)
+        temporary = path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(
+                json.dumps(data, separators=(',', ':')), encoding='utf-8'
+            )
+            os.replace(temporary, path)
+        except OSError:
+            return False
+        return True
+
+    def generate(self, size: int) -> Template:
+        """Gera e verifica o modelo, sem passar pelo disco."""
+        return _checked(size, self.build(size))
+
+    def add(self, size: int, games: Iterable[Sequence[int]]) -> Template:
+        """Verifica e grava um modelo gerado fora daqui (em paralelo)."""
+        games = _checked(size, games)
+        self.save(size, games)
+        return games
+
+    def _get(self, size: int) -> Template:
+        games = self.load(size)
+        if games is None:
+            metrics.increment('generation.template_builds')
+            games = self.generate(size)
+            self.save(size, games)
+        return games
+
+    def stored(self, size: int) -> bool:
+        """Há um modelo gravado em disco para o tamanho?"""
+        return any((path / f'{size}.json').exists() for path in self.paths)
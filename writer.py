@@ -0,0 +1,244 @@
+"""
+Gravação dos placares em segundo plano.
+
+O envio de placares não espera o banco: as mudanças entram em uma fila da
+sessão e uma thread as grava. Envios seguidos enquanto uma gravação está
+em andamento são juntados (por jogo, vale o último placar), então toques
+repetidos no botão viram uma só escrita. Erros passageiros do banco (como
+o Neon acordando) são repetidos com espera crescente; a interface consulta
+`status` para mostrar o que já está gravado e o que ainda está pendente.
+
+A função de gravação recebe (estado, mudanças, versão) e devolve (estado
+gravado, nova versão, mudanças descartadas por conflito). Ela roda fora
+da execução do script do Streamlit, então não deve usar a sessão.
+
+Com um `LocalStore` (local_store.py), cada envio é gravado antes no disco
+local e só sai de lá depois de gravado no banco central; sem conexão, a
+fila não desiste e continua tentando até ela voltar.
+"""
+
+import copy
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from backend import Bracket, ScoreChange
+from local_store import LocalStore
+
+# Tentativas por gravação antes de desistir e esperar um novo pedido
+MAX_ATTEMPTS = 5
+# Espera antes da 2ª tentativa; dobra a cada nova falha, até o máximo
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30
+
+Write = Callable[
+    [Bracket, List[ScoreChange], int],
+    Tuple[Bracket, int, List[ScoreChange]],
+]
+
+
+@dataclass
+class Status:
+    """Situação da fila, para exibição."""
+
+    pending: int = 0
+    saved: int = 0
+    version: int | None = None
+    attempt: int = 0
+    error: str | None = None
+    failed: bool = False
+    conflicts: List[ScoreChange] = field(default_factory=list)
+
+
+def _coalesce(
+    queued: Dict[tuple, ScoreChange], changes: Iterable[ScoreChange]
+) -> None:
+    """
+    Junta `changes` (mais novas) às mudanças já na fila, por jogo: mesmo
+    número e mesmas duplas (jogos refeitos não se juntam aos antigos).
+    """
+    for change in changes:
+        key = change.number, change.pairs
+        older = queued.pop(key, None)
+        previous = older.previous if older else change.previous
+        if change.score != previous:
+            queued[key] = ScoreChange(
+                change.number, change.pairs, previous, change.score
+            )
+
+
+class ScoreWriter:
+    """Fila de placares de uma sessão, gravada por uma thread sob demanda."""
+
+    def __init__(
+        self,
+        write: Write,
+        retry_on: Tuple[type, ...] = (),
+        attempts: int = MAX_ATTEMPTS,
+        backoff: float = BACKOFF_SECONDS,
+        store: LocalStore | None = None,
+        tournament_id: int | None = None,
+    ):
+        self.write = write
+        self.retry_on = retry_on
+        self.attempts = attempts
+        self.backoff = backoff
+        # Armazenamento local e o campeonato cujas mudanças vão para ele
+        self.store = store
+        self.tournament_id = tournament_id
+        self.lock = threading.Condition()
+        # Estado e versão sobre os quais a próxima gravação é feita. A base
+        # é o estado mais recente da sessão (que já tem as mudanças), até
+        # uma gravação trazer placares de outro marcador: daí em diante ela
+        # é o estado gravado, e as mudanças são reaplicadas sobre ele
+        self.base: Bracket | None = None
+        self.version: int | None = None
+        self.merged = False
+        self.queued: Dict[tuple, ScoreChange] = {}
+        self.in_flight: List[ScoreChange] = []
+        # Entradas do armazenamento local com as mudanças da fila
+        self.entries: List[int] = []
+        self.in_flight_entries: List[int] = []
+        self.running = False
+        self.state = Status()
+
+    def submit(
+        self,
+        state: Bracket,
+        changes: List[ScoreChange],
+        version: int,
+        entries: List[int] | None = None,
+    ) -> None:
+        """
+        Enfileira mudanças já aplicadas a `state` (lido em `version`). Com
+        armazenamento local, elas são gravadas nele antes; `entries` são
+        entradas que já estão lá (reenvio depois de reiniciar o processo).
+        """
+        if not changes and not entries:
+            return
+        with self.lock:
+            if entries is None and self.store is not None:
+                entries = [self.store.append(self.tournament_id, changes)]
+            self.entries += entries or []
+            if (
+                not self.merged
+                or self.version is None
+                or version >= self.version
+            ):
+                self.base = copy.deepcopy(state)
+                self.merged = False
+                self.version = max(version, self.version or version)
+            _coalesce(self.queued, changes)
+            self.state.failed = False
+            self.state.error = None
+            self._start()
+
+    def retry(self) -> None:
+        """Volta a gravar as mudanças de uma fila que desistiu."""
+        with self.lock:
+            self.state.failed = False
+            self._start()
+
+    def _start(self) -> None:
+        if self.running or not (self.queued or self.entries):
+            return
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            with self.lock:
+                if not (self.queued or self.entries):
+                    self.running = False
+                    self.lock.notify_all()
+                    return
+                changes = list(self.queued.values())
+                self.queued = {}
+                self.in_flight = changes
+                entries, self.entries = self.entries, []
+                self.in_flight_entries = entries
+                state = base = self.base
+                version = self.version
+            # Placares que mudaram no estado desde a leitura são conflito
+            conflicts = state.merge_changes(changes)
+            changes = [change for change in changes if change not in conflicts]
+            try:
+                state, version, rejected = self.write(state, changes, version)
+            except self.retry_on as error:
+                if not self._requeue(changes, entries, error):
+                    return
+                continue
+            except Exception as error:
+                # Erro não passageiro: a fila para e espera `retry`
+                self._requeue(changes, entries, error, give_up=True)
+                return
+            if self.store is not None:
+                self.store.remove(entries)
+            with self.lock:
+                if state is not base:
+                    # O estado foi relido: tem placares de outro marcador
+                    self.base, self.merged = state, True
+                self.version = version
+                self.in_flight = []
+                self.in_flight_entries = []
+                self.state.saved += len(changes) - len(rejected)
+                self.state.conflicts += conflicts + rejected
+                self.state.attempt = 0
+                self.state.error = None
+
+    def _requeue(
+        self,
+        changes: List[ScoreChange],
+        entries: List[int],
+        error: Exception,
+        give_up: bool = False,
+    ) -> bool:
+        """
+        Devolve à fila as mudanças que falharam (as enviadas depois têm
+        preferência) e espera antes de tentar de novo. Retorna False se as
+        tentativas acabaram (ou `give_up`); com armazenamento local, só
+        erros não passageiros fazem a fila desistir.
+        """
+        with self.lock:
+            newer, self.queued = self.queued, {}
+            _coalesce(self.queued, changes)
+            _coalesce(self.queued, newer.values())
+            self.entries = entries + self.entries
+            self.in_flight = []
+            self.in_flight_entries = []
+            self.state.attempt += 1
+            self.state.error = str(error)
+            if give_up or (
+                self.store is None and self.state.attempt >= self.attempts
+            ):
+                self.state.failed = True
+                self.state.attempt = 0
+                self.running = False
+                self.lock.notify_all()
+                return False
+            delay = min(
+                self.backoff * 2 ** min(self.state.attempt - 1, 16),
+                MAX_BACKOFF_SECONDS,
+            )
+        time.sleep(delay)
+        return True
+
+    def status(self) -> Status:
+        """Cópia da situação atual; os conflitos são entregues uma vez."""
+        with self.lock:
+            status = copy.copy(self.state)
+            status.pending = len(self.queued) + len(self.in_flight)
+            status.version = self.version
+            self.state.conflicts = []
+            return status
+
+    def busy(self) -> bool:
+        """Há mudanças na fila ou sendo gravadas?"""
+        with self.lock:
+            return self.running
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Espera a fila esvaziar. Retorna False se o tempo acabou."""
+        with self.lock:
+            return self.lock.wait_for(lambda: not self.running, timeout)